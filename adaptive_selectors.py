@@ -0,0 +1,243 @@
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import soupsieve
+
+# Ordem adaptativa dos seletores. As lojas usam listas de seletores separados
+# por vírgula (ou alternativas tentadas em sequência, como na Amazon), mas
+# cada loja costuma casar sempre com a mesma variante. Aqui fica registrado,
+# por loja e por campo, qual variante produziu produtos válidos; nas páginas
+# seguintes ela é tentada sozinha e a lista completa só é usada quando ela
+# não casa. Com parse_mode='process' o aprendizado fica no processo
+# principal: cada página vai ao worker com as variantes já aprendidas da loja
+# e volta com o que foi observado nela, somado aqui com merge().
+
+
+def split_selector(selector):
+    """Separa uma lista de seletores CSS nas vírgulas de nível mais alto."""
+    if isinstance(selector, tuple):
+        return selector
+    variants, depth, start = [], 0, 0
+    for i, char in enumerate(selector):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            variants.append(selector[start:i].strip())
+            start = i + 1
+    variants.append(selector[start:].strip())
+    return tuple(v for v in variants if v)
+
+
+class _FieldStats:
+    __slots__ = ('learned', 'hits', 'misses', 'empty', 'variants')
+
+    def __init__(self):
+        self.learned = None
+        self.hits = 0      # variante aprendida casou sozinha
+        self.misses = 0    # variante aprendida falhou e a lista completa foi usada
+        self.empty = 0     # nem a lista completa casou
+        self.variants = Counter()  # produtos válidos por variante
+
+    def to_dict(self):
+        return {
+            'learned': self.learned,
+            'hits': self.hits,
+            'misses': self.misses,
+            'empty': self.empty,
+            'variants': dict(self.variants),
+        }
+
+
+class SelectorPage:
+    """Seleções de uma página; os resultados só viram aprendizado em finish()."""
+
+    def __init__(self, learner, store_name):
+        self.learner = learner
+        self.store_name = store_name
+        self._learned = learner.learned(store_name)
+        self._variants = {}
+        self._last = {}
+        self._counts = defaultdict(lambda: [0, 0, 0])  # campo -> [hits, misses, vazios]
+        self._confirmed = defaultdict(Counter)
+        self.items_found = 0
+
+    def select(self, field, node, selector):
+        """Lista de elementos (usado para os itens da página)."""
+        elements, variant = self._run(field, node, selector, node.select, lambda found: bool(found))
+        if field == 'item':
+            self.items_found = len(elements)
+        return elements
+
+    def select_one(self, field, node, selector):
+        element, variant = self._run(field, node, selector, node.select_one, lambda found: found is not None)
+        self._last[field] = (element, variant)
+        return element
+
+    def _run(self, field, node, selector, select, matched):
+        variants = self._variants.get(field)
+        if variants is None:
+            variants = self._variants[field] = split_selector(selector)
+        counts = self._counts[field]
+
+        learned = self._learned.get(field)
+        if learned in variants:
+            found = select(learned)
+            if matched(found):
+                counts[0] += 1
+                return found, learned
+            counts[1] += 1
+
+        found = None
+        if isinstance(selector, tuple):
+            # Alternativas em sequência: vale a primeira que casar
+            for variant in selector:
+                if variant == learned:
+                    continue
+                found = select(variant)
+                if matched(found):
+                    return found, variant
+        else:
+            found = select(selector)
+            if matched(found):
+                return found, None
+        counts[2] += 1
+        return found, None
+
+    def _variant_of(self, field, element):
+        """Primeira variante da lista que casa com o elemento (só após usar a lista completa)."""
+        for variant in self._variants.get(field, ()):
+            if soupsieve.match(variant, element):
+                return variant
+        return None
+
+    def confirm(self, item=None):
+        """Marca os elementos da última seleção de cada campo como um produto válido."""
+        if item is not None:
+            self._confirmed['item'][self._variant_of('item', item)] += 1
+        for field, (element, variant) in self._last.items():
+            if element is not None:
+                self._confirmed[field][variant or self._variant_of(field, element)] += 1
+
+    def finish(self, products, dropped=0):
+        """Registra o aprendizado da página; dropped conta produtos válidos descartados pelo filtro de preço."""
+        self.learner._commit(self, products or dropped)
+        return products
+
+
+class SelectorLearner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fields = defaultdict(lambda: defaultdict(_FieldStats))
+        self._local = threading.local()
+
+    def learned(self, store_name):
+        with self._lock:
+            return {
+                field: stats.learned
+                for field, stats in self._fields[store_name].items()
+                if stats.learned
+            }
+
+    def seed(self, store_name, learned):
+        """Troca as variantes aprendidas da loja pelas recebidas (worker do pool de parsing)."""
+        with self._lock:
+            fields = self._fields[store_name]
+            for field, stats in fields.items():
+                stats.learned = learned.get(field)
+            for field, variant in learned.items():
+                fields[field].learned = variant
+
+    @contextmanager
+    def capture(self):
+        """Guarda as páginas registradas no bloco em vez de aplicá-las, para enviá-las a outro processo."""
+        self._local.pages = pages = []
+        try:
+            yield pages
+        finally:
+            self._local.pages = None
+
+    def merge(self, pages):
+        """Aplica as páginas capturadas em outro processo com capture()."""
+        for page in pages:
+            self._apply(*page)
+
+    def page(self, store_name):
+        return SelectorPage(self, store_name)
+
+    def _commit(self, page, products):
+        record = (
+            page.store_name,
+            {field: tuple(counts) for field, counts in page._counts.items()},
+            {field: dict(confirmed) for field, confirmed in page._confirmed.items()},
+            bool(products),
+            bool(page._learned),
+            page.items_found,
+        )
+        pages = getattr(self._local, 'pages', None)
+        if pages is not None:
+            pages.append(record)
+        else:
+            self._apply(*record)
+
+    def _apply(self, store_name, counts, confirmed_fields, products, had_learned, items_found):
+        with self._lock:
+            fields = self._fields[store_name]
+            for field, (hits, misses, empty) in counts.items():
+                stats = fields[field]
+                stats.hits += hits
+                stats.misses += misses
+                stats.empty += empty
+            for field, confirmed in confirmed_fields.items():
+                confirmed = Counter(confirmed)
+                confirmed.pop(None, None)
+                if not confirmed:
+                    continue
+                fields[field].variants.update(confirmed)
+                variant = confirmed.most_common(1)[0][0]
+                if variant != fields[field].learned:
+                    if fields[field].learned:
+                        logging.warning(f"{store_name}: seletor de '{field}' mudou de '{fields[field].learned}' para '{variant}'")
+                    fields[field].learned = variant
+
+            # A loja já funcionou antes e esta página não rendeu nada: provável mudança de layout
+            if not products and had_learned:
+                if items_found:
+                    logging.warning(
+                        f"{store_name}: {items_found} itens encontrados mas nenhum produto válido; "
+                        f"o layout da loja pode ter mudado"
+                    )
+                    for stats in fields.values():
+                        stats.learned = None
+                else:
+                    logging.warning(f"{store_name}: nenhum seletor de itens casou; o layout da loja pode ter mudado")
+
+    def forget(self, store_name=None):
+        with self._lock:
+            if store_name is None:
+                self._fields.clear()
+            else:
+                self._fields.pop(store_name, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                store_name: {field: stats.to_dict() for field, stats in fields.items()}
+                for store_name, fields in self._fields.items()
+            }
+
+
+_shared_learner = None
+_shared_learner_lock = threading.Lock()
+
+
+def get_selector_learner():
+    """Devolve o registro de seletores compartilhado pelo processo."""
+    global _shared_learner
+    with _shared_learner_lock:
+        if _shared_learner is None:
+            _shared_learner = SelectorLearner()
+        return _shared_learner
@@ -0,0 +1,217 @@
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from queries import canonicalize
+
+# Agregados de preço mantidos de forma incremental a cada busca ao vivo:
+# mínimo, mediana e máximo por (produto canônico, loja, dia), por marca e por
+# loja. O produto canônico é a chave da busca canônica (ver queries.py). Cada
+# linha guarda um histograma com faixas de 1% de preço, de onde sai a mediana
+# (erro de até ~0,5%) sem reler o histórico bruto; os gráficos leem só as
+# tabelas prontas.
+
+ROLLUPS = {
+    'product_daily': ('query_key', 'store'),
+    'brand_daily': ('brand',),
+    'store_daily': ('store',),
+}
+
+ROLLUP_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    {keys},
+    day TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    median REAL NOT NULL,
+    histogram TEXT NOT NULL,
+    PRIMARY KEY ({key_list}, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {table}_day ON {table}(day);
+"""
+
+# Observações do dia, só para não contar duas vezes o mesmo preço do mesmo
+# produto quando a mesma busca se repete; dias antigos são descartados. O
+# escopo separa as deduplicações: para product_daily é a chave da busca (um
+# produto que aparece em duas buscas entra nas duas), para os agregados por
+# marca e por loja é vazio (o produto conta uma vez por dia, venha de onde
+# vier). known_products lista os produtos canônicos para o seletor do painel.
+OBSERVATIONS = """
+DROP TABLE IF EXISTS observations;
+CREATE TABLE IF NOT EXISTS observed_prices (
+    day TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    link TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (day, scope, link, price)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS known_products (
+    query_key TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    last_day TEXT NOT NULL
+);
+"""
+
+BUCKET_STEP = math.log(1.01)
+OBSERVATION_DAYS = 2
+
+
+def price_bucket(price):
+    return int(round(math.log(price) / BUCKET_STEP))
+
+
+def histogram_median(histogram, n):
+    """Mediana aproximada a partir das faixas de preço acumuladas."""
+    half = n / 2
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= half:
+            return math.exp(bucket * BUCKET_STEP)
+    return 0.0
+
+
+class PriceAnalytics:
+    def __init__(self, path='data/analytics.db'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(OBSERVATIONS)
+        for table, keys in ROLLUPS.items():
+            self._conn.executescript(ROLLUP_TABLE.format(
+                table=table,
+                keys=',\n    '.join(f'{key} TEXT NOT NULL' for key in keys),
+                key_list=', '.join(keys),
+            ))
+
+    def record(self, query, products, seen_at=None, query_key=None):
+        """Soma os produtos de uma busca aos agregados; devolve quantas observações eram novas para a busca.
+
+        query_key, se dado, é usado no lugar da canonicalização de query.
+        """
+        seen_at = seen_at or time.time()
+        day = datetime.fromtimestamp(seen_at).date().isoformat()
+        query_key = query_key or canonicalize(query).key
+        started = time.perf_counter()
+
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM observed_prices WHERE day < ?', (
+                (date.fromisoformat(day) - timedelta(days=OBSERVATION_DAYS)).isoformat(),
+            ))
+            groups = {table: defaultdict(list) for table in ROLLUPS}
+            fresh = 0
+            for product in products:
+                if product.price <= 0:
+                    continue
+                if self._observe(day, query_key, product):
+                    fresh += 1
+                    groups['product_daily'][(query_key, product.store)].append(product.price)
+                if self._observe(day, '', product):
+                    groups['brand_daily'][(product.brand,)].append(product.price)
+                    groups['store_daily'][(product.store,)].append(product.price)
+
+            for table, by_key in groups.items():
+                for key, prices in by_key.items():
+                    self._merge(table, key, day, prices)
+            if fresh:
+                self._conn.execute(
+                    'INSERT INTO known_products (query_key, n, last_day) VALUES (?, ?, ?) '
+                    'ON CONFLICT(query_key) DO UPDATE SET n = n + excluded.n, last_day = excluded.last_day',
+                    (query_key, fresh, day)
+                )
+
+        if fresh:
+            logging.info(f"Agregados de preço: {fresh} observações novas de '{query}' em {(time.perf_counter() - started) * 1000:.1f} ms")
+        return fresh
+
+    def _observe(self, day, scope, product):
+        return self._conn.execute(
+            'INSERT OR IGNORE INTO observed_prices (day, scope, link, price) VALUES (?, ?, ?, ?)',
+            (day, scope, product.link, product.price)
+        ).rowcount
+
+    def _merge(self, table, key, day, prices):
+        keys = ROLLUPS[table]
+        where = ' AND '.join(f'{column} = ?' for column in keys)
+        row = self._conn.execute(
+            f'SELECT n, total, min_price, max_price, histogram FROM {table} WHERE {where} AND day = ?',
+            (*key, day)
+        ).fetchone()
+        if row:
+            n, total, min_price, max_price, histogram = row
+            histogram = {int(bucket): count for bucket, count in json.loads(histogram).items()}
+        else:
+            n, total, min_price, max_price, histogram = 0, 0.0, math.inf, 0.0, {}
+
+        for price in prices:
+            bucket = price_bucket(price)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        n += len(prices)
+        total += sum(prices)
+        min_price = min(min_price, min(prices))
+        max_price = max(max_price, max(prices))
+        median = min(max(histogram_median(histogram, n), min_price), max_price)
+
+        self._conn.execute(
+            f'INSERT OR REPLACE INTO {table} ({", ".join(keys)}, day, n, total, min_price, max_price, median, histogram) '
+            f'VALUES ({", ".join("?" * len(keys))}, ?, ?, ?, ?, ?, ?, ?)',
+            (*key, day, n, total, min_price, max_price, round(median, 2), json.dumps(histogram))
+        )
+
+    def _read(self, table, filters, since):
+        clauses, params = [], []
+        for column, values in filters.items():
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if since:
+            clauses.append('day >= ?')
+            params.append(str(since))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        columns = ', '.join(ROLLUPS[table])
+        sql = (
+            f'SELECT {columns}, day, n, min_price, median, max_price, total / n AS mean '
+            f'FROM {table} {where} ORDER BY day'
+        )
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def product_daily(self, query=None, stores=None, since=None, query_key=None):
+        """Preços por loja e dia de um produto canônico.
+
+        Recebe o texto da busca (canonicalizado aqui) ou, em query_key, uma chave
+        já canônica, como as de known_products(); a canonicalização não é
+        idempotente para os sinônimos, então a chave não deve passar por ela de novo.
+        """
+        return self._read('product_daily', {'query_key': [query_key or canonicalize(query).key], 'store': stores}, since)
+
+    def brand_daily(self, brands=None, since=None):
+        return self._read('brand_daily', {'brand': brands}, since)
+
+    def store_daily(self, stores=None, since=None):
+        return self._read('store_daily', {'store': stores}, since)
+
+    def known_products(self, limit=200):
+        """Produtos canônicos com agregados, dos mais observados para os menos."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT query_key FROM known_products ORDER BY n DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [query_key for query_key, in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -3,11 +3,21 @@ import pandas as pd
 import plotly.express as px
 import logging
 from scraper import SupplementScraper
+from products import ProductBatch
+from proxies import parse_proxies
+from scheduler import SchedulerBusy
+from search_client import SearchClient
+from queries import canonicalize
+from analytics import PriceAnalytics
+from watchlist import Watchlist
 from io import BytesIO
 from datetime import datetime
 from PIL import Image
 from time import sleep
 import base64
+import json
+import os
+import uuid
 
 # Configuração do logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -36,6 +46,9 @@ try:
 except FileNotFoundError:
     logo_base64 = None
 
+# Linhas de dados que cabem numa planilha do Excel (1.048.576 com o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_575
+
 # Função para converter DataFrame para Excel em memória
 @st.cache_data
 def to_excel(df):
@@ -70,12 +83,80 @@ st.markdown("""
     </div>
 """.format(logo_base64), unsafe_allow_html=True)
 
+# Identificador da sessão, usado no rodízio do agendador de buscas
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Inicializa o scraper
+# SCRAPER_SERVICE_URL faz o app usar o serviço de busca (service.py) em vez de raspar no próprio processo
+# SCRAPER_ANALYTICS_PATH ativa os agregados de preço do painel (compartilhados com o serviço)
+# SCRAPER_WATCHLIST_PATH ativa a lista de observação de preços e seus alertas
+analytics_path = os.environ.get('SCRAPER_ANALYTICS_PATH')
+watchlist_path = os.environ.get('SCRAPER_WATCHLIST_PATH')
+
+
+# O Streamlit roda o script inteiro a cada interação: o scraper (transporte, pools de
+# conexão por loja, índice, agregados e lista de observação) é criado uma vez por
+# processo e cada sessão usa uma cópia leve dele, como os workers do serviço
+@st.cache_resource
+def load_scraper():
+    # SCRAPER_PARSE_MODE=process envia o parsing do HTML para um pool de processos
+    # SCRAPER_INDEX_PATH ativa o índice local, que responde antes das lojas
+    # SCRAPER_SYNTHETIC_SIZE troca as lojas por um catálogo sintético desse tamanho (sem rede)
+    # SCRAPER_KEEPALIVE_INTERVAL (segundos) mantém as conexões com as lojas abertas (desativado por padrão)
+    # SCRAPER_PROXIES (separados por vírgula) faz as requisições saírem por proxies
+    # SCRAPER_RECORD_PATH grava as respostas das lojas; SCRAPER_REPLAY_PATH as reproduz sem rede
+    # (SCRAPER_REPLAY_LATENCY=zero responde sem a latência gravada)
+    # SCRAPER_BOUNDED_MEMORY=1 limita o tamanho das páginas; SCRAPER_MEMORY_REPORT=1 mede a memória por loja
+    # SCRAPER_CACHE_URL (sqlite:///volume/cache.db ou redis://host:6379/0) compartilha os resultados entre réplicas
+    # SCRAPER_PARSE_MEMO=0 extrai de novo até as páginas idênticas às já extraídas
+    return SupplementScraper(
+        parse_mode=os.environ.get('SCRAPER_PARSE_MODE', 'inline'),
+        index_path=os.environ.get('SCRAPER_INDEX_PATH'),
+        trace_path=os.environ.get('SCRAPER_TRACE_PATH'),
+        analytics_path=analytics_path,
+        watchlist_path=watchlist_path,
+        keepalive_interval=float(os.environ.get('SCRAPER_KEEPALIVE_INTERVAL') or 0) or None,
+        synthetic_size=int(os.environ.get('SCRAPER_SYNTHETIC_SIZE') or 0) or 100_000,
+        proxies=parse_proxies(os.environ.get('SCRAPER_PROXIES')),
+        record_path=os.environ.get('SCRAPER_RECORD_PATH'),
+        replay_path=os.environ.get('SCRAPER_REPLAY_PATH'),
+        replay_latency=os.environ.get('SCRAPER_REPLAY_LATENCY', 'original'),
+        bounded_memory=os.environ.get('SCRAPER_BOUNDED_MEMORY') == '1',
+        memory_report=os.environ.get('SCRAPER_MEMORY_REPORT') == '1',
+        cache_url=os.environ.get('SCRAPER_CACHE_URL'),
+        cache_ttl=float(os.environ.get('SCRAPER_CACHE_TTL') or 0) or None,
+        parse_memo=os.environ.get('SCRAPER_PARSE_MEMO') != '0'
+    )
+
+
+@st.cache_resource
+def load_panels(analytics_path, watchlist_path):
+    """Agregados e lista de observação abertos pelo app quando as buscas vão para o serviço."""
+    return (
+        PriceAnalytics(analytics_path) if analytics_path else None,
+        Watchlist(watchlist_path) if watchlist_path else None,
+    )
+
+
+service_client = None
+scraper = None
 try:
-    scraper = SupplementScraper()
+    if os.environ.get('SCRAPER_SERVICE_URL'):
+        # Um cliente (e uma sessão HTTP) por sessão do usuário, não por interação
+        if 'service_client' not in st.session_state:
+            st.session_state.service_client = SearchClient(os.environ['SCRAPER_SERVICE_URL'], session_id=st.session_state.session_id)
+        service_client = st.session_state.service_client
+        analytics, watchlist = load_panels(analytics_path, watchlist_path)
+    else:
+        scraper = load_scraper().for_session(st.session_state.session_id)
+        analytics, watchlist = scraper.analytics, scraper.watchlist
 except Exception as e:
     handle_error(f"Erro ao inicializar o scraper: {str(e)}")
 
+# Cards de produto mostrados por página de resultados
+CARDS_PER_PAGE = 60
+
 # Lista de lojas disponíveis
 AVAILABLE_STORES = [
     "Amazon", "Growth Suplementos", "Integral Medica", "Netshoes",
@@ -91,6 +172,10 @@ if 'last_query' not in st.session_state:
 if 'selected_stores' not in st.session_state:
     st.session_state.selected_stores = AVAILABLE_STORES
 
+def use_suggestion(text):
+    st.session_state.search_draft = text
+    st.session_state.suggestion_chosen = True
+
 # Formulário de busca
 with st.form(key='search_form'):
     # Campo de busca principal
@@ -103,17 +188,18 @@ with st.form(key='search_form'):
     
     search_query = st.text_input(
         "",
+        key='search_draft',
         placeholder="Ex: Whey Protein, Creatina...",
         help="Digite o nome do produto que você está procurando"
     )
     
-    # Botão de busca
+    # Botão de busca (escolher uma sugestão também busca)
     submit_button = st.form_submit_button(
         "🔍 Buscar Suplementos",
         use_container_width=True,
         type="primary",
         help="Clique para iniciar a busca"
-    )
+    ) or st.session_state.pop('suggestion_chosen', False)
     
     # Container para o spinner
     spinner_container = st.empty()
@@ -125,6 +211,24 @@ with st.form(key='search_form'):
     
     st.markdown("</div>", unsafe_allow_html=True)
 
+# Sugestões do índice de prefixos (buscas já feitas, marcas e títulos) para o
+# texto enviado: o Streamlit só reroda o script com o Enter ou o botão, então
+# elas aparecem depois da busca, para refiná-la com um clique
+suggestions = (service_client or scraper).suggest(search_query, k=5) if search_query else []
+suggestions = [suggestion for suggestion in suggestions if suggestion['text'] != canonicalize(search_query).text]
+if suggestions:
+    st.caption("Buscas relacionadas:")
+    suggestion_cols = st.columns(len(suggestions))
+    for col, suggestion in zip(suggestion_cols, suggestions):
+        col.button(
+            suggestion['text'],
+            key=f"suggestion_{suggestion['text']}",
+            on_click=use_suggestion,
+            args=(suggestion['text'],),
+            help="Busca já feita, com resultados" if suggestion['kind'] == 'query' else None,
+            use_container_width=True
+        )
+
 # Dica útil
 # Dica útil no final da página
 
@@ -152,10 +256,10 @@ with col1:
         max_price = st.number_input(
             "Máximo",
             min_value=0.0,
-            value=1000.0,
+            value=0.0,
             step=10.0,
             format="%.2f",
-            help="Preço máximo em reais"
+            help="Preço máximo em reais (0 = sem limite)"
         )
     
     sort_by = st.selectbox(
@@ -164,6 +268,15 @@ with col1:
         index=0,
         help="Escolha como os resultados serão ordenados"
     )
+
+    max_results = st.number_input(
+        "Resultados por loja",
+        min_value=1,
+        max_value=50,
+        value=5,
+        step=1,
+        help="Quantos produtos buscar em cada loja (dentro da faixa de preço)"
+    )
     
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -196,38 +309,67 @@ with col2:
     st.markdown("</div>", unsafe_allow_html=True)
 
 # Quando o botão de busca for pressionado
-if submit_button and search_query:
+if submit_button and search_query and not st.session_state.selected_stores:
+    st.warning("Selecione ao menos uma loja para buscar.")
+elif submit_button and search_query:
     st.session_state.last_query = search_query
     try:
         log_container = st.empty()
         log_container.info("Iniciando busca de suplementos...")
 
-        results = scraper.search_supplements(search_query)
+        # Lojas e faixa de preço vão para a busca: lojas fora da seleção nem são consultadas
+        filters = {
+            'max_results': int(max_results),
+            # Todas marcadas (o padrão) deixa o planejador escolher; uma seleção parcial é respeitada à risca
+            'stores': st.session_state.selected_stores if len(st.session_state.selected_stores) < len(AVAILABLE_STORES) else None,
+            # Sem faixa de preço a busca também alimenta os agregados do painel
+            'min_price': min_price or None,
+            'max_price': max_price or None,
+        }
+        if service_client is not None:
+            results = list(service_client.search(search_query, **filters))
+        elif os.environ.get('SCRAPER_SYNTHETIC_SIZE'):
+            results = list(scraper.search_supplements(search_query, mode='synthetic', **filters))
+        elif scraper.index is not None:
+            # Resposta imediata pelo índice local, atualizada em segundo plano
+            results = list(scraper.search_supplements(search_query, mode='index', refresh=True, **filters))
+        else:
+            results = list(scraper.search_supplements(search_query, **filters))
         
-        # Aplicar filtros
         if results:
-            # Filtrar por lojas selecionadas
-            results = [r for r in results if r['store'] in st.session_state.selected_stores]
-            
-            # Filtrar por faixa de preço
-            results = [r for r in results if min_price <= float(r['price']) <= max_price]
-            
             # Ordenar resultados
             if sort_by == "Menor preço":
-                results.sort(key=lambda x: float(x['price']) if float(x['price']) > 0 else float('inf'))
+                results.sort(key=lambda x: x.price if x.price > 0 else float('inf'))
             elif sort_by == "Maior preço":
-                results.sort(key=lambda x: float(x['price']) if float(x['price']) > 0 else float('-inf'), reverse=True)
+                results.sort(key=lambda x: x.price if x.price > 0 else float('-inf'), reverse=True)
             elif sort_by == "Nome (A-Z)":
-                results.sort(key=lambda x: x['title'].lower())
+                results.sort(key=lambda x: x.title.lower())
             elif sort_by == "Loja":
-                results.sort(key=lambda x: (x['store'], float(x['price']) if float(x['price']) > 0 else float('inf')))
+                results.sort(key=lambda x: (x.store, x.price if x.price > 0 else float('inf')))
 
         st.session_state.search_results = results
+        # Uma busca nova volta para a primeira página dos cards
+        st.session_state.results_page = 1
+        st.session_state.last_search_id = (service_client or scraper).last_search_id
+        last_plan = (service_client or scraper).last_plan
+        st.session_state.last_plan = last_plan.to_dict() if hasattr(last_plan, 'to_dict') else last_plan
+        st.session_state.last_memory = scraper.last_memory if scraper else None
+        if last_plan and st.session_state.last_plan['skipped']:
+            st.caption(
+                "Lojas não consultadas nesta busca (histórico de rendimento e tempo): "
+                + ', '.join(st.session_state.last_plan['skipped'])
+            )
 
         log_container.success(f"Busca concluída! Encontrados {len(results)} produtos.")
         sleep(2)
         log_container.empty()
 
+    except SchedulerBusy as e:
+        log_container.empty()
+        st.warning(f"⏳ {str(e)}")
+        logging.warning(f"Busca por '{search_query}' recusada: {str(e)}" + (f" - {scraper.scheduler.metrics()}" if scraper else ""))
+        st.stop()
+
     except Exception as e:
         st.error(f"Ocorreu um erro durante a busca: {str(e)}")
         logging.error(f"Erro na busca por '{search_query}': {str(e)}", exc_info=True)
@@ -235,66 +377,271 @@ if submit_button and search_query:
         st.info("Tente digitar 'teste' na busca para ver resultados simulados.")
         st.stop()
 
+tab_results, tab_dashboard, tab_alerts = st.tabs(["🛒 Resultados", "📊 Painel de preços", "🔔 Alertas de preço"])
+
 # Exibir resultados se existirem no estado da sessão
-if st.session_state.search_results is not None:
-    results = st.session_state.search_results
-    current_query = st.session_state.last_query
+with tab_results:
+    if st.session_state.search_results is not None:
+        results = st.session_state.search_results
+        current_query = st.session_state.last_query
 
-    if not results:
-        st.warning(f"Não encontramos nenhum suplemento com o termo '{current_query}' dentro dos filtros selecionados. Tente ajustar os filtros ou use 'teste' para simulação.")
+        if not results:
+            st.warning(f"Não encontramos nenhum suplemento com o termo '{current_query}' dentro dos filtros selecionados. Tente ajustar os filtros ou use 'teste' para simulação.")
+        else:
+            # Cabeçalho dos resultados
+            st.markdown(f"""
+                <div style='background-color: #f8f9fa; padding: 20px; border-radius: 10px; margin-bottom: 20px;'>
+                    <h2 style='margin: 0;'>Resultados para '{current_query}'</h2>
+                    <p style='margin: 0; color: #666;'>{len(results)} produtos encontrados</p>
+                </div>
+            """, unsafe_allow_html=True)
+
+            # Exportação para Excel (CSV quando não cabe numa planilha)
+            df_export = ProductBatch(results).to_pandas()
+            if not df_export.empty:
+                df_export_final = df_export[['brand', 'price', 'link', 'query_date', 'store', 'title']].copy()
+                df_export_final.rename(columns={
+                    'brand': 'Marca do produto',
+                    'price': 'Preco',
+                    'link': 'Link',
+                    'query_date': 'Data da consulta',
+                    'store': 'Loja',
+                    'title': 'Título Completo'
+                }, inplace=True)
+                file_name = f"pronutrition_busca_{current_query.replace(' ','_')}_{datetime.now().strftime('%Y%m%d_%H%M')}"
+                if len(df_export_final) > EXCEL_MAX_ROWS:
+                    st.download_button(
+                        label="📥 Exportar para CSV",
+                        data=df_export_final.to_csv(index=False).encode('utf-8'),
+                        file_name=f"{file_name}.csv",
+                        mime="text/csv",
+                        help="Resultados demais para uma planilha do Excel; baixe a tabela em CSV."
+                    )
+                else:
+                    excel_data = to_excel(df_export_final)
+                    st.download_button(
+                        label="📥 Exportar para Excel",
+                        data=excel_data,
+                        file_name=f"{file_name}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        help="Clique para baixar a tabela com os resultados da busca."
+                    )
+
+            # Exibição dos resultados em cards, paginada: 'teste 100000' traria 100 mil cards de uma vez
+            pages = max(1, -(-len(results) // CARDS_PER_PAGE))
+            page = 1
+            if pages > 1:
+                page = int(st.number_input(
+                    f"Página (de {pages}, {CARDS_PER_PAGE} produtos por página)",
+                    min_value=1, max_value=pages, step=1, key='results_page'
+                ))
+            first = (page - 1) * CARDS_PER_PAGE
+            cols = st.columns(3)
+            for i, item in enumerate(results[first:first + CARDS_PER_PAGE]):
+                with cols[i % 3]:
+                    st.markdown(f"""
+                        <div class='product-card' style='margin-top: 20px;'>
+                            <div style='text-align: center;'>
+                                <img src='{item.image_url}' style='max-width: 100%; height: auto; border-radius: 5px;'>
+                            </div>
+                            <h3 style='margin-top: 10px;'>{item.title[:50]}{'...' if len(item.title) > 50 else ''}</h3>
+                            <div class='price-tag'>R$ {item.price:.2f}</div>
+                            <div style='margin: 10px 0;'>
+                                <span class='store-badge'>{item.store}</span>
+                                <span class='brand-badge'>{item.brand}</span>
+                            </div>
+                            <a href='{item.link}' target='_blank' style='text-decoration: none;'>
+                                <button style="width: 100%; padding: 10px; background-color: black; color: white; border: none; border-radius: 5px; cursor: pointer;">
+                                    Ver na loja 🛒
+                                </button>
+                            </a>
+                        </div>
+                    """, unsafe_allow_html=True)
+
+# Painel de preços: lê só os agregados prontos (ver analytics.py)
+with tab_dashboard:
+    if analytics is None:
+        st.caption("Painel desativado. Defina SCRAPER_ANALYTICS_PATH para guardar os agregados de preço das buscas.")
     else:
-        # Cabeçalho dos resultados
-        st.markdown(f"""
-            <div style='background-color: #f8f9fa; padding: 20px; border-radius: 10px; margin-bottom: 20px;'>
-                <h2 style='margin: 0;'>Resultados para '{current_query}'</h2>
-                <p style='margin: 0; color: #666;'>{len(results)} produtos encontrados</p>
-            </div>
-        """, unsafe_allow_html=True)
-
-        # Exportação para Excel
-        df_export = pd.DataFrame(results)
-        if not df_export.empty:
-            df_export_final = df_export[['brand', 'price', 'link', 'query_date', 'store', 'title']].copy()
-            df_export_final.rename(columns={
-                'brand': 'Marca do produto',
-                'price': 'Preco',
-                'link': 'Link',
-                'query_date': 'Data da consulta',
-                'store': 'Loja',
-                'title': 'Título Completo'
-            }, inplace=True)
-            excel_data = to_excel(df_export_final)
-            st.download_button(
-                label="📥 Exportar para Excel",
-                data=excel_data,
-                file_name=f"pronutrition_busca_{current_query.replace(' ','_')}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                help="Clique para baixar a tabela com os resultados da busca."
+        known_products = analytics.known_products()
+        if not known_products:
+            st.caption("Ainda não há dados. Os agregados são atualizados a cada busca nas lojas.")
+        else:
+            current_key = canonicalize(st.session_state.last_query).key if st.session_state.last_query else None
+            dash_col1, dash_col2 = st.columns([2, 1])
+            with dash_col1:
+                product_key = st.selectbox(
+                    "Produto",
+                    options=known_products,
+                    index=known_products.index(current_key) if current_key in known_products else 0,
+                    help="Produtos agrupados pela busca canônica"
+                )
+            with dash_col2:
+                days = st.selectbox("Período", options=[7, 30, 90, 365], index=1, format_func=lambda d: f"Últimos {d} dias")
+            since = (datetime.now() - pd.Timedelta(days=days)).date().isoformat()
+
+            df_product = analytics.product_daily(query_key=product_key, since=since)
+            if not df_product.empty:
+                st.plotly_chart(px.line(
+                    df_product, x='day', y='median', color='store', markers=True,
+                    hover_data=['min_price', 'max_price', 'n'],
+                    labels={'day': 'Dia', 'median': 'Preço mediano (R$)', 'store': 'Loja'},
+                    title=f"Preço mediano por loja - {product_key}"
+                ), use_container_width=True)
+
+                latest = df_product[df_product['day'] == df_product['day'].max()].sort_values('min_price')
+                st.plotly_chart(px.bar(
+                    latest, x='store', y='min_price', color='store',
+                    labels={'store': 'Loja', 'min_price': 'Menor preço (R$)'},
+                    title=f"Menor preço por loja em {latest['day'].iloc[0]}"
+                ), use_container_width=True)
+
+            df_store = analytics.store_daily(since=since)
+            if not df_store.empty:
+                st.plotly_chart(px.line(
+                    df_store, x='day', y='median', color='store',
+                    labels={'day': 'Dia', 'median': 'Preço mediano (R$)', 'store': 'Loja'},
+                    title="Preço mediano por loja (todos os produtos)"
+                ), use_container_width=True)
+
+            df_brand = analytics.brand_daily(since=since)
+            if not df_brand.empty:
+                # Junta os dias do período: mínimo e máximo exatos, mediana ponderada pelas observações
+                df_brand['weighted'] = df_brand['median'] * df_brand['n']
+                brands = df_brand.groupby('brand').agg(
+                    min_price=('min_price', 'min'), max_price=('max_price', 'max'),
+                    weighted=('weighted', 'sum'), n=('n', 'sum')
+                ).reset_index()
+                brands['median'] = brands['weighted'] / brands['n']
+                brands = brands.nlargest(20, 'n').sort_values('median')
+                st.plotly_chart(px.scatter(
+                    brands, x='brand', y='median',
+                    error_y=brands['max_price'] - brands['median'],
+                    error_y_minus=brands['median'] - brands['min_price'],
+                    size='n',
+                    labels={'brand': 'Marca', 'median': 'Preço (R$)', 'n': 'Observações'},
+                    title="Faixa de preço por marca (mínimo, mediana e máximo)"
+                ), use_container_width=True)
+
+# Alertas de preço: alvos cadastrados e alertas disparados pelas buscas
+with tab_alerts:
+    if watchlist is None:
+        st.caption("Alertas desativados. Defina SCRAPER_WATCHLIST_PATH para observar preços.")
+    else:
+        with st.form(key='watch_form'):
+            st.markdown("**Avise-me quando o preço cair**")
+            watch_col1, watch_col2 = st.columns([2, 1])
+            with watch_col1:
+                watch_query = st.text_input("Produto", value=st.session_state.last_query, placeholder="Ex: Whey Protein")
+            with watch_col2:
+                watch_price = st.number_input("Preço-alvo (R$)", min_value=1.0, value=100.0, step=5.0, format="%.2f")
+            watch_stores = st.multiselect("Lojas (vazio = todas)", options=AVAILABLE_STORES)
+            if st.form_submit_button("🔔 Criar alerta") and watch_query:
+                watchlist.add(watch_query, watch_price, watch_stores or None)
+                st.success(f"Alerta criado: '{watch_query}' abaixo de R$ {watch_price:.2f}")
+
+        alerts = watchlist.alerts()
+        if alerts:
+            st.markdown("**Alertas disparados**")
+            df_alerts = pd.DataFrame(alerts)
+            df_alerts['triggered_at'] = pd.to_datetime(df_alerts['triggered_at'], unit='s').dt.strftime('%d/%m/%Y %H:%M')
+            st.dataframe(
+                df_alerts[['triggered_at', 'query', 'target_price', 'price', 'store', 'title', 'link']],
+                column_config={
+                    'triggered_at': 'Quando',
+                    'query': 'Busca',
+                    'target_price': st.column_config.NumberColumn('Preço-alvo', format="R$ %.2f"),
+                    'price': st.column_config.NumberColumn('Preço', format="R$ %.2f"),
+                    'store': 'Loja',
+                    'title': 'Produto',
+                    'link': st.column_config.LinkColumn('Link'),
+                },
+                hide_index=True
             )
 
-        # Exibição dos resultados em cards
-        cols = st.columns(3)
-        for i, item in enumerate(results):
-            with cols[i % 3]:
-                st.markdown(f"""
-                    <div class='product-card' style='margin-top: 20px;'>
-                        <div style='text-align: center;'>
-                            <img src='{item['image_url']}' style='max-width: 100%; height: auto; border-radius: 5px;'>
-                        </div>
-                        <h3 style='margin-top: 10px;'>{item['title'][:50]}{'...' if len(item['title']) > 50 else ''}</h3>
-                        <div class='price-tag'>R$ {float(item['price']):.2f}</div>
-                        <div style='margin: 10px 0;'>
-                            <span class='store-badge'>{item['store']}</span>
-                            <span class='brand-badge'>{item.get('brand', 'Sem marca')}</span>
-                        </div>
-                        <a href='{item['link']}' target='_blank' style='text-decoration: none;'>
-                            <button style="width: 100%; padding: 10px; background-color: black; color: white; border: none; border-radius: 5px; cursor: pointer;">
-                                Ver na loja 🛒
-                            </button>
-                        </a>
-                    </div>
-                """, unsafe_allow_html=True)
-st.info("💡 Dica: Digite 'teste' para ver resultados simulados e testar o app!")
+        watches = watchlist.watches()
+        if watches:
+            st.markdown("**Alvos cadastrados**")
+            for watch in watches:
+                watch_col1, watch_col2 = st.columns([4, 1])
+                with watch_col1:
+                    stores_label = ', '.join(watch['stores']) if watch['stores'] else 'todas as lojas'
+                    last_alert = f" - último alerta R$ {watch['last_alert_price']:.2f}" if watch['last_alert_price'] else ""
+                    st.markdown(f"'{watch['query']}' abaixo de R$ {watch['target_price']:.2f} ({stores_label}){last_alert}")
+                with watch_col2:
+                    if st.button("Remover", key=f"remove_watch_{watch['id']}"):
+                        watchlist.remove(watch['id'])
+                        st.rerun()
+
+st.info("💡 Dica: Digite 'teste' para ver resultados simulados e testar o app! 'teste 100000' gera 100 mil ofertas sintéticas.")
+
+# Modo debug: waterfall com as fases da última busca
+if st.checkbox("🛠️ Modo debug", value=False, help="Mostra o tempo de cada fase da última busca"):
+    last_search_id = st.session_state.get('last_search_id')
+    trace = service_client.get_trace(last_search_id) if service_client else scraper.tracer.get(last_search_id)
+    if not trace:
+        st.caption("Nenhum trace disponível. Faça uma busca com o modo debug ligado.")
+    else:
+        df_trace = pd.DataFrame(trace['spans'])
+        df_trace['store'] = df_trace['store'].fillna('Busca')
+        df_trace['label'] = df_trace['store'] + ' · ' + df_trace['name']
+        df_trace['tags'] = df_trace.get('tags', pd.Series(dtype=object)).apply(lambda tags: json.dumps(tags, ensure_ascii=False) if isinstance(tags, dict) else '')
+        fig = px.bar(
+            df_trace,
+            x='duration_ms',
+            y='label',
+            base='start_ms',
+            color='name',
+            orientation='h',
+            hover_data=['search_id', 'start_ms', 'duration_ms', 'tags'],
+            title=f"Busca {trace['search_id']} - '{trace['query']}'"
+        )
+        fig.update_yaxes(autorange='reversed', title=None)
+        fig.update_xaxes(title='ms desde o início da busca')
+        fig.update_layout(height=max(300, 22 * df_trace['label'].nunique()))
+        st.plotly_chart(fig, use_container_width=True)
+        st.download_button(
+            label="📥 Exportar trace (JSON lines)",
+            data=json.dumps(trace, ensure_ascii=False) + '\n',
+            file_name=f"trace_{trace['search_id']}.jsonl",
+            mime="application/x-ndjson"
+        )
+
+    # Quais lojas o planejador escolheu e por quê
+    last_plan = st.session_state.get('last_plan')
+    if last_plan:
+        st.markdown(f"**Plano de lojas** - categoria '{last_plan['category']}', ~{last_plan['expected_results']} resultados esperados")
+        st.dataframe(pd.DataFrame([
+            {
+                'Loja': store,
+                'Decisão': 'explorada' if store in last_plan['explored'] else 'consultada' if store in last_plan['stores'] else 'pulada',
+                'Motivo': last_plan['skipped'].get(store, ''),
+                'Rendimento': last_plan['estimates'].get(store, {}).get('fill'),
+                'Latência (s)': last_plan['estimates'].get(store, {}).get('latency_s'),
+            }
+            for store in list(last_plan['stores']) + list(last_plan['skipped'])
+        ]), hide_index=True)
+
+    # Memória da última busca (SCRAPER_MEMORY_REPORT=1)
+    last_memory = st.session_state.get('last_memory')
+    if last_memory and last_memory['stores']:
+        st.markdown(f"**Memória** - pico {last_memory['peak_kb']:.0f} KB, páginas baixadas {last_memory['body_kb']:.0f} KB")
+        st.dataframe(pd.DataFrame([
+            {'Loja': store, 'Páginas': stats['pages'], 'Corpo (KB)': stats['body_kb'],
+             'Pico do parsing (KB)': stats['parse_peak_kb'], 'Retido (KB)': stats['retained_kb']}
+            for store, stats in last_memory['stores'].items()
+        ]), hide_index=True)
+
+    # Qual variante de seletor cada loja está usando
+    selector_stats = scraper.selectors.stats() if scraper else None
+    if selector_stats:
+        st.markdown("**Seletores aprendidos por loja**")
+        st.dataframe(pd.DataFrame([
+            {'Loja': store, 'Campo': field, 'Seletor': stats['learned'], 'Acertos': stats['hits'],
+             'Falhas': stats['misses'], 'Sem resultado': stats['empty']}
+            for store, fields in selector_stats.items()
+            for field, stats in fields.items()
+        ]), hide_index=True)
 
 # Rodapé
 st.markdown("--- ")
@@ -0,0 +1,106 @@
+import logging
+import threading
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import tracing
+
+# Relatório de memória opcional, com tracemalloc. O pico de cada loja é
+# medido no parsing de cada página (corpo da resposta, árvore do HTML e
+# produtos extraídos), que é onde a memória de uma busca chega ao máximo.
+# O tracemalloc só tem um pico para o processo inteiro: o pico só é zerado
+# quando nenhuma medição está em andamento, e medições simultâneas dividem o
+# pico desde que a primeira começou, assim como os downloads de outras
+# lojas no mesmo intervalo. Para números limpos por loja, meça com poucas
+# buscas simultâneas. O lock cobre só a leitura do tracemalloc e a conta,
+# nunca o parsing (com parse_mode='process' as esperas pelo pool seguem em
+# paralelo).
+# O pico da busca é o maior pico medido nas suas lojas. Só mede o processo
+# atual: com parse_mode='process' o parsing fica fora da conta.
+
+KEEP = 50   # relatórios de busca guardados
+
+
+def _kb(size):
+    return round(size / 1024, 1)
+
+
+class _SearchMemory:
+    __slots__ = ('stores', 'peak')
+
+    def __init__(self):
+        self.stores = {}
+        self.peak = 0
+
+    def add(self, store_name, body_bytes, parse_peak, retained, peak):
+        store = self.stores.setdefault(store_name, {'pages': 0, 'body_kb': 0.0, 'parse_peak_kb': 0.0, 'retained_kb': 0.0})
+        store['pages'] += 1
+        store['body_kb'] = round(store['body_kb'] + _kb(body_bytes), 1)
+        store['parse_peak_kb'] = max(store['parse_peak_kb'], _kb(parse_peak))
+        store['retained_kb'] = round(store['retained_kb'] + _kb(max(retained, 0)), 1)
+        self.peak = max(self.peak, peak)
+
+    def to_dict(self):
+        return {
+            'peak_kb': _kb(self.peak),
+            'body_kb': round(sum(store['body_kb'] for store in self.stores.values()), 1),
+            'stores': self.stores,
+        }
+
+
+class MemoryProfiler:
+    def __init__(self, keep=KEEP):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._lock = threading.Lock()
+        self._active = 0                 # medições em andamento
+        self._searches = OrderedDict()   # ID da busca -> _SearchMemory
+        self.keep = keep
+
+    @contextmanager
+    def measure(self, store_name, body_bytes):
+        """Mede o pico de memória do bloco (o parsing de uma página) para a busca atual."""
+        with self._lock:
+            if not self._active:
+                tracemalloc.reset_peak()
+            self._active += 1
+            before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                current, peak = tracemalloc.get_traced_memory()
+                search = self._searches.get(tracing.search_id())
+                if search is None:
+                    search = self._searches[tracing.search_id()] = _SearchMemory()
+                    while len(self._searches) > self.keep:
+                        self._searches.popitem(last=False)
+                search.add(store_name, body_bytes, peak - before, current - before, peak)
+
+    def report(self, search_id):
+        """Relatório da busca: pico do processo, corpos baixados e, por loja, pico do parsing e memória retida."""
+        with self._lock:
+            search = self._searches.get(search_id)
+            data = search.to_dict() if search else {'peak_kb': 0.0, 'body_kb': 0.0, 'stores': {}}
+        if data['stores']:
+            worst = max(data['stores'], key=lambda name: data['stores'][name]['parse_peak_kb'])
+            logging.info(
+                f"Memória da busca {search_id}: pico {data['peak_kb']:.0f} KB, corpos {data['body_kb']:.0f} KB, "
+                f"maior parsing {worst} ({data['stores'][worst]['parse_peak_kb']:.0f} KB)"
+            )
+        return data
+
+
+_shared_profiler = None
+_shared_profiler_lock = threading.Lock()
+
+
+def get_memory_profiler():
+    """Devolve o medidor de memória do processo (liga o tracemalloc na primeira chamada)."""
+    global _shared_profiler
+    with _shared_profiler_lock:
+        if _shared_profiler is None:
+            _shared_profiler = MemoryProfiler()
+        return _shared_profiler
@@ -0,0 +1,107 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from products import Product
+
+# Memória das extrações já feitas. As páginas de busca das consultas
+# populares costumam voltar idênticas (ou quase) entre uma atualização e
+# outra; em vez de montar o DOM e passar os seletores de novo, a página vira
+# um hash e, se a mesma loja já extraiu uma página igual com a mesma
+# especificação, os produtos saem direto daqui. Antes do hash saem os trechos
+# que mudam a cada resposta sem mudar os produtos (tokens CSRF, nonces, IDs de
+# requisição e os padrões 'volatile' da loja). A chave inclui a versão dos
+# extratores e uma impressão digital da especificação da loja, então mudar
+# um seletor invalida as entradas antigas sem precisar limpar nada.
+
+# Aumente ao mudar o código dos extratores de um jeito que altere os produtos
+EXTRACTOR_VERSION = 1
+MAX_ENTRIES = 512
+
+# Campos cujo valor muda a cada resposta: nonce="...", csrf_token: "...",
+# "requestId":"...", data-session-id='...'. Cada padrão começa com um trecho
+# fixo (sem IGNORECASE), o que deixa a busca rápida mesmo em páginas de MBs.
+_VALUE = rb'["\']?\s*[=:]\s*["\']?)[^"\'\s>&,;}]+'
+VOLATILE_FIELDS = tuple(
+    re.compile(rb'(' + name + _VALUE)
+    for name in (
+        rb'nonce', rb'csrf[\w-]*', rb'CSRF[\w-]*', rb'xsrf[\w-]*', rb'XSRF[\w-]*', rb'authenticity_token',
+        rb'request[-_]?[iI][dD]', rb'Request[-_]?[iI][dD]', rb'session[-_]?[iI][dD]', rb'Session[-_]?[iI][dD]',
+    )
+)
+# <meta name="csrf-token" content="...">
+VOLATILE_META = re.compile(rb'(<meta[^>]+name=["\'][\w-]*(?:csrf|xsrf)[\w-]*["\'][^>]*content=["\'])[^"\']*', re.IGNORECASE)
+
+
+def page_fingerprint(content, volatile=()):
+    """Hash do corpo sem os trechos voláteis."""
+    # Mantém o nome do campo e descarta o valor
+    normalized = VOLATILE_META.sub(rb'\1', content)
+    for pattern in VOLATILE_FIELDS:
+        normalized = pattern.sub(rb'\1', normalized)
+    for pattern in volatile:
+        normalized = re.sub(pattern, b'', normalized)
+    return hashlib.blake2b(normalized, digest_size=16).digest()
+
+
+def spec_fingerprint(spec):
+    return hashlib.blake2b(repr(sorted(spec.items())).encode('utf-8'), digest_size=8).digest()
+
+
+class ParseMemo:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # chave -> (linhas dos produtos sem a data, caminho, descartados)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, store_name, spec, content, max_results, price_range):
+        return (
+            store_name, EXTRACTOR_VERSION, spec_fingerprint(spec),
+            page_fingerprint(content, spec.get('volatile', ())), max_results, price_range,
+        )
+
+    def get(self, key, query_date):
+        """(produtos, caminho, descartados) já extraídos da mesma página, com a data da busca atual."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        rows, path, dropped = entry
+        return [Product(*row, query_date) for row in rows], path, dropped
+
+    def put(self, key, products, path, dropped):
+        rows = tuple((p.title, p.price, p.image_url, p.link, p.store, p.brand) for p in products)
+        with self._lock:
+            self._entries[key] = (rows, path, dropped)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+            }
+
+
+_shared_memo = None
+_shared_memo_lock = threading.Lock()
+
+
+def get_parse_memo():
+    """Devolve a memória de extrações do processo."""
+    global _shared_memo
+    with _shared_memo_lock:
+        if _shared_memo is None:
+            _shared_memo = ParseMemo()
+        return _shared_memo
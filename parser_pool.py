@@ -0,0 +1,84 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+
+from adaptive_selectors import get_selector_learner
+
+# Pool de processos que faz o parsing do HTML das lojas fora do processo do
+# Streamlit. As threads de busca continuam cuidando da rede e enviam apenas os
+# bytes da resposta; os workers devolvem listas de produtos já extraídos. Os
+# seletores aprendidos (ver adaptive_selectors.py) ficam no processo
+# principal: vão com cada página e o que o worker observou volta com o
+# resultado.
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Pré-carrega o scraper e as especificações das lojas no worker."""
+    from bs4 import BeautifulSoup
+    import scraper
+
+    # Aquece o parser e os seletores para que a primeira página não pague o custo
+    BeautifulSoup('<html><body><div class="product-item"></div></body></html>', 'html.parser').select(
+        scraper.CATALOGO_SELECTORS['item_selector']
+    )
+    logging.info(f"Worker de parsing {os.getpid()} pronto com {len(scraper.STORE_SPECS)} lojas")
+
+
+def _parse_page(store_name, content, max_results, query_date, price_range=None, learned=None):
+    from adaptive_selectors import get_selector_learner
+    from scraper import extract_products
+    learner = get_selector_learner()
+    if learned is not None:
+        learner.seed(store_name, learned)
+    with learner.capture() as pages:
+        result = extract_products(store_name, content, max_results, query_date, price_range)
+    return result, pages
+
+
+def _ping():
+    return os.getpid()
+
+
+class ParserPool:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # 'spawn' evita herdar threads e sockets do servidor Streamlit via fork
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+        self._warm_up()
+
+    def _warm_up(self):
+        """Sobe todos os workers antes da primeira busca."""
+        futures = [self._executor.submit(_ping) for _ in range(self.max_workers)]
+        pids = {future.result() for future in futures}
+        logging.info(f"Pool de parsing iniciado com {len(pids)} workers")
+
+    def submit(self, store_name, content, max_results, query_date, price_range=None):
+        """Envia a página ao pool; o futuro traz (resultado de extract_products, páginas de seletores para merge())."""
+        learned = get_selector_learner().learned(store_name)
+        return self._executor.submit(_parse_page, store_name, content, max_results, query_date, price_range, learned)
+
+    def parse(self, store_name, content, max_results, query_date, price_range=None):
+        result, pages = self.submit(store_name, content, max_results, query_date, price_range).result()
+        get_selector_learner().merge(pages)
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def get_parser_pool(max_workers=None):
+    """Devolve o pool compartilhado pelo processo, criando-o na primeira chamada."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ParserPool(max_workers)
+        return _shared_pool
@@ -0,0 +1,208 @@
+import logging
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+from queries import SYNONYMS, canonicalize
+
+# Planejamento das lojas de cada busca. Para cada (categoria da busca, loja)
+# ficam médias móveis de quanto a loja rende (fração de max_results devolvida
+# em produtos válidos) e de quanto demora. Com isso o plano deixa de fora as
+# lojas que quase nunca têm aquele tipo de produto, as que não cabem no prazo
+# e, com uma meta de resultados, as que não seriam necessárias para atingi-la;
+# as restantes são ordenadas por rendimento por segundo. Uma parte das lojas
+# descartadas entra mesmo assim, começando pelas avaliadas há mais tempo, para
+# as estimativas não envelhecerem. O histórico é do processo atual.
+# Buscas sem categoria conhecida ('geral') não são planejadas: o rendimento de
+# 'colágeno' não diz nada sobre 'ômega 3'. Lojas escolhidas pelo usuário
+# (required) só são reordenadas, nunca deixadas de fora.
+
+ALPHA = 0.2             # peso de cada busca nova nas médias móveis
+MIN_SAMPLES = 3         # abaixo disso a loja é sempre consultada
+MIN_FILL = 0.1          # rendimento abaixo do qual a loja fica de fora
+EXPLORATION = 0.1       # fração das lojas descartadas consultadas mesmo assim
+DEFAULT_CATEGORY = 'geral'
+
+
+def query_category(query):
+    """Categoria da busca: a primeira forma curta conhecida (whey, creatina...) ou 'geral'."""
+    text = canonicalize(query).text
+    for term in text.split():
+        if term in SYNONYMS:
+            return term
+    for short in SYNONYMS:
+        if ' ' in short and short in text:
+            return short
+    return DEFAULT_CATEGORY
+
+
+class _StoreStats:
+    __slots__ = ('observed', 'samples', 'fill', 'latency', 'deviation', 'updated_at')
+
+    def __init__(self):
+        self.observed = 0   # buscas registradas, inclusive as que passaram do prazo
+        self.samples = 0    # buscas com rendimento conhecido
+        self.fill = 0.0
+        self.latency = 0.0
+        self.deviation = 0.0
+        self.updated_at = 0.0
+
+    def observe_latency(self, latency):
+        if self.observed == 0:
+            self.latency = latency
+        else:
+            self.deviation += ALPHA * (abs(latency - self.latency) - self.deviation)
+            self.latency += ALPHA * (latency - self.latency)
+        self.observed += 1
+
+    def observe_fill(self, fill):
+        self.fill = fill if self.samples == 0 else self.fill + ALPHA * (fill - self.fill)
+        self.samples += 1
+
+    @property
+    def slow_latency(self):
+        """Estimativa pessimista da latência, usada contra o prazo."""
+        return self.latency + 2 * self.deviation
+
+    def to_dict(self):
+        return {
+            'observed': self.observed,
+            'samples': self.samples,
+            'fill': round(self.fill, 3),
+            'latency_s': round(self.latency, 3),
+            'slow_latency_s': round(self.slow_latency, 3),
+        }
+
+
+@dataclass(slots=True)
+class StorePlan:
+    category: str
+    stores: list                                  # lojas a consultar, na ordem de envio
+    skipped: dict = field(default_factory=dict)   # loja -> motivo
+    explored: list = field(default_factory=list)  # lojas incluídas só para exploração
+    expected_results: float = 0.0
+    deadline: float = None
+    target: int = None
+    estimates: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return {
+            'category': self.category,
+            'stores': list(self.stores),
+            'skipped': dict(self.skipped),
+            'explored': list(self.explored),
+            'expected_results': round(self.expected_results, 1),
+            'deadline': self.deadline,
+            'target': self.target,
+            'estimates': self.estimates,
+        }
+
+
+class StorePlanner:
+    def __init__(self, exploration=EXPLORATION, min_samples=MIN_SAMPLES, min_fill=MIN_FILL, seed=None):
+        self.exploration = exploration
+        self.min_samples = min_samples
+        self.min_fill = min_fill
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {}  # (categoria, loja) -> _StoreStats
+
+    def plan(self, query, stores, max_results, deadline=None, target=None, required=()):
+        """Escolhe e ordena as lojas a consultar para a busca; as lojas em required ficam sempre."""
+        category = query_category(query)
+        if category == DEFAULT_CATEGORY:
+            return StorePlan(category, list(stores), deadline=deadline, target=target,
+                             expected_results=float(len(stores) * max_results))
+        required = set(required)
+        with self._lock:
+            stats = {store_name: self._stats.get((category, store_name)) for store_name in stores}
+            draw = self._random.random()
+
+        def cold(store_name):
+            return stats[store_name] is None or stats[store_name].observed < self.min_samples
+
+        def score(store_name):
+            if cold(store_name) or stats[store_name].samples == 0:
+                return math.inf
+            return stats[store_name].fill / max(stats[store_name].latency, 0.05)
+
+        plan = StorePlan(category, [], deadline=deadline, target=target)
+        for store_name in stores:
+            if stats[store_name] is not None:
+                plan.estimates[store_name] = stats[store_name].to_dict()
+
+        for store_name in sorted(stores, key=score, reverse=True):
+            store_stats = stats[store_name]
+            if cold(store_name) or store_name in required:
+                pass
+            elif deadline and store_stats.slow_latency > deadline:
+                plan.skipped[store_name] = f"demora ~{store_stats.slow_latency:.1f}s, acima do prazo"
+                continue
+            elif store_stats.samples >= self.min_samples and store_stats.fill < self.min_fill:
+                plan.skipped[store_name] = f"rende {store_stats.fill:.0%} em '{category}'"
+                continue
+            elif target and plan.expected_results >= target:
+                plan.skipped[store_name] = "meta de resultados já coberta"
+                continue
+            plan.stores.append(store_name)
+            plan.expected_results += (store_stats.fill if store_stats and store_stats.samples else 1.0) * max_results
+
+        # Exploração: parte das descartadas, as avaliadas há mais tempo primeiro
+        share = self.exploration * len(plan.skipped)
+        explore = int(share) + (1 if draw < share - int(share) else 0)
+        if not plan.stores and plan.skipped:
+            explore = max(explore, 1)
+        for store_name in sorted(plan.skipped, key=lambda name: stats[name].updated_at)[:explore]:
+            del plan.skipped[store_name]
+            plan.stores.append(store_name)
+            plan.explored.append(store_name)
+
+        if plan.skipped:
+            logging.info(
+                f"Plano para '{query}' ({category}): {len(plan.stores)} lojas, "
+                f"fora: {', '.join(plan.skipped)}" + (f"; explorando: {', '.join(plan.explored)}" if plan.explored else "")
+            )
+        return plan
+
+    def record(self, category, store_name, products, max_results, latency):
+        """Registra o resultado de uma loja; products None (passou do prazo) só atualiza a latência."""
+        if category == DEFAULT_CATEGORY:
+            return
+        with self._lock:
+            stats = self._stats.get((category, store_name))
+            if stats is None:
+                stats = self._stats[(category, store_name)] = _StoreStats()
+            stats.observe_latency(latency)
+            if products is not None:
+                stats.observe_fill(min(1.0, products / max(max_results, 1)))
+            stats.updated_at = time.time()
+
+    def forget(self, category=None):
+        with self._lock:
+            if category is None:
+                self._stats.clear()
+            else:
+                for key in [key for key in self._stats if key[0] == category]:
+                    del self._stats[key]
+
+    def stats(self):
+        with self._lock:
+            by_category = {}
+            for (category, store_name), stats in self._stats.items():
+                by_category.setdefault(category, {})[store_name] = stats.to_dict()
+            return by_category
+
+
+_shared_planner = None
+_shared_planner_lock = threading.Lock()
+
+
+def get_store_planner():
+    """Devolve o planejador compartilhado pelo processo."""
+    global _shared_planner
+    with _shared_planner_lock:
+        if _shared_planner is None:
+            _shared_planner = StorePlanner()
+        return _shared_planner
@@ -0,0 +1,164 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from products import Product, ProductBatch
+from queries import canonicalize
+
+# Índice local de texto completo (SQLite FTS5) com todos os produtos que o
+# scraper já devolveu. Cada busca ao vivo insere seus resultados; o modo
+# 'index' do scraper responde direto daqui, ordenando por BM25.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    link TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    price REAL NOT NULL,
+    image_url TEXT,
+    store TEXT NOT NULL,
+    brand TEXT,
+    last_seen REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    title, brand, store,
+    content='products', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts(rowid, title, brand, store) VALUES (new.id, new.title, new.brand, new.store);
+END;
+CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts(products_fts, rowid, title, brand, store) VALUES ('delete', old.id, old.title, old.brand, old.store);
+END;
+CREATE TABLE IF NOT EXISTS queries (
+    text TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts(products_fts, rowid, title, brand, store) VALUES ('delete', old.id, old.title, old.brand, old.store);
+    INSERT INTO products_fts(rowid, title, brand, store) VALUES (new.id, new.title, new.brand, new.store);
+END;
+"""
+
+UPSERT = """
+INSERT INTO products (link, title, price, image_url, store, brand, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(link) DO UPDATE SET
+    title = excluded.title,
+    price = excluded.price,
+    image_url = excluded.image_url,
+    store = excluded.store,
+    brand = excluded.brand,
+    last_seen = excluded.last_seen
+"""
+
+# Pesos do BM25 por coluna: título, marca, loja
+SEARCH = """
+SELECT title, price, image_url, link, store, brand, last_seen FROM (
+    SELECT p.*, ROW_NUMBER() OVER (PARTITION BY p.store ORDER BY f.rank) AS store_rank, f.rank AS rank
+    FROM products_fts f JOIN products p ON p.id = f.rowid
+    WHERE products_fts MATCH ? AND rank MATCH 'bm25(10.0, 5.0, 1.0)'{filters}
+)
+WHERE store_rank <= ?
+ORDER BY rank
+"""
+
+
+def fts_query(query):
+    """Converte a busca canônica em uma expressão FTS5 (todos os termos, por prefixo)."""
+    terms = canonicalize(query).text.split()
+    return ' AND '.join('"' + term.replace('"', '') + '"*' for term in terms if term.replace('"', ''))
+
+
+def search_sql(expression, max_results, stores=None, price_range=None):
+    filters, params = [], [expression]
+    if stores:
+        filters.append(f"p.store IN ({', '.join('?' * len(stores))})")
+        params.extend(stores)
+    low, high = price_range or (None, None)
+    if low is not None:
+        filters.append('p.price >= ?')
+        params.append(low)
+    if high is not None:
+        filters.append('p.price <= ?')
+        params.append(high)
+    params.append(max_results)
+    return SEARCH.format(filters=''.join(f' AND {clause}' for clause in filters)), params
+
+
+class ProductIndex:
+    def __init__(self, path='data/products.db'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+
+    def add(self, products, seen_at=None):
+        """Insere ou atualiza os produtos de uma busca."""
+        seen_at = seen_at or time.time()
+        rows = [
+            (p.link, p.title, p.price, p.image_url, p.store, p.brand, seen_at)
+            for p in products
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, rows)
+        return len(rows)
+
+    def record_query(self, query, seen_at=None):
+        """Conta uma busca ao vivo que trouxe resultados (forma canônica), fonte das sugestões."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO queries (text, n, last_seen) VALUES (?, 1, ?) '
+                'ON CONFLICT(text) DO UPDATE SET n = n + 1, last_seen = excluded.last_seen',
+                (canonicalize(query).text, seen_at or time.time())
+            )
+
+    def suggestion_sources(self):
+        """(buscas, marcas, títulos), cada um como pares (texto, ocorrências), para o índice de sugestões."""
+        with self._lock:
+            queries = self._conn.execute('SELECT text, n FROM queries').fetchall()
+            brands = self._conn.execute('SELECT brand, COUNT(*) FROM products WHERE brand IS NOT NULL GROUP BY brand').fetchall()
+            titles = self._conn.execute('SELECT title, COUNT(*) FROM products GROUP BY title').fetchall()
+        return queries, brands, titles
+
+    def search(self, query, max_results=5, stores=None, price_range=None):
+        """Busca no índice; query_date de cada produto é a última vez em que foi visto.
+
+        stores e price_range (mínimo, máximo) filtram antes do limite por loja.
+        """
+        expression = fts_query(query)
+        batch = ProductBatch()
+        if not expression:
+            return batch
+
+        started = time.perf_counter()
+        with self._lock:
+            try:
+                rows = self._conn.execute(*search_sql(expression, max_results, stores, price_range)).fetchall()
+            except sqlite3.OperationalError as e:
+                logging.error(f"Erro ao consultar o índice local: {str(e)}")
+                return batch
+
+        for title, price, image_url, link, store, brand, last_seen in rows:
+            seen = datetime.fromtimestamp(last_seen).strftime('%Y-%m-%d %H:%M:%S')
+            batch.append(Product(title, price, image_url, link, store, brand, seen))
+        logging.info(f"Índice local: {len(batch)} produtos para '{query}' em {(time.perf_counter() - started) * 1000:.1f} ms")
+        return batch
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,177 @@
+import sys
+from array import array
+from dataclasses import asdict, dataclass
+
+# Registro de produto com esquema fixo e o contêiner colunar usado para
+# devolver os resultados das buscas. Loja e marca são internadas e, no lote,
+# guardadas como códigos de dicionário; o preço fica num array de doubles.
+
+try:
+    import numpy as np
+except ImportError:  # numpy vem junto com o pandas, mas é opcional aqui
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow é opcional
+    pa = None
+
+UNKNOWN_BRAND = "Marca Desconhecida"
+
+FIELDS = ('title', 'price', 'image_url', 'link', 'store', 'brand', 'query_date')
+
+
+@dataclass(slots=True)
+class Product:
+    title: str
+    price: float
+    image_url: str
+    link: str
+    store: str
+    brand: str = UNKNOWN_BRAND
+    query_date: str = ''
+
+    def __post_init__(self):
+        self.price = float(self.price)
+        self.store = sys.intern(self.store)
+        self.brand = sys.intern(self.brand or UNKNOWN_BRAND)
+        self.query_date = sys.intern(self.query_date)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class _Dictionary:
+    """Dicionário de strings repetidas (loja, marca, data) com códigos inteiros."""
+
+    __slots__ = ('values', 'index', 'codes')
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes = array('i')
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        self.codes.append(code)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+
+class FrozenBatchError(RuntimeError):
+    """O lote já foi exportado sem cópia e não pode mais crescer."""
+
+
+class ProductBatch:
+    """Lote colunar de produtos, um array por campo."""
+
+    def __init__(self, products=()):
+        # Exportado sem cópia: os arrays estão emprestados ao DataFrame/tabela Arrow
+        self.frozen = False
+        self.titles = []
+        self.prices = array('d')
+        self.image_urls = []
+        self.links = []
+        self.stores = _Dictionary()
+        self.brands = _Dictionary()
+        self.query_dates = _Dictionary()
+        self.extend(products)
+
+    def append(self, product):
+        if self.frozen:
+            raise FrozenBatchError(
+                "Lote já exportado com to_pandas()/to_arrow() sem cópia; "
+                "use copy=True na exportação ou crie outro lote"
+            )
+        self.titles.append(product.title)
+        self.prices.append(product.price)
+        self.image_urls.append(product.image_url)
+        self.links.append(product.link)
+        self.stores.append(product.store)
+        self.brands.append(product.brand)
+        self.query_dates.append(product.query_date)
+
+    def extend(self, products):
+        for product in products:
+            self.append(product)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __bool__(self):
+        return bool(self.titles)
+
+    def __getitem__(self, i):
+        return Product(
+            self.titles[i], self.prices[i], self.image_urls[i], self.links[i],
+            self.stores[i], self.brands[i], self.query_dates[i]
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_records(self):
+        return [product.to_dict() for product in self]
+
+    def to_pandas(self, copy=False):
+        """Monta um DataFrame; preço e códigos de loja/marca são usados sem cópia.
+
+        O DataFrame compartilha a memória do lote, que fica congelado: append()
+        e extend() passam a levantar FrozenBatchError. Com copy=True os arrays
+        são copiados e o lote continua podendo crescer.
+        """
+        import pandas as pd
+
+        def buffer(values, dtype):
+            if np is None:
+                return list(values)
+            return np.array(values, dtype=dtype) if copy else np.frombuffer(values, dtype=dtype)
+
+        def categorical(column):
+            return pd.Categorical.from_codes(buffer(column.codes, 'int32'), categories=pd.Index(column.values, dtype=object))
+
+        prices = buffer(self.prices, 'float64')
+        if np is not None and not copy:
+            self.frozen = True
+        return pd.DataFrame({
+            'title': self.titles,
+            'price': prices,
+            'image_url': self.image_urls,
+            'link': self.links,
+            'store': categorical(self.stores),
+            'brand': categorical(self.brands),
+            'query_date': categorical(self.query_dates),
+        }, columns=list(FIELDS), copy=False)
+
+    def to_arrow(self, copy=False):
+        """Monta uma pyarrow.Table; preço e códigos viram buffers Arrow sem cópia.
+
+        Como em to_pandas(), sem copy=True o lote fica congelado.
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow não está instalado")
+
+        def buffer(values):
+            return pa.py_buffer(values.tobytes() if copy else values)
+
+        def dictionary(column):
+            codes = pa.Array.from_buffers(pa.int32(), len(column.codes), [None, buffer(column.codes)])
+            return pa.DictionaryArray.from_arrays(codes, pa.array(column.values, type=pa.string()))
+
+        prices = pa.Array.from_buffers(pa.float64(), len(self.prices), [None, buffer(self.prices)])
+        if not copy:
+            self.frozen = True
+        return pa.table({
+            'title': pa.array(self.titles, type=pa.string()),
+            'price': prices,
+            'image_url': pa.array(self.image_urls, type=pa.string()),
+            'link': pa.array(self.links, type=pa.string()),
+            'store': dictionary(self.stores),
+            'brand': dictionary(self.brands),
+            'query_date': dictionary(self.query_dates),
+        })
@@ -0,0 +1,120 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Canonicalização das buscas. "Creatina ", "CREATINA" e "creatína" viram a
+# mesma chave, usada no histórico, nos agregados e na lista de observação. A
+# forma canônica perde informação (sinônimos, stop words, ordem), então só
+# serve de chave: as lojas recebem o texto digitado, apenas normalizado, e as
+# de busca literal ganham a forma expandida dos termos curtos ('whey' ->
+# 'whey protein'). O cache e a coalescência das buscas numa loja usam esse
+# texto enviado (for_store), para que dois textos que a loja responde de
+# forma diferente nunca dividam o resultado.
+
+# Forma curta canônica -> forma expandida enviada às lojas que buscam literalmente
+SYNONYMS = {
+    'whey': 'whey protein',
+    'bcaa': 'aminoacidos bcaa',
+    'creatina': 'creatina',
+    'glutamina': 'glutamina',
+    'pre treino': 'pre treino',
+    'hipercalorico': 'hipercalorico',
+    'multivitaminico': 'multivitaminico',
+}
+
+# Variantes que o usuário digita -> forma curta canônica
+ALIASES = {
+    'whey protein': 'whey',
+    'proteina whey': 'whey',
+    'aminoacidos bcaa': 'bcaa',
+    'aminoacido bcaa': 'bcaa',
+    'creatine': 'creatina',
+    'creatina monohidratada': 'creatina',
+    'glutamine': 'glutamina',
+    'pre-treino': 'pre treino',
+    'pretreino': 'pre treino',
+    'pre workout': 'pre treino',
+    'hipercalorico mass': 'hipercalorico',
+    'multivitaminico a-z': 'multivitaminico',
+    'polivitaminico': 'multivitaminico',
+}
+
+STOP_WORDS = {
+    'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'para',
+    'pra', 'um', 'uma', 'no', 'na', 'nos', 'nas', 'por',
+}
+
+# Mudam o sentido do termo seguinte ("whey sem lactose" x "whey com lactose"):
+# na chave ficam presos a ele, para a ordenação dos termos não os separar
+MODIFIERS = {'sem', 'com'}
+
+_ALIAS_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(alias) for alias in sorted(ALIASES, key=len, reverse=True)) + r')\b'
+)
+
+
+_COMBINING_RE = re.compile('[\u0300-\u034e\u0350-\u036f]')
+
+
+def strip_accents(text):
+    if text.isascii():
+        return text
+    # Os acentos do português ficam todos no bloco de diacríticos combinantes
+    decomposed = _COMBINING_RE.sub('', unicodedata.normalize('NFKD', text))
+    if decomposed.isascii():
+        return decomposed
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def normalize_text(text):
+    """Minúsculas, sem acentos e com espaços colapsados."""
+    text = strip_accents(text or '').lower()
+    text = re.sub(r'[^\w\s-]', ' ', text)
+    return ' '.join(text.split())
+
+
+@dataclass(frozen=True)
+class CanonicalQuery:
+    original: str
+    text: str     # forma curta canônica, na ordem digitada
+    key: str      # termos ordenados, usada como chave de cache e histórico
+    typed: str = ''   # texto digitado, só normalizado (minúsculas, sem acentos)
+
+    def for_store(self, spec):
+        """Texto a enviar para a loja, conforme o 'query_form' da especificação."""
+        if spec.get('query_form') == 'expanded':
+            return self.expanded
+        return self.typed or self.text
+
+    @property
+    def expanded(self):
+        text = self.typed or self.text
+        for short, long_form in SYNONYMS.items():
+            # Só expande o termo solto: 'whey protein' digitado não vira 'whey protein protein'
+            if short != long_form and not re.search(r'\b' + re.escape(long_form) + r'\b', text):
+                text = re.sub(r'\b' + re.escape(short) + r'\b', long_form, text)
+        return text
+
+
+def _key_terms(terms):
+    key_terms = []
+    for term in terms:
+        if key_terms and key_terms[-1] in MODIFIERS:
+            key_terms[-1] += '_' + term
+        else:
+            key_terms.append(term)
+    return key_terms
+
+
+@lru_cache(maxsize=4096)
+def canonicalize(query):
+    """Devolve a CanonicalQuery de uma busca digitada pelo usuário."""
+    typed = normalize_text(query)
+    text = _ALIAS_RE.sub(lambda match: ALIASES[match.group(1)], typed)
+    terms = [term for term in text.split() if term not in STOP_WORDS]
+    if not terms:
+        # Busca composta só de stop words: melhor usar o que foi digitado
+        terms = text.split()
+    text = ' '.join(terms)
+    return CanonicalQuery(original=query, text=text, key=' '.join(sorted(set(_key_terms(terms)))), typed=typed)
@@ -0,0 +1,332 @@
+import argparse
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import tracing
+from transport import ResponseTooLarge, TransportError
+
+# Gravação e reprodução das respostas das lojas. O RecordingTransport envolve
+# o transporte de verdade e grava cada requisição do scraper (URL, cabeçalhos,
+# status, corpo já descomprimido, duração e a busca e a loja do trace) num
+# arquivo JSON lines comprimido com gzip; corpos repetidos são gravados uma
+# vez só e referenciados pelo hash. O ReplayTransport serve essas respostas,
+# na ordem em que foram gravadas para cada URL, com a latência original ou
+# sem latência nenhuma; uma URL que não está no arquivo é erro. Assim dá para
+# repetir uma busca contra exatamente as mesmas respostas: medir mudanças no
+# parsing, comparar tempos de ponta a ponta e reproduzir incidentes locais.
+#
+#   python recording.py info gravacao.jsonl.gz
+#   python recording.py run gravacao.jsonl.gz --latency zero
+
+ARCHIVE_VERSION = 1
+LATENCIES = ('original', 'zero')
+
+# O corpo é gravado já decodificado: os cabeçalhos de codificação e tamanho deixariam de valer
+BODY_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+class ReplayMismatch(TransportError):
+    """Requisição sem resposta gravada no arquivo de reprodução.
+
+    Não é uma falha da loja: o scraper deixa o erro subir até quem fez a busca
+    em vez de tratar a loja como sem resultados.
+    """
+
+    retryable = False
+
+
+class _ArchiveWriter:
+    """Arquivo de gravação aberto; compartilhado por todos os transportes que gravam nele."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._bodies = set()
+        self.sequence = 0
+        self.started = time.perf_counter()
+        self._write({'type': 'archive', 'version': ARCHIVE_VERSION, 'created_at': time.time()})
+        logging.info(f"Gravando as respostas das lojas em {path}")
+
+    def add(self, exchange, body=None):
+        with self._lock:
+            if self._file is None:
+                return
+            if body is not None and exchange['body'] not in self._bodies:
+                self._bodies.add(exchange['body'])
+                self._write(_encode_body(exchange['body'], body))
+            self.sequence += 1
+            exchange['seq'] = self.sequence
+            self._write(exchange)
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # Descarrega a cada registro: o arquivo fica legível com o processo ainda rodando
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        with _writers_lock:
+            if _writers.get(self.path) is self:
+                del _writers[self.path]
+        logging.info(f"Gravação encerrada: {self.sequence} requisições em {self.path}")
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def _get_writer(path):
+    # O app recria o scraper a cada interação: reabrir o arquivo apagaria a gravação
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = _ArchiveWriter(path)
+            atexit.register(writer.close)
+        return writer
+
+
+class RecordingTransport:
+    """Envolve um transporte e grava todas as requisições feitas por ele."""
+
+    def __init__(self, transport, path):
+        self.transport = transport
+        self.name = f"{transport.name}+gravação"
+        self.path = path
+        self._writer = _get_writer(path)
+
+    @property
+    def last_used(self):
+        return self.transport.last_used
+
+    def get(self, url, headers=None, timeout=15, proxy=None, max_bytes=None):
+        query, store_name = tracing.current()
+        started = time.perf_counter()
+        # Só repassa as opções usadas: o transporte de baixo pode ser um objeto qualquer com get()
+        options = {key: value for key, value in (('proxy', proxy), ('max_bytes', max_bytes)) if value is not None}
+        try:
+            response = self.transport.get(url, headers=headers, timeout=timeout, **options)
+        except TransportError as e:
+            self._record(url, headers, query, store_name, started, error=e)
+            raise
+        self._record(url, headers, query, store_name, started, response=response)
+        return response
+
+    def _record(self, url, headers, query, store_name, started, response=None, error=None):
+        elapsed = time.perf_counter() - started
+        exchange = {
+            'type': 'exchange',
+            'url': url,
+            'request_headers': dict(headers or {}),
+            'query': query,
+            'store': store_name,
+            'offset': round(started - self._writer.started, 4),
+            'elapsed': round(elapsed, 4),
+        }
+        if response is None:
+            exchange['error'] = str(error)
+            exchange['retryable'] = error.retryable
+            self._writer.add(exchange)
+            return
+        body = response.content
+        exchange['status'] = response.status_code
+        exchange['headers'] = {k: v for k, v in response.headers.items() if k.lower() not in BODY_HEADERS}
+        exchange['final_url'] = str(response.url)
+        exchange['body'] = hashlib.sha1(body).hexdigest()
+        self._writer.add(exchange, body)
+
+    def ping(self, url, timeout=5):
+        self.transport.ping(url, timeout=timeout)
+
+    def pool_stats(self):
+        return self.transport.pool_stats() if hasattr(self.transport, 'pool_stats') else None
+
+    def close(self):
+        """Fecha o transporte de baixo e encerra o arquivo de gravação."""
+        self._writer.close()
+        self.transport.close()
+
+
+def _encode_body(digest, body):
+    try:
+        return {'type': 'body', 'sha1': digest, 'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'type': 'body', 'sha1': digest, 'hex': body.hex()}
+
+
+def _decode_body(record):
+    if 'text' in record:
+        return record['text'].encode('utf-8')
+    return bytes.fromhex(record['hex'])
+
+
+def read_archive(path):
+    """Devolve (trocas na ordem de gravação, corpos por hash); tolera um final truncado."""
+    exchanges, bodies = [], {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                record = json.loads(line)
+                if record['type'] == 'body':
+                    bodies[record['sha1']] = _decode_body(record)
+                elif record['type'] == 'exchange':
+                    exchanges.append(record)
+                elif record['type'] == 'archive' and record['version'] != ARCHIVE_VERSION:
+                    raise ValueError(f"Versão de gravação não suportada: {record['version']}")
+        except EOFError:
+            logging.warning(f"Gravação {path} truncada; usando as {len(exchanges)} requisições completas")
+    return exchanges, bodies
+
+
+class ReplayResponse:
+    """Resposta gravada, com a parte da interface de resposta que o scraper usa."""
+
+    __slots__ = ('url', 'status_code', 'headers', 'content')
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ReplayTransport:
+    """Serve as respostas de uma gravação; requisições não gravadas são erro."""
+
+    name = 'replay'
+
+    def __init__(self, path, latency='original'):
+        """latency: 'original' repete a duração gravada de cada resposta; 'zero' responde na hora."""
+        if latency not in LATENCIES:
+            raise ValueError(f"Latência de reprodução inválida: {latency}")
+        self.path = path
+        self.latency = latency
+        exchanges, self._bodies = read_archive(path)
+        self.exchanges = exchanges
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+        self._last = {}
+        for exchange in exchanges:
+            self._queues[exchange['url']].append(exchange)
+        self.served = 0
+        self.unmatched = []
+        self.last_used = {}
+        logging.info(f"Reproduzindo {len(exchanges)} requisições de {path} (latência {latency})")
+
+    def get(self, url, headers=None, timeout=15, proxy=None, max_bytes=None):
+        started = time.perf_counter()
+        with self._lock:
+            queue = self._queues.get(url)
+            if queue:
+                exchange = self._last[url] = queue.popleft()
+            else:
+                # Requisições além das gravadas (novas tentativas, hedging) repetem a última resposta
+                exchange = self._last.get(url)
+            if exchange is None:
+                self.unmatched.append(url)
+            else:
+                self.served += 1
+        if exchange is None:
+            raise ReplayMismatch(f"Requisição sem resposta gravada em {self.path}: {url}")
+
+        if self.latency == 'original':
+            time.sleep(max(0.0, exchange['elapsed'] - (time.perf_counter() - started)))
+        if 'error' in exchange:
+            raise (TransportError if exchange.get('retryable', True) else ResponseTooLarge)(exchange['error'])
+        body = self._bodies[exchange['body']]
+        if max_bytes is not None and len(body) > max_bytes:
+            raise ResponseTooLarge(f"{url}: corpo passou de {max_bytes} bytes, leitura interrompida")
+        response = ReplayResponse(exchange['final_url'], exchange['status'], exchange['headers'], body)
+        tracing.record('replay', started, time.perf_counter(), status=response.status_code)
+        return response
+
+    def ping(self, url, timeout=5):
+        pass
+
+    def pool_stats(self):
+        return None
+
+    def close(self):
+        pass
+
+    def pending(self):
+        """Requisições gravadas que ainda não foram pedidas nesta reprodução."""
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+
+def archive_summary(path):
+    exchanges, bodies = read_archive(path)
+    by_store = defaultdict(lambda: {'requests': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0})
+    for exchange in exchanges:
+        summary = by_store[exchange['store'] or urlsplit(exchange['url']).netloc]
+        summary['requests'] += 1
+        summary['seconds'] += exchange['elapsed']
+        if 'error' in exchange:
+            summary['errors'] += 1
+        else:
+            summary['bytes'] += len(bodies[exchange['body']])
+    queries = list(dict.fromkeys(exchange['query'] for exchange in exchanges if exchange['query']))
+    return queries, dict(by_store), len(bodies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspeciona ou reproduz uma gravação das respostas das lojas")
+    parser.add_argument('command', choices=('info', 'run'))
+    parser.add_argument('path')
+    parser.add_argument('queries', nargs='*', help="buscas a repetir (padrão: as gravadas, na ordem)")
+    parser.add_argument('--latency', choices=LATENCIES, default='original')
+    parser.add_argument('--max-results', type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    queries, by_store, bodies = archive_summary(args.path)
+    if args.command == 'info':
+        print(f"{sum(s['requests'] for s in by_store.values())} requisições, {bodies} corpos distintos")
+        print(f"Buscas: {', '.join(queries) or '-'}")
+        for store_name, summary in sorted(by_store.items()):
+            print(f"  {store_name}: {summary['requests']} req, {summary['errors']} erros, "
+                  f"{summary['bytes'] / 1024:.0f} KB, {summary['seconds']:.2f}s")
+        return 0
+
+    from scraper import STORE_SPECS, SupplementScraper
+    transport = ReplayTransport(args.path, latency=args.latency)
+    # Sem planejamento nem índice: a reprodução pede às mesmas lojas o que foi gravado
+    scraper = SupplementScraper(transport=transport, coalesce=False, plan_stores=False)
+    stores = [store_name for store_name in STORE_SPECS if store_name in by_store] or None
+    for query in args.queries or queries:
+        started = time.perf_counter()
+        try:
+            results = scraper.search_supplements(query, args.max_results, stores=stores)
+        except ReplayMismatch as e:
+            print(f"{query}: falhou - {str(e)}")
+            continue
+        print(f"{query}: {len(results)} produtos em {(time.perf_counter() - started) * 1000:.0f} ms")
+    print(f"{transport.served} respostas servidas, {transport.pending()} não pedidas, {len(transport.unmatched)} sem gravação")
+    for url in transport.unmatched:
+        print(f"  sem gravação: {url}")
+    return 1 if transport.unmatched else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
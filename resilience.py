@@ -0,0 +1,212 @@
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+import tracing
+from transport import TransportError
+
+# Políticas de resiliência por loja: novas tentativas com backoff exponencial
+# e jitter para GETs que falharam por conexão ou 5xx, e requisições "hedged"
+# (uma segunda cópia disparada quando a primeira passa do p95 observado da
+# loja), limitadas por um orçamento de requisições extras. A vaga da loja no
+# agendador é reservada antes de medir o tempo: a espera pela vaga não entra
+# no p95 nem ocupa as threads das cópias, e uma cópia só sai se houver vaga
+# livre na hora. A requisição principal roda na thread de quem chamou; só
+# quando uma cópia pode ser disparada ela vai para uma thread própria, para
+# que a primeira resposta volte sem esperar a outra.
+
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class ResiliencePolicy:
+    retries: int = 2
+    backoff_base: float = 0.3
+    backoff_max: float = 4.0
+    retry_statuses: frozenset = field(default=RETRY_STATUSES)
+    hedge: bool = False
+    hedge_after: float = None   # segundos; None usa o p95 observado da loja
+    hedge_budget: float = 0.1   # fração das requisições que pode ganhar uma cópia
+    min_samples: int = 20       # amostras necessárias antes de confiar no p95
+
+    def backoff(self, attempt):
+        """Backoff exponencial com jitter completo."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+DEFAULT_POLICY = ResiliencePolicy()
+
+# Amazon responde 503 quando bloqueia: menos tentativas e espera maior
+STORE_POLICIES = {
+    'Amazon': ResiliencePolicy(retries=1, backoff_base=1.0, hedge=True),
+    'Growth Suplementos': ResiliencePolicy(hedge=True),
+}
+
+
+class LatencyTracker:
+    def __init__(self, size=200):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+
+    def record(self, store_name, seconds):
+        with self._lock:
+            self._samples[store_name].append(seconds)
+
+    def percentile(self, store_name, fraction, min_samples=1):
+        with self._lock:
+            samples = sorted(self._samples[store_name])
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class HedgeBudget:
+    """Cada requisição normal rende 'ratio' fichas; cada cópia gasta uma."""
+
+    def __init__(self, burst=3.0):
+        self._lock = threading.Lock()
+        self._tokens = defaultdict(lambda: burst)
+        self.burst = burst
+
+    def deposit(self, store_name, ratio):
+        with self._lock:
+            self._tokens[store_name] = min(self.burst, self._tokens[store_name] + ratio)
+
+    def available(self, store_name):
+        with self._lock:
+            return self._tokens[store_name] >= 1
+
+    def withdraw(self, store_name):
+        with self._lock:
+            if self._tokens[store_name] >= 1:
+                self._tokens[store_name] -= 1
+                return True
+            return False
+
+
+class ResilientCaller:
+    def __init__(self, policies=None, max_hedges=16):
+        self.policies = dict(STORE_POLICIES, **(policies or {}))
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_hedges, thread_name_prefix='hedge')
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def policy(self, store_name):
+        return self.policies.get(store_name, DEFAULT_POLICY)
+
+    def call(self, store_name, fn, slots=None):
+        """Executa fn() (um GET idempotente) aplicando a política da loja.
+
+        slots (o agendador, com acquire_store_slot/release_store_slot) limita as
+        requisições simultâneas da loja; cada tentativa e cada cópia reservam a sua vaga.
+        """
+        policy = self.policy(store_name)
+        attempt = 0
+        while True:
+            try:
+                response = self._hedged(store_name, policy, fn, slots) if policy.hedge else self._slotted(store_name, fn, slots)
+            except TransportError as e:
+                if attempt >= policy.retries or not e.retryable:
+                    raise
+                error = str(e)
+            else:
+                if response.status_code not in policy.retry_statuses or attempt >= policy.retries:
+                    return response
+                error = f"status {response.status_code}"
+
+            delay = policy.backoff(attempt)
+            attempt += 1
+            self.retried += 1
+            logging.warning(f"{store_name}: {error}; nova tentativa {attempt}/{policy.retries} em {delay:.2f}s")
+            with tracing.span('retry_backoff', attempt=attempt, error=error):
+                time.sleep(delay)
+
+    def _timed(self, store_name, fn):
+        started = time.monotonic()
+        response = fn()
+        self.latency.record(store_name, time.monotonic() - started)
+        return response
+
+    def _slotted(self, store_name, fn, slots):
+        if slots is None:
+            return self._timed(store_name, fn)
+        slots.acquire_store_slot(store_name)
+        return self._holding(store_name, fn, slots)
+
+    def _holding(self, store_name, fn, slots):
+        """Executa fn() com a vaga já reservada e a devolve no fim."""
+        try:
+            return self._timed(store_name, fn)
+        finally:
+            if slots is not None:
+                slots.release_store_slot(store_name)
+
+    def _hedged(self, store_name, policy, fn, slots):
+        self.budget.deposit(store_name, policy.hedge_budget)
+        hedge_after = policy.hedge_after or self.latency.percentile(store_name, 0.95, policy.min_samples)
+        if hedge_after is None or not self.budget.available(store_name):
+            # Sem cópia possível: nada de threads extras
+            return self._slotted(store_name, fn, slots)
+
+        if slots is not None:
+            slots.acquire_store_slot(store_name)
+        primary = concurrent.futures.Future()
+
+        def run_primary():
+            try:
+                primary.set_result(self._holding(store_name, fn, slots))
+            except BaseException as e:
+                primary.set_exception(e)
+
+        threading.Thread(target=tracing.wrap(run_primary), name=f'primary-{store_name}', daemon=True).start()
+        done, _ = concurrent.futures.wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        if slots is not None and not slots.acquire_store_slot(store_name, blocking=False):
+            # Loja no limite de requisições simultâneas: uma cópia só entraria na fila
+            return primary.result()
+        if not self.budget.withdraw(store_name):
+            if slots is not None:
+                slots.release_store_slot(store_name)
+            return primary.result()
+
+        self.hedged += 1
+        logging.info(f"{store_name}: resposta passou de {hedge_after:.2f}s, enviando requisição extra")
+        secondary = self._executor.submit(tracing.wrap(self._holding), store_name, fn, slots)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except TransportError as e:
+                    error = e
+                    continue
+                if future is secondary:
+                    self.hedge_wins += 1
+                return response
+        raise error
+
+    def stats(self):
+        return {'retried': self.retried, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins}
+
+
+_shared_caller = None
+_shared_caller_lock = threading.Lock()
+
+
+def get_resilient_caller():
+    """Devolve o executor de políticas compartilhado pelo processo."""
+    global _shared_caller
+    with _shared_caller_lock:
+        if _shared_caller is None:
+            _shared_caller = ResilientCaller()
+        return _shared_caller
@@ -0,0 +1,288 @@
+import concurrent.futures
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+
+import tracing
+
+# Agendador global das buscas nas lojas. Todas as sessões do Streamlit enviam
+# suas buscas por loja para a mesma fila; os workers atendem as sessões em
+# rodízio (round-robin), com limite global de buscas simultâneas e limite de
+# requisições simultâneas por loja. Um worker só pega uma busca se a loja
+# dela tiver vaga livre; a vaga fica com a busca até o fim, e a primeira
+# requisição da busca a usa sem passar de novo pelo limite da loja.
+
+# Limites por loja mais restritos que o padrão
+PER_STORE_LIMITS = {
+    'Amazon': 2,
+}
+
+
+class SchedulerBusy(Exception):
+    """A fila de buscas está cheia ou a espera passou do limite."""
+
+
+class _StoreLease:
+    """Vaga da loja reservada pelo worker para a busca que está executando."""
+
+    __slots__ = ('store_name', 'in_use', 'closed', '_lock')
+
+    def __init__(self, store_name):
+        self.store_name = store_name
+        self.in_use = False
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.closed or self.in_use:
+                return False
+            self.in_use = True
+            return True
+
+    def give_back(self):
+        with self._lock:
+            if self.closed or not self.in_use:
+                return False
+            self.in_use = False
+            return True
+
+    def close(self):
+        """Encerra a reserva; True se alguma requisição ainda a usa (ela devolve a vaga ao terminar)."""
+        with self._lock:
+            self.closed = True
+            return self.in_use
+
+
+# Vaga da busca em execução, vista pelas requisições dela (inclusive em outras threads via tracing.wrap)
+_lease = contextvars.ContextVar('store_lease', default=None)
+
+
+class _Task:
+    __slots__ = ('session_id', 'store_name', 'fn', 'args', 'future', 'enqueued', 'context', 'lease')
+
+    def __init__(self, session_id, store_name, fn, args):
+        self.session_id = session_id
+        self.store_name = store_name
+        self.fn = fn
+        self.args = args
+        self.future = concurrent.futures.Future()
+        self.enqueued = time.perf_counter()
+        # Leva o trace da sessão para a thread do worker
+        self.context = contextvars.copy_context()
+        self.lease = None
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class SearchScheduler:
+    def __init__(self, max_workers=24, per_store_limit=4, max_queue=240, max_wait=30.0, store_limits=None):
+        """
+        max_workers: buscas por loja executadas ao mesmo tempo no processo.
+        per_store_limit: requisições simultâneas para uma mesma loja.
+        max_queue: buscas por loja aguardando na fila antes de recusar novas buscas.
+        max_wait: tempo máximo (s) de espera na fila; depois disso a busca é descartada.
+        """
+        self.max_workers = max_workers
+        self.per_store_limit = per_store_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.store_limits = dict(PER_STORE_LIMITS, **(store_limits or {}))
+
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # sessão -> deque de tarefas
+        self._pending = 0
+        self._running = 0
+        self._store_slots = {}
+        self._store_in_use = defaultdict(int)
+        self._queue_waits = deque(maxlen=1000)
+        self._store_waits = defaultdict(lambda: deque(maxlen=500))
+        self.rejected = 0
+        self.expired = 0
+
+        for i in range(max_workers):
+            threading.Thread(target=self._worker, name=f'scheduler-{i}', daemon=True).start()
+
+    def admit(self, tasks=1):
+        """Recusa uma nova busca se ela fizer a fila passar do limite."""
+        with self._cond:
+            if self._pending + tasks > self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusy(
+                    f"Muitas buscas em andamento ({self._pending} na fila). Tente novamente em alguns segundos."
+                )
+
+    def submit(self, session_id, store_name, fn, *args):
+        task = _Task(session_id, store_name, fn, args)
+        with self._cond:
+            self._queues.setdefault(session_id, deque()).append(task)
+            self._pending += 1
+            self._cond.notify()
+        return task.future
+
+    def run(self, session_id, store_name, fn, *args):
+        return self.submit(session_id, store_name, fn, *args).result()
+
+    def _next_task(self):
+        """Próxima busca que pode rodar agora, com a vaga da loja já reservada; None se nenhuma pode.
+
+        Rodízio: atende a primeira sessão da fila que tenha uma busca em loja
+        com vaga livre e a manda para o fim. Buscas em lojas no limite ficam
+        na fila sem ocupar um worker; as que já passaram de max_wait saem
+        para serem descartadas.
+        """
+        now = time.perf_counter()
+        for session_id, queue in self._queues.items():
+            for position, task in enumerate(queue):
+                if now - task.enqueued > self.max_wait:
+                    break
+                if self.acquire_store_slot(task.store_name, blocking=False):
+                    task.lease = _StoreLease(task.store_name)
+                    break
+            else:
+                continue
+            del queue[position]
+            if queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            self._pending -= 1
+            return task
+        return None
+
+    def _wait_timeout(self):
+        """Até a busca mais antiga da fila vencer o max_wait (None com a fila vazia)."""
+        if not self._queues:
+            return None
+        oldest = min(queue[0].enqueued for queue in self._queues.values())
+        return max(0.0, oldest + self.max_wait - time.perf_counter()) + 0.001
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait(self._wait_timeout())
+                    task = self._next_task()
+                self._running += 1
+
+            try:
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+                task.context.run(self._execute, task)
+            finally:
+                # Requisição ainda em andamento (cópia de hedging perdedora) devolve a vaga ela mesma
+                if task.lease is not None and not task.lease.close():
+                    self._release(task.store_name)
+                with self._cond:
+                    self._running -= 1
+
+    def _execute(self, task):
+        now = time.perf_counter()
+        waited = now - task.enqueued
+        self._queue_waits.append(waited)
+        tracing.record('queue', task.enqueued, now)
+        if waited > self.max_wait:
+            self.expired += 1
+            task.future.set_exception(SchedulerBusy(
+                f"Busca na {task.store_name} descartada após {waited:.1f}s na fila"
+            ))
+            return
+        token = _lease.set(task.lease)
+        try:
+            task.future.set_result(task.fn(*task.args))
+        except Exception as e:
+            task.future.set_exception(e)
+        finally:
+            _lease.reset(token)
+
+    def _slot(self, store_name):
+        with self._cond:
+            slot = self._store_slots.get(store_name)
+            if slot is None:
+                limit = self.store_limits.get(store_name, self.per_store_limit)
+                slot = self._store_slots[store_name] = threading.BoundedSemaphore(limit)
+            return slot
+
+    def acquire_store_slot(self, store_name, blocking=True):
+        """Reserva uma das requisições simultâneas permitidas para a loja; sem blocking, só se houver vaga agora.
+
+        Dentro de uma busca do agendador, a vaga que o worker reservou para ela
+        é usada primeiro.
+        """
+        lease = _lease.get()
+        if lease is not None and lease.store_name == store_name and lease.take():
+            return True
+        slot = self._slot(store_name)
+        started = time.perf_counter()
+        if not slot.acquire(blocking):
+            return False
+        acquired = time.perf_counter()
+        self._store_waits[store_name].append(acquired - started)
+        tracing.record('rate_limit', started, acquired)
+        with self._cond:
+            self._store_in_use[store_name] += 1
+        return True
+
+    def release_store_slot(self, store_name):
+        """Devolve a vaga; pode ser chamado de outra thread que não a que reservou."""
+        lease = _lease.get()
+        if lease is not None and lease.store_name == store_name and lease.give_back():
+            return
+        self._release(store_name)
+
+    def _release(self, store_name):
+        slot = self._slot(store_name)
+        with self._cond:
+            self._store_in_use[store_name] -= 1
+            slot.release()
+            # Uma busca dessa loja pode ter ficado na fila esperando a vaga
+            self._cond.notify()
+
+    @contextmanager
+    def store_slot(self, store_name):
+        """Reserva uma das requisições simultâneas permitidas para a loja."""
+        self.acquire_store_slot(store_name)
+        try:
+            yield
+        finally:
+            self.release_store_slot(store_name)
+
+    def metrics(self):
+        with self._cond:
+            queue_waits = list(self._queue_waits)
+            return {
+                'queue_depth': self._pending,
+                'sessions_waiting': len(self._queues),
+                'running': self._running,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'queue_wait_p50': _percentile(queue_waits, 0.50),
+                'queue_wait_p95': _percentile(queue_waits, 0.95),
+                'store_in_use': dict(self._store_in_use),
+                'store_wait_p95': {
+                    store: _percentile(list(waits), 0.95) for store, waits in self._store_waits.items()
+                },
+            }
+
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(**kwargs):
+    """Devolve o agendador compartilhado pelo processo, criando-o na primeira chamada."""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = SearchScheduler(**kwargs)
+            logging.info(f"Agendador de buscas iniciado com {_shared_scheduler.max_workers} workers")
+        return _shared_scheduler
@@ -1,13 +1,29 @@
-import requests
 from bs4 import BeautifulSoup
 import re
 import random
-from time import sleep
+from time import perf_counter, sleep
 from urllib.parse import quote
 import logging
 from datetime import datetime
 import concurrent.futures
+import contextlib
+import copy
+import threading
+import uuid
 from functools import partial
+import structured
+import tracing
+from adaptive_selectors import get_selector_learner
+from planner import get_store_planner, query_category
+from suggestions import get_suggestion_index
+from queries import canonicalize
+from recording import ReplayMismatch
+from products import Product, ProductBatch
+from resilience import get_resilient_caller
+from scheduler import SchedulerBusy, get_scheduler
+from singleflight import SingleFlightTimeout, shared_flight
+from tracing import get_tracer
+from transport import ACCEPT_ENCODING, DEFAULT_POOL_SIZE, PoolWarmer, TransportError, create_transport
 
 # Configurar logging para depuração
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,8 +35,565 @@ KNOWN_BRANDS = [
     "Vitafor", "Essential Nutrition"
 ]
 
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/150"
+
+# Seletores da Amazon; as alternativas dos itens são tentadas em sequência
+AMAZON_SELECTORS = {
+    'item_selector': ('div[data-asin]:not([data-asin=""])', '.s-result-item', 'div[data-component-type="s-search-result"]'),
+    'title_selector': 'h2 span.a-text-normal, h2.a-size-medium, .a-text-normal',
+    'price_whole_selector': 'span.a-price-whole, .a-price-whole',
+    'price_fraction_selector': 'span.a-price-fraction, .a-price-fraction',
+    'image_selector': 'img.s-image, .s-image',
+    'link_selector': 'a.a-link-normal[href*="/dp/"], a[href*="/dp/"]',
+}
+
+# Seletores usados pelas lojas com vitrine no estilo Magento
+VITRINE_SELECTORS = {
+    'title_selector': '.product-name, .product-item-name, .name, .product-title',
+    'price_selector': '.price, .product-price, .price-box, .price-value',
+    'image_selector': '.product-image img, .product-image-photo, img.product-image, .product-image',
+    'link_selector': 'a.product-item-link, a.product-item__link, a.product, a.product-link',
+}
+
+# Seletores usados pelas lojas com catálogo genérico
+CATALOGO_SELECTORS = {
+    'item_selector': 'div.product-item, div.item-product, div.product-card',
+    'title_selector': 'h2.product-name, h3.product-title, a.product-name',
+    'price_selector': 'span.price, div.price-box, span.product-price',
+    'image_selector': 'img.product-image, img.product-img, img.lazy',
+    'link_selector': 'a.product-link, a.product-item-link',
+}
+
+# Tamanho máximo do corpo de uma página no modo de memória limitada, quando a
+# loja não define o seu ('max_body_kb'); acima disso a leitura é interrompida
+DEFAULT_MAX_BODY_KB = 2048
+
+# Especificação de busca e extração de cada loja. O dicionário é lido tanto
+# pelo scraper quanto pelos workers do pool de parsing (ver parser_pool.py).
+STORE_SPECS = {
+    'Amazon': {
+        'layout': 'amazon',
+        'base_url': 'https://www.amazon.com.br',
+        'search_url': 'https://www.amazon.com.br/s?k={query}&i=drugstore&rh=n%3A16210003011',
+        'headers': 'navegador',
+        'timeout': 15,
+        'query_form': 'expanded',
+        'page_param': 'page',
+        'page_size': 48,
+        'max_body_kb': 4096,
+        # O qid dos links é o horário da busca: muda a cada resposta (ver parse_memo.py)
+        'volatile': (rb'qid=\d+',),
+        'key_pattern': r'/dp/([A-Z0-9]{10})',
+        **AMAZON_SELECTORS,
+    },
+    'Growth Suplementos': {
+        'layout': 'vitrine',
+        'base_url': 'https://www.gsuplementos.com.br',
+        'search_url': 'https://www.gsuplementos.com.br/busca?q={query}',
+        'headers': 'navegador',
+        'timeout': 15,
+        'query_form': 'expanded',
+        'page_param': 'p',
+        'page_size': 24,
+        'item_selector': '.product-item, .item.product, .product, .products-grid .item, .product-list .item',
+        'brand_hint': ('growth', 'Growth Suplementos'),
+        **VITRINE_SELECTORS,
+    },
+    'Integral Medica': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.integralmedica.com.br',
+        'search_url': 'https://www.integralmedica.com.br/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 5,
+        'page_param': 'page',
+        'page_size': 24,
+        'structured': ('json_ld',),
+        'api': 'vtex',
+        'api_url': '{base_url}/api/catalog_system/pub/products/search?ft={query}&_from={start}&_to={end}',
+        'api_price_filter': '&fq=P:[{low} TO {high}]',
+        **CATALOGO_SELECTORS,
+    },
+    'Netshoes': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.netshoes.com.br',
+        'search_url': 'https://www.netshoes.com.br/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 5,
+        'page_param': 'page',
+        'page_size': 24,
+        'structured': ('next_data', 'json_ld'),
+        **CATALOGO_SELECTORS,
+    },
+    'Max Titanium': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.maxtitanium.com.br',
+        'search_url': 'https://www.maxtitanium.com.br/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 10,
+        'page_param': 'page',
+        'page_size': 24,
+        'structured': ('json_ld',),
+        'api': 'vtex',
+        'api_url': '{base_url}/api/catalog_system/pub/products/search?ft={query}&_from={start}&_to={end}',
+        'api_price_filter': '&fq=P:[{low} TO {high}]',
+        **CATALOGO_SELECTORS,
+    },
+    'Atlhetica Nutrition': {
+        'layout': 'vitrine',
+        'base_url': 'https://www.atlheticanutrition.com.br',
+        'search_url': 'https://www.atlheticanutrition.com.br/busca?q={query}',
+        'headers': 'basico',
+        'timeout': 15,
+        'page_param': 'p',
+        'page_size': 24,
+        'delay': (3.0, 5.0),
+        'item_selector': '.product-item, .item.product, .product, .products-grid .item, .product-list .item, .product',
+        'brand_hint': ('atlhetica', 'Atlhetica'),
+        **VITRINE_SELECTORS,
+    },
+    'Probiótica': {
+        'layout': 'vitrine',
+        'base_url': 'https://www.probiotica.com.br',
+        'search_url': 'https://www.probiotica.com.br/busca?q={query}',
+        'headers': 'basico',
+        'timeout': 15,
+        'page_param': 'p',
+        'page_size': 24,
+        'delay': (3.0, 5.0),
+        'item_selector': '.product-item, .item.product, .product, .products-grid .item, .product-list .item, .product',
+        'brand_hint': ('probiótica', 'Probiótica'),
+        **VITRINE_SELECTORS,
+    },
+    'Beleza na Web': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.belezanaweb.com.br',
+        'search_url': 'https://www.belezanaweb.com.br/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 5,
+        'page_param': 'page',
+        'page_size': 24,
+        'structured': ('json_ld',),
+        **CATALOGO_SELECTORS,
+    },
+    'Época Cosméticos': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.epocacosmeticos.com.br',
+        'search_url': 'https://www.epocacosmeticos.com.br/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 5,
+        'page_param': 'page',
+        'page_size': 24,
+        'structured': ('json_ld',),
+        'api': 'vtex',
+        'api_url': '{base_url}/api/catalog_system/pub/products/search?ft={query}&_from={start}&_to={end}',
+        'api_price_filter': '&fq=P:[{low} TO {high}]',
+        **CATALOGO_SELECTORS,
+    },
+    'Onofre': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.onofre.com.br',
+        'search_url': 'https://www.onofre.com.br/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 5,
+        'page_param': 'page',
+        'page_size': 24,
+        **CATALOGO_SELECTORS,
+    },
+    'Droga Raia': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.drogaraia.com.br',
+        'search_url': 'https://www.drogaraia.com.br/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 5,
+        'page_param': 'page',
+        'page_size': 24,
+        'structured': ('next_data', 'json_ld'),
+        **CATALOGO_SELECTORS,
+    },
+    'Panvel': {
+        'layout': 'catalogo',
+        'base_url': 'https://www.panvel.com',
+        'search_url': 'https://www.panvel.com/busca?q={query}',
+        'headers': 'simples',
+        'timeout': 5,
+        'page_param': 'page',
+        'page_size': 24,
+        'structured': ('json_ld',),
+        **CATALOGO_SELECTORS,
+    },
+}
+
+
+def extract_brand(title):
+    """Tenta extrair a marca do título do produto."""
+    title_lower = title.lower()
+    for brand in KNOWN_BRANDS:
+        if brand.lower() in title_lower:
+            return brand
+    # Tenta pegar a primeira palavra capitalizada como último recurso
+    match = re.search(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b', title)
+    if match and match.group(1).lower() not in ['whey', 'creatina', 'bcaa', 'glutamina', 'protein', 'capsulas', 'sabor']: # Evitar palavras genéricas
+         return match.group(1)
+    return "Marca Desconhecida"
+
+
+def parse_price(price_text):
+    """Converte texto de preço para float, lidando com diferentes formatos."""
+    try:
+        # Remove 'R$', espaços e troca vírgula por ponto
+        price_clean = re.sub(r'[^\d,]', '', price_text).replace(',', '.')
+        # Se houver múltiplos pontos (milhar), remove exceto o último
+        if price_clean.count('.') > 1:
+            parts = price_clean.split('.')
+            price_clean = "".join(parts[:-1]) + "." + parts[-1]
+        return float(price_clean)
+    except (ValueError, TypeError):
+        return 0.0
+    except Exception as e:
+         logging.error(f"Erro inesperado ao converter preço '{price_text}': {str(e)}")
+         return 0.0
+
+
+# Busca 'teste [ofertas] [semente]': catálogo sintético no lugar das lojas (ver synthetic.py)
+MOCK_SIZE = 48
+MOCK_SEED = 0
+MAX_MOCK_SIZE = 1_000_000   # o app guarda a lista inteira na sessão e exporta para o Excel
+
+
+def mock_request(query):
+    """(ofertas, semente) pedidos por uma busca 'teste'; None para as demais buscas."""
+    terms = canonicalize(query).text.split()
+    if not terms or terms[0] != 'teste' or len(terms) > 3 or not all(term.isdigit() for term in terms[1:]):
+        return None
+    size = int(terms[1]) if len(terms) > 1 else MOCK_SIZE
+    seed = int(terms[2]) if len(terms) > 2 else MOCK_SEED
+    return min(max(size, 1), MAX_MOCK_SIZE), seed
+
+
+def make_price_range(min_price=None, max_price=None):
+    """Faixa (mínimo, máximo) para price_in_range; None quando não há filtro de preço."""
+    if min_price is None and max_price is None:
+        return None
+    low = float(min_price) if min_price is not None else None
+    high = float(max_price) if max_price is not None else None
+    if low is not None and high is not None and low > high:
+        raise ValueError(f"Preço mínimo ({low}) maior que o máximo ({high})")
+    return (low, high)
+
+
+def price_in_range(price, price_range):
+    """Confere a faixa de preço (mínimo, máximo) pedida na busca; None em qualquer ponta é aberto."""
+    if price_range is None:
+        return True
+    low, high = price_range
+    return (low is None or price >= low) and (high is None or price <= high)
+
+
+def _extract_amazon(soup, store_name, spec, max_results, query_date, price_range=None):
+    page = get_selector_learner().page(store_name)
+    items = page.select('item', soup, spec['item_selector'])
+
+    logging.info(f"Encontrados {len(items)} itens na {store_name}")
+
+    results = []
+    dropped = 0
+    processed_asins = set()
+
+    for item in items:
+        if len(results) >= max_results:
+            break
+
+        try:
+            asin = item.get('data-asin')
+            if not asin or asin in processed_asins:
+                continue
+
+            title_element = page.select_one('title', item, spec['title_selector'])
+            price_whole = page.select_one('price_whole', item, spec['price_whole_selector'])
+            price_fraction = page.select_one('price_fraction', item, spec['price_fraction_selector'])
+            image_element = page.select_one('image', item, spec['image_selector'])
+            link_element = page.select_one('link', item, spec['link_selector'])
+
+            if not all([title_element, price_whole, price_fraction, link_element]):
+                continue
+
+            title = title_element.text.strip()
+            price_text = f"{price_whole.text.strip()}{price_fraction.text.strip()}"
+            price = parse_price(price_text)
+            brand = extract_brand(title)
+
+            image_url = image_element.get('src') or image_element.get('data-src') if image_element else PLACEHOLDER_IMAGE
+            href = link_element.get('href')
+            product_link = spec['base_url'] + href if href and not href.startswith('http') else href
+
+            if price > 0 and product_link and not price_in_range(price, price_range):
+                # Fora da faixa pedida: o item é válido, só não vira produto
+                processed_asins.add(asin)
+                page.confirm(item)
+                dropped += 1
+            elif price > 0 and product_link:
+                results.append(Product(title, price, image_url, product_link, store_name, brand, query_date))
+                processed_asins.add(asin)
+                page.confirm(item)
+                logging.info(f"Adicionado produto {store_name}: {title[:30]}... (Marca: {brand})")
+
+        except Exception as e:
+            logging.error(f"Erro ao processar item da {store_name}: {str(e)}")
+            continue
+
+    page.finish(results, dropped)
+    return results, dropped
+
+
+def _extract_vitrine(soup, store_name, spec, max_results, query_date, price_range=None):
+    page = get_selector_learner().page(store_name)
+    items = page.select('item', soup, spec['item_selector'])
+
+    logging.info(f"Encontrados {len(items)} itens na {store_name}")
+
+    results = []
+    dropped = 0
+    for item in items:
+        if len(results) >= max_results:
+            break
+
+        try:
+            title_element = page.select_one('title', item, spec['title_selector'])
+            price_element = page.select_one('price', item, spec['price_selector'])
+            image_element = page.select_one('image', item, spec['image_selector'])
+            link_element = page.select_one('link', item, spec['link_selector'])
+
+            if not all([title_element, price_element, link_element]):
+                logging.debug(f"Item incompleto: {item}")
+                continue
+
+            title = title_element.text.strip()
+            price_text = price_element.text.strip()
+            price = parse_price(price_text)
+            hint, hinted_brand = spec['brand_hint']
+            brand = hinted_brand if hint in title.lower() else extract_brand(title)
+
+            image_url = image_element.get('src') or image_element.get('data-src') if image_element else PLACEHOLDER_IMAGE
+            product_link = link_element.get('href')
+
+            if product_link and not product_link.startswith('http'):
+                product_link = spec['base_url'] + product_link
+
+            if price > 0 and product_link and not price_in_range(price, price_range):
+                page.confirm(item)
+                dropped += 1
+            elif price > 0 and product_link:
+                results.append(Product(title, price, image_url, product_link, store_name, brand, query_date))
+                page.confirm(item)
+                logging.info(f"Adicionado produto {store_name}: {title[:30]}... (Marca: {brand})")
+
+        except Exception as e:
+            logging.error(f"Erro ao processar item da {store_name}: {str(e)}")
+            continue
+
+    page.finish(results, dropped)
+    return results, dropped
+
+
+def _extract_catalogo(soup, store_name, spec, max_results, query_date, price_range=None):
+    page = get_selector_learner().page(store_name)
+    items = page.select('item', soup, spec['item_selector'])
+
+    if not items:
+        logging.warning(f"Nenhum item encontrado na {store_name}")
+        page.finish([])
+        return [], 0
+
+    results = []
+    dropped = 0
+    for item in items:
+        if len(results) >= max_results:
+            break
+
+        try:
+            title = page.select_one('title', item, spec['title_selector'])
+            price = page.select_one('price', item, spec['price_selector'])
+            image = page.select_one('image', item, spec['image_selector'])
+            link = page.select_one('link', item, spec['link_selector'])
+
+            if not all([title, price, image, link]):
+                continue
+
+            title_text = title.text.strip()
+            price_value = parse_price(price.text.strip())
+            product_link = link.get('href', '')
+            if product_link and not product_link.startswith('http'):
+                product_link = spec['base_url'] + product_link
+
+            if price_value > 0 and product_link and not price_in_range(price_value, price_range):
+                page.confirm(item)
+                dropped += 1
+            elif price_value > 0 and product_link:
+                results.append(Product(
+                    title_text,
+                    price_value,
+                    image.get('src', '') or image.get('data-src', '') or PLACEHOLDER_IMAGE,
+                    product_link,
+                    store_name,
+                    extract_brand(title_text),
+                    query_date
+                ))
+                page.confirm(item)
+        except Exception as e:
+            logging.error(f"Erro ao processar item da {store_name}: {str(e)}")
+            continue
+
+    page.finish(results, dropped)
+    return results, dropped
+
+
+EXTRACTORS = {
+    'amazon': _extract_amazon,
+    'vitrine': _extract_vitrine,
+    'catalogo': _extract_catalogo,
+}
+
+
+def product_key(store_name, product):
+    """Chave usada para remover produtos repetidos entre páginas da mesma loja."""
+    link = product.link or ''
+    pattern = STORE_SPECS[store_name].get('key_pattern')
+    if pattern:
+        match = re.search(pattern, link)
+        if match:
+            return match.group(1)
+    return link.split('?')[0].split('#')[0] or product.title
+
+
+def structured_record(store_name, spec, raw, query_date):
+    """Normaliza um produto vindo de JSON para o formato usado pelo scraper."""
+    try:
+        # Preços em JSON usam ponto decimal ("129.90"); texto livre cai no parse_price
+        price = float(raw['price'])
+    except (ValueError, TypeError):
+        price = parse_price(str(raw['price']))
+    link = raw['link']
+    if link and not link.startswith('http'):
+        link = spec['base_url'] + ('' if link.startswith('/') else '/') + link
+    if price <= 0 or not link:
+        return None
+    return Product(
+        raw['title'],
+        price,
+        raw.get('image_url') or PLACEHOLDER_IMAGE,
+        link,
+        store_name,
+        raw.get('brand') or extract_brand(raw['title']),
+        query_date
+    )
+
+
+def structured_records(store_name, spec, raw_products, max_results, query_date, price_range=None):
+    """Produtos válidos do JSON e quantos ficaram fora da faixa de preço."""
+    results = []
+    dropped = 0
+    for raw in raw_products:
+        if len(results) >= max_results:
+            break
+        record = structured_record(store_name, spec, raw, query_date)
+        if record is None:
+            continue
+        if price_in_range(record.price, price_range):
+            results.append(record)
+        else:
+            dropped += 1
+    return results, dropped
+
+
+def extract_products(store_name, content, max_results, query_date, price_range=None):
+    """Extrai os produtos de uma página de busca.
+
+    Tenta primeiro os dados estruturados configurados para a loja (JSON-LD,
+    __NEXT_DATA__) e só monta o DOM para os seletores HTML se eles falharem.
+    Itens fora de price_range (mínimo, máximo) são descartados já aqui.
+    Recebe apenas bytes e devolve (produtos, caminho usado, tempos em segundos
+    de 'parse' e 'extraction', itens descartados pela faixa de preço), para
+    que possa rodar tanto no próprio processo quanto em um worker do pool.
+    """
+    spec = STORE_SPECS[store_name]
+    timings = {'parse': 0.0, 'extraction': 0.0}
+    started = perf_counter()
+    for path in spec.get('structured', ()):
+        raw_products = structured.EMBEDDED_EXTRACTORS[path](content)
+        results, dropped = structured_records(store_name, spec, raw_products, max_results, query_date, price_range)
+        if results or dropped:
+            timings['extraction'] = perf_counter() - started
+            return results, path, timings, dropped
+
+    started = perf_counter()
+    soup = BeautifulSoup(content, 'html.parser')
+    timings['parse'] = perf_counter() - started
+    started = perf_counter()
+    try:
+        results, dropped = EXTRACTORS[spec['layout']](soup, store_name, spec, max_results, query_date, price_range)
+    finally:
+        teardown(soup)
+    timings['extraction'] = perf_counter() - started
+    return results, 'html', timings, dropped
+
+
+def teardown(soup):
+    """Desmonta a árvore do HTML assim que os produtos foram extraídos.
+
+    A árvore tem referências circulares (pai <-> filhos): sem isso só o
+    coletor de ciclos a libera, bem depois do fim da busca. O decompose() da
+    raiz não percorre os filhos, então cada elemento de primeiro nível é
+    desmontado separadamente.
+    """
+    for element in list(soup.contents):
+        element.decompose()
+    soup.decompose()
+
+
+class StoreUnavailable(Exception):
+    """A loja não respondeu com uma página utilizável (erro de conexão, status inesperado, falha no parsing)."""
+
+
 class SupplementScraper:
-    def __init__(self):
+    def __init__(self, parse_mode='inline', parser_workers=None, max_pages=5, transport='auto', index_path=None,
+                 coalesce=True, use_scheduler=True, session_id=None, resilient=True, trace_path=None,
+                 analytics_path=None, watchlist_path=None, keepalive_interval=None, plan_stores=True,
+                 synthetic_size=100_000, synthetic_seed=0, proxies=None, record_path=None, replay_path=None,
+                 replay_latency='original', bounded_memory=False, memory_report=False, cache_url=None,
+                 cache_ttl=None, parse_memo=True):
+        """
+        parse_mode: 'inline' faz o parsing na própria thread da busca;
+        'process' envia o HTML para o pool de processos compartilhado.
+        max_pages: limite de páginas de resultados pedidas por loja.
+        transport: 'auto', 'requests', 'httpx' ou um objeto com get(url, headers, timeout).
+        index_path: arquivo SQLite do índice local de produtos (None desativa).
+        coalesce: compartilha buscas idênticas simultâneas entre todas as sessões do processo.
+        use_scheduler: envia as buscas ao agendador global com limites por loja e fila justa.
+        session_id: identifica a sessão do usuário no rodízio do agendador.
+        resilient: aplica as políticas de novas tentativas e hedging de cada loja.
+        trace_path: arquivo JSON lines para gravar o trace de cada busca (opcional).
+        analytics_path: arquivo SQLite dos agregados de preço do painel (None desativa).
+        watchlist_path: arquivo SQLite da lista de observação de preços (None desativa).
+        keepalive_interval: abre conexões com todas as lojas na partida e as mantém
+        vivas com um HEAD a cada tantos segundos (None desativa; para processos longos).
+        plan_stores: escolhe as lojas de cada busca pelo histórico de rendimento e
+        latência da categoria (ver planner.py); a decisão fica em self.last_plan.
+        synthetic_size, synthetic_seed: catálogo sintético usado por mode='synthetic'.
+        proxies: URLs de proxies de saída; cada sessão usa um proxy fixo por loja,
+        trocado quando a loja o bloqueia (ver proxies.py). None sai direto.
+        record_path: grava todas as respostas das lojas nesse arquivo (ver recording.py).
+        replay_path: em vez de acessar as lojas, serve as respostas de uma gravação;
+        replay_latency: 'original' repete a duração gravada, 'zero' responde na hora.
+        bounded_memory: interrompe a leitura de páginas acima do limite da loja
+        ('max_body_kb', padrão DEFAULT_MAX_BODY_KB) em vez de carregá-las inteiras.
+        memory_report: mede com tracemalloc o pico de memória por loja e por busca
+        (ver memory.py); o relatório da última busca fica em self.last_memory.
+        cache_url: cache de resultados por loja compartilhado entre réplicas
+        (sqlite:///caminho ou redis://host:porta/db; ver shared_cache.py);
+        cache_ttl: validade das entradas em segundos.
+        parse_memo: reaproveita os produtos já extraídos de uma página idêntica
+        da mesma loja, sem montar o DOM de novo (ver parse_memo.py).
+        """
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.5615.138 Safari/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.4 Safari/605.1.15',
@@ -28,16 +601,100 @@ class SupplementScraper:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36 Edg/113.0.0.0'
         ]
         self.current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.session = requests.Session()
-        self.session.max_redirects = 5
-        self.session.headers.update(self._get_headers())
-    
+        self.scheduler = get_scheduler() if use_scheduler else None
+        # Um único cliente para todas as lojas, com um pool de conexões por host
+        if replay_path:
+            from recording import ReplayTransport
+            transport = ReplayTransport(replay_path, latency=replay_latency)
+        elif isinstance(transport, str):
+            transport = create_transport(transport, headers=self._get_headers(), max_redirects=5, pools=self._pool_sizes())
+        if record_path:
+            from recording import RecordingTransport
+            transport = RecordingTransport(transport, record_path)
+        self.transport = transport
+        self.warmer = None
+        if keepalive_interval:
+            self.warmer = PoolWarmer(transport, [spec['base_url'] for spec in STORE_SPECS.values()], keepalive_interval).start()
+        self.max_pages = max_pages
+        # Caminho de extração usado na última busca de cada loja (api, json_ld, next_data ou html)
+        self.extraction_paths = {}
+
+        self.flight = shared_flight if coalesce else None
+        self.session_id = session_id or uuid.uuid4().hex
+        self.resilience = get_resilient_caller() if resilient else None
+        self.tracer = get_tracer(trace_path)
+        self.selectors = get_selector_learner()
+        self.planner = get_store_planner() if plan_stores else None
+        self.last_search_id = None
+        self.last_plan = None
+        self.synthetic_size = synthetic_size
+        self.synthetic_seed = synthetic_seed
+        self.bounded_memory = bounded_memory
+        self.memory = None
+        self.last_memory = None
+        if memory_report:
+            from memory import get_memory_profiler
+            self.memory = get_memory_profiler()
+        self.cache = None
+        if cache_url:
+            from shared_cache import CACHE_TTL, get_shared_cache
+            self.cache = get_shared_cache(cache_url, cache_ttl or CACHE_TTL)
+        self.parse_memo = None
+        if parse_memo:
+            from parse_memo import get_parse_memo
+            self.parse_memo = get_parse_memo()
+        self.proxies = None
+        if proxies:
+            from proxies import get_proxy_pool
+            self.proxies = get_proxy_pool(proxies)
+
+        self.index = None
+        if index_path:
+            from product_index import ProductIndex
+            self.index = ProductIndex(index_path)
+        # Sugestões de busca do processo, carregadas uma vez do índice local (se houver)
+        self.suggestions = get_suggestion_index(self.index)
+
+        self.analytics = None
+        if analytics_path:
+            from analytics import PriceAnalytics
+            self.analytics = PriceAnalytics(analytics_path)
+
+        self.watchlist = None
+        if watchlist_path:
+            from watchlist import Watchlist
+            self.watchlist = Watchlist(watchlist_path)
+
+        if parse_mode not in ('inline', 'process'):
+            raise ValueError(f"Modo de parsing inválido: {parse_mode}")
+        self.parse_mode = parse_mode
+        self.parser_pool = None
+        if parse_mode == 'process':
+            from parser_pool import get_parser_pool
+            self.parser_pool = get_parser_pool(parser_workers)
+
+    def _pool_sizes(self):
+        """Conexões por host: as requisições simultâneas que o agendador permite à loja, mais uma para o hedging."""
+        sizes = {}
+        for store_name, spec in STORE_SPECS.items():
+            limit = DEFAULT_POOL_SIZE
+            if self.scheduler is not None:
+                limit = self.scheduler.store_limits.get(store_name, self.scheduler.per_store_limit)
+            sizes[spec['base_url']] = limit + 1
+        return sizes
+
+    def for_session(self, session_id):
+        """Cópia leve do scraper (mesmo transporte, índice e pool) para outra sessão do agendador."""
+        scraper = copy.copy(self)
+        scraper.session_id = session_id
+        return scraper
+
     def _get_headers(self):
         return {
             'User-Agent': random.choice(self.user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': ACCEPT_ENCODING,
             'DNT': '1',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
@@ -48,43 +705,16 @@ class SupplementScraper:
             'Pragma': 'no-cache',
             'Cache-Control': 'no-cache',
         }
-    
-    def _extract_brand(self, title):
-        """Tenta extrair a marca do título do produto."""
-        title_lower = title.lower()
-        for brand in KNOWN_BRANDS:
-            if brand.lower() in title_lower:
-                return brand
-        # Tenta pegar a primeira palavra capitalizada como último recurso
-        match = re.search(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b', title)
-        if match and match.group(1).lower() not in ['whey', 'creatina', 'bcaa', 'glutamina', 'protein', 'capsulas', 'sabor']: # Evitar palavras genéricas
-             return match.group(1)
-        return "Marca Desconhecida"
 
-    def _parse_price(self, price_text):
-        """Converte texto de preço para float, lidando com diferentes formatos."""
-        try:
-            # Remove 'R$', espaços e troca vírgula por ponto
-            price_clean = re.sub(r'[^\d,]', '', price_text).replace(',', '.')
-            # Se houver múltiplos pontos (milhar), remove exceto o último
-            if price_clean.count('.') > 1:
-                parts = price_clean.split('.')
-                price_clean = "".join(parts[:-1]) + "." + parts[-1]
-            return float(price_clean)
-        except (ValueError, TypeError):
-            return 0.0
-        except Exception as e:
-             logging.error(f"Erro inesperado ao converter preço '{price_text}': {str(e)}")
-             return 0.0
+    def _build_headers(self, spec):
+        """Monta os cabeçalhos da requisição conforme o perfil da loja."""
+        referer = spec['base_url'] + '/'
+        profile = spec['headers']
 
-    def search_amazon(self, query, max_results=5):
-        try:
-            search_query = quote(query)
-            url = f"https://www.amazon.com.br/s?k={search_query}&i=drugstore&rh=n%3A16210003011"
-            
+        if profile == 'navegador':
             headers = self._get_headers()
             headers.update({
-                'Referer': 'https://www.amazon.com.br/',
+                'Referer': referer,
                 'sec-ch-ua': '"Chromium";v="112", "Google Chrome";v="112", "Not:A-Brand";v="99"',
                 'sec-ch-ua-mobile': '?0',
                 'sec-ch-ua-platform': '"Windows"',
@@ -95,750 +725,477 @@ class SupplementScraper:
                 'Sec-Fetch-User': '?1',
                 'Cache-Control': 'max-age=0'
             })
-            
-            logging.info(f"Fazendo requisição para Amazon: {url}")
-            response = self.session.get(url, headers=headers, timeout=15)
-            logging.info(f"Status code Amazon: {response.status_code}")
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                items = soup.select('div[data-asin]:not([data-asin=""])')
-                
-                if not items:
-                    items = soup.select('.s-result-item')
-                if not items:
-                    items = soup.select('div[data-component-type="s-search-result"]')
-                
-                logging.info(f"Encontrados {len(items)} itens na Amazon")
-                
-                results = []
-                processed_asins = set()
-                
-                for item in items:
-                    if len(results) >= max_results:
-                        break
-                        
-                    try:
-                        asin = item.get('data-asin')
-                        if not asin or asin in processed_asins:
-                            continue
-                        
-                        title_element = item.select_one('h2 span.a-text-normal, h2.a-size-medium, .a-text-normal')
-                        price_whole = item.select_one('span.a-price-whole, .a-price-whole')
-                        price_fraction = item.select_one('span.a-price-fraction, .a-price-fraction')
-                        image_element = item.select_one('img.s-image, .s-image')
-                        link_element = item.select_one('a.a-link-normal[href*="/dp/"], a[href*="/dp/"]')
-                        
-                        if not all([title_element, price_whole, price_fraction, link_element]):
-                            continue
-                        
-                        title = title_element.text.strip()
-                        price_text = f"{price_whole.text.strip()}{price_fraction.text.strip()}"
-                        price = self._parse_price(price_text)
-                        brand = self._extract_brand(title)
-                        
-                        image_url = image_element.get('src') or image_element.get('data-src') if image_element else "https://via.placeholder.com/150"
-                        href = link_element.get('href')
-                        product_link = "https://www.amazon.com.br" + href if href and not href.startswith('http') else href
-                        
-                        if price > 0 and product_link:
-                            results.append({
-                                'title': title,
-                                'price': price,
-                                'image_url': image_url,
-                                'link': product_link,
-                                'store': 'Amazon',
-                                'brand': brand,
-                                'query_date': self.current_date
-                            })
-                            processed_asins.add(asin)
-                            logging.info(f"Adicionado produto Amazon: {title[:30]}... (Marca: {brand})")
-                            
-                    except Exception as e:
-                        logging.error(f"Erro ao processar item da Amazon: {str(e)}")
-                        continue
-                
-                logging.info(f"Total de produtos encontrados na Amazon: {len(results)}")
-                return results
-                
-            elif response.status_code == 503:
-                logging.error("Amazon retornou erro 503 (Service Unavailable). O site pode estar bloqueando requisições.")
-                return []
-            else:
-                logging.error(f"Amazon retornou status code inesperado: {response.status_code}")
-                return []
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão ao buscar na Amazon: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Amazon: {str(e)}", exc_info=True)
-            return []
+            return headers
 
-    def search_growth_suplementos(self, query, max_results=5):
-        try:
-            search_query = quote(query)
-            url = f"https://www.gsuplementos.com.br/busca?q={search_query}"
-            
+        if profile == 'basico':
             headers = self._get_headers()
             headers.update({
-                'Referer': 'https://www.gsuplementos.com.br/',
-                'sec-ch-ua': '"Chromium";v="112", "Google Chrome";v="112", "Not:A-Brand";v="99"',
-                'sec-ch-ua-mobile': '?0',
-                'sec-ch-ua-platform': '"Windows"',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': 'pt-BR,pt;q=0.8,en-US;q=0.5,en;q=0.3',
+                'Connection': 'keep-alive',
                 'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0'
+                'Referer': referer
             })
-            
-            logging.info(f"Fazendo requisição para Growth: {url}")
-            response = self.session.get(url, headers=headers, timeout=15)
-            logging.info(f"Status code Growth: {response.status_code}")
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                items = soup.select('.product-item, .item.product, .product, .products-grid .item, .product-list .item')
-                
-                logging.info(f"Encontrados {len(items)} itens na Growth")
-                
-                results = []
-                for item in items:
-                    if len(results) >= max_results:
-                        break
-                        
-                    try:
-                        title_element = item.select_one('.product-name, .product-item-name, .name, .product-title')
-                        price_element = item.select_one('.price, .product-price, .price-box, .price-value')
-                        image_element = item.select_one('.product-image img, .product-image-photo, img.product-image, .product-image')
-                        link_element = item.select_one('a.product-item-link, a.product-item__link, a.product, a.product-link')
-                        
-                        if not all([title_element, price_element, link_element]):
-                            continue
-                        
-                        title = title_element.text.strip()
-                        price_text = price_element.text.strip()
-                        price = self._parse_price(price_text)
-                        brand = "Growth Suplementos" if "growth" in title.lower() else self._extract_brand(title)
-                        
-                        image_url = image_element.get('src') or image_element.get('data-src') if image_element else "https://via.placeholder.com/150"
-                        product_link = link_element.get('href')
-                        
-                        if product_link and not product_link.startswith('http'):
-                            product_link = "https://www.gsuplementos.com.br" + product_link
-                        
-                        if price > 0 and product_link:
-                            results.append({
-                                'title': title,
-                                'price': price,
-                                'image_url': image_url,
-                                'link': product_link,
-                                'store': 'Growth Suplementos',
-                                'brand': brand,
-                                'query_date': self.current_date
-                            })
-                            logging.info(f"Adicionado produto Growth: {title[:30]}... (Marca: {brand})")
-                            
-                    except Exception as e:
-                        logging.error(f"Erro ao processar item da Growth: {str(e)}")
-                        continue
-                
-                logging.info(f"Total de produtos encontrados na Growth: {len(results)}")
-                return results
-                
+            return headers
+
+        return {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+            'Referer': referer
+        }
+
+    def _extract_brand(self, title):
+        """Tenta extrair a marca do título do produto."""
+        return extract_brand(title)
+
+    def _parse_price(self, price_text):
+        """Converte texto de preço para float, lidando com diferentes formatos."""
+        return parse_price(price_text)
+
+    def _parse(self, store_name, content, max_results, price_range=None):
+        """Extrai os produtos do HTML, localmente ou no pool de processos; devolve (produtos, descartados)."""
+        started = perf_counter()
+        memo_key = None
+        if self.parse_memo is not None:
+            memo_key = self.parse_memo.key(store_name, STORE_SPECS[store_name], content, max_results, price_range)
+            memoized = self.parse_memo.get(memo_key, self.current_date)
+            if memoized is not None:
+                results, path, dropped = memoized
+                tracing.record('parse_memo', started, perf_counter(), path=path, products=len(results))
+                self.extraction_paths[store_name] = path
+                logging.info(f"Extração {store_name}: {len(results)} produtos da memória (página igual já extraída via {path})")
+                return results, dropped
+            started = perf_counter()
+        with self._measure(store_name, content):
+            if self.parser_pool is not None:
+                results, path, timings, dropped = self.parser_pool.parse(store_name, content, max_results, self.current_date, price_range)
             else:
-                logging.error(f"Growth retornou status code inesperado: {response.status_code}")
-                return []
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão ao buscar na Growth: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Growth: {str(e)}", exc_info=True)
-            return []
+                results, path, timings, dropped = extract_products(store_name, content, max_results, self.current_date, price_range)
+        # No pool, a diferença até o tempo total é a ida e volta entre processos
+        tracing.record('parse', started, started + timings['parse'], path=path, mode=self.parse_mode)
+        tracing.record('extraction', started + timings['parse'], started + timings['parse'] + timings['extraction'],
+                       path=path, products=len(results))
+        if memo_key is not None:
+            self.parse_memo.put(memo_key, results, path, dropped)
+        self.extraction_paths[store_name] = path
+        logging.info(f"Extração {store_name}: {len(results)} produtos via {path}" + (f" ({dropped} fora da faixa de preço)" if dropped else ""))
+        return results, dropped
 
-    def search_integralmedica(self, query, max_results=5):
-        try:
-            url = f"https://www.integralmedica.com.br/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.integralmedica.com.br/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Integral Medica para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Integral Medica'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Integral Medica: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Integral Medica")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Integral Medica: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Integral Medica: {str(e)}")
-            return []
+    def _measure(self, store_name, content):
+        if self.memory is None:
+            return contextlib.nullcontext()
+        return self.memory.measure(store_name, len(content))
+
+    def _request(self, store_name, url, headers, timeout):
+        """Faz o GET com a política de resiliência da loja (novas tentativas e hedging)."""
+        options = {}
+        if self.bounded_memory:
+            options['max_bytes'] = STORE_SPECS[store_name].get('max_body_kb', DEFAULT_MAX_BODY_KB) * 1024
+
+        def attempt():
+            if self.scheduler is None:
+                return get()
+            with self.scheduler.store_slot(store_name):
+                return get()
+
+        def get():
+            if self.proxies is None:
+                return self.transport.get(url, headers=headers, timeout=timeout, **options)
+            # Cada tentativa pede o proxy de novo: depois de um bloqueio vem outro
+            proxy = self.proxies.acquire(self.session_id, store_name)
+            started = perf_counter()
+            try:
+                response = self.transport.get(url, headers=headers, timeout=timeout, proxy=proxy, **options)
+            except TransportError as e:
+                # Página grande demais não é culpa do proxy
+                self.proxies.release(proxy, store_name, error=e.retryable)
+                raise
+            self.proxies.release(proxy, store_name, status=response.status_code, latency=perf_counter() - started)
+            return response
+
+        if self.resilience is None:
+            return attempt()
+        # A vaga da loja é reservada pela política, fora do tempo medido para o hedging
+        return self.resilience.call(store_name, get, slots=self.scheduler)
+
+    def _page_url(self, spec, search_query, page):
+        url = spec['search_url'].format(query=search_query)
+        if page > 1:
+            url += f"&{spec['page_param']}={page}"
+        return url
 
-    def search_netshoes(self, query, max_results=5):
+    def _fetch_page(self, store_name, url, max_results, price_range=None):
+        """Busca uma página de resultados e extrai os produtos dela; devolve (produtos, descartados)."""
+        with tracing.span('page', url=url):
+            return self._fetch_page_traced(store_name, url, max_results, price_range)
+
+    def _fetch_page_traced(self, store_name, url, max_results, price_range):
+        spec = STORE_SPECS[store_name]
         try:
-            url = f"https://www.netshoes.com.br/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.netshoes.com.br/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Netshoes para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Netshoes'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Netshoes: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Netshoes")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Netshoes: {str(e)}")
-            return []
+            headers = self._build_headers(spec)
+
+            logging.info(f"Fazendo requisição para {store_name}: {url}")
+            response = self._request(store_name, url, headers, spec['timeout'])
+            logging.info(f"Status code {store_name}: {response.status_code}")
+
+            if response.status_code == 200:
+                return self._parse(store_name, response.content, max_results, price_range)
+            elif response.status_code == 503:
+                logging.error(f"{store_name} retornou erro 503 (Service Unavailable). O site pode estar bloqueando requisições.")
+            else:
+                logging.error(f"{store_name} retornou status code inesperado: {response.status_code}")
+            error = f"status {response.status_code}"
+
+        except ReplayMismatch:
+            raise
+        except TransportError as e:
+            logging.error(f"Erro de conexão ao buscar na {store_name}: {str(e)}")
+            error = str(e)
         except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Netshoes: {str(e)}")
-            return []
+            logging.error(f"Erro inesperado ao buscar na {store_name}: {str(e)}", exc_info=True)
+            error = str(e)
+        raise StoreUnavailable(f"{store_name}: {error}")
 
-    def search_maxtitanium(self, query, max_results=5):
+    def _fetch_api_chunk(self, store_name, search_query, start, end, price_range=None):
+        """Consulta o endpoint JSON de catálogo da loja para o intervalo [start, end]."""
+        spec = STORE_SPECS[store_name]
+        url = spec['api_url'].format(base_url=spec['base_url'], query=search_query, start=start, end=end)
+        if price_range is not None and spec.get('api_price_filter'):
+            low, high = price_range
+            url += spec['api_price_filter'].format(low=low or 0, high=high if high is not None else '*')
+        with tracing.span('api', url=url):
+            return self._fetch_api_url(store_name, url, start, end, price_range)
+
+    def _fetch_api_url(self, store_name, url, start, end, price_range):
+        spec = STORE_SPECS[store_name]
         try:
-            url = f"https://www.maxtitanium.com.br/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.maxtitanium.com.br/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Max Titanium para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Max Titanium'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Max Titanium: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Max Titanium")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Max Titanium: {str(e)}")
-            return []
+            headers = self._build_headers(spec)
+            headers['Accept'] = 'application/json'
+            logging.info(f"Fazendo requisição para API {store_name}: {url}")
+            response = self._request(store_name, url, headers, spec['timeout'])
+            if response.status_code in (200, 206):
+                started = perf_counter()
+                with self._measure(store_name, response.content):
+                    raw_products = structured.API_EXTRACTORS[spec['api']](response.content)
+                    results, dropped = structured_records(store_name, spec, raw_products, end - start + 1, self.current_date, price_range)
+                tracing.record('extraction', started, perf_counter(), path='api', products=len(results))
+                return results, dropped
+            logging.warning(f"API {store_name} retornou status code {response.status_code}")
+        except ReplayMismatch:
+            raise
+        except TransportError as e:
+            logging.warning(f"Erro de conexão com a API {store_name}: {str(e)}")
         except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Max Titanium: {str(e)}")
-            return []
+            logging.warning(f"Erro inesperado na API {store_name}: {str(e)}")
+        return [], 0
+
+    def _search_api(self, store_name, query, max_results, price_range=None):
+        """Busca pela API de catálogo, em blocos de até 50 itens pedidos em paralelo; devolve (produtos, descartados)."""
+        search_query = quote(canonicalize(query).for_store(STORE_SPECS[store_name]))
+        chunks = [(start, min(start + 50, max_results) - 1) for start in range(0, max_results, 50)][:self.max_pages]
+        if len(chunks) == 1:
+            chunk_results = [self._fetch_api_chunk(store_name, search_query, *chunks[0], price_range)]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                chunk_results = list(executor.map(
+                    tracing.wrap(lambda chunk: self._fetch_api_chunk(store_name, search_query, *chunk, price_range)), chunks
+                ))
 
-    def search_atlhetica(self, query, max_results=5):
-        search_query = quote(query)
-        url = f"https://www.atlheticanutrition.com.br/busca?q={search_query}"
         results = []
+        seen = set()
+        for products, _ in chunk_results:
+            for product in products:
+                key = product_key(store_name, product)
+                if key not in seen:
+                    seen.add(key)
+                    results.append(product)
+        return results[:max_results], sum(dropped for _, dropped in chunk_results)
+
+    def _search_store(self, store_name, query, max_results=5, price_range=None):
+        """Busca na loja, compartilhando o resultado com buscas idênticas em andamento."""
+        with tracing.span('store', store=store_name):
+            return self._search_store_coalesced(store_name, query, max_results, price_range)
+
+    def _search_store_coalesced(self, store_name, query, max_results, price_range):
+        if self.flight is None:
+            return self._cached_fetch(store_name, query, max_results, price_range)
+
+        spec = STORE_SPECS[store_name]
+        # Chave pelo texto que a loja recebe: aliases que mudam esse texto não dividem resultado
+        key = (canonicalize(query).for_store(spec), store_name, max_results, price_range)
+        # O seguidor espera, no máximo, a fila mais o pior caso da busca líder
+        timeout = spec['timeout'] * (self.max_pages + 1) + max(spec.get('delay', (0, 0)))
+        if self.resilience is not None:
+            policy = self.resilience.policy(store_name)
+            timeout = timeout * (policy.retries + 1) + policy.backoff_max * policy.retries
+        if self.scheduler is not None:
+            timeout += self.scheduler.max_wait
         try:
-            logging.info(f"Buscando na Atlhetica: {url}")
-            
-            headers = self._get_headers()
-            headers.update({
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.8,en-US;q=0.5,en;q=0.3',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Referer': 'https://www.atlheticanutrition.com.br/'
-            })
-            
-            response = requests.get(url, headers=headers, timeout=15)
-            logging.info(f"Status code Atlhetica: {response.status_code}")
+            return list(self.flight.do(key, self._cached_fetch, store_name, query, max_results, price_range, timeout, timeout=timeout))
+        except (SingleFlightTimeout, SchedulerBusy) as e:
+            logging.error(f"Erro ao buscar na {store_name}: {str(e)}")
+            return []
 
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                items = soup.select('.product-item, .item.product, .product, .products-grid .item, .product-list .item, .product')
-                
-                logging.info(f"Encontrados {len(items)} itens na Atlhetica")
-
-                count = 0
-                for item in items:
-                    if count >= max_results:
-                        break
-
-                    try:
-                        title_element = item.select_one('.product-name, .product-item-name, .name, .product-title')
-                        price_element = item.select_one('.price, .product-price, .price-box, .price-value')
-                        image_element = item.select_one('.product-image img, .product-image-photo, img.product-image, .product-image')
-                        link_element = item.select_one('a.product-item-link, a.product-item__link, a.product, a.product-link')
-
-                        if not all([title_element, price_element, link_element]):
-                            logging.debug(f"Item incompleto: {item}")
-                            continue
-
-                        title = title_element.text.strip()
-                        price_text = price_element.text.strip()
-                        price = self._parse_price(price_text)
-                        brand = "Atlhetica" if "atlhetica" in title.lower() else self._extract_brand(title)
-
-                        image_url = image_element.get('src') or image_element.get('data-src') if image_element else "https://via.placeholder.com/150"
-                        product_link = link_element.get('href')
-
-                        if product_link and not product_link.startswith('http'):
-                            product_link = "https://www.atlheticanutrition.com.br" + product_link
-
-                        if price > 0 and product_link:
-                            results.append({
-                                'title': title,
-                                'price': price,
-                                'image_url': image_url,
-                                'link': product_link,
-                                'store': 'Atlhetica Nutrition',
-                                'brand': brand,
-                                'query_date': self.current_date
-                            })
-                            count += 1
-                            logging.info(f"Adicionado produto Atlhetica: {title[:30]}... (Marca: {brand})")
-                            
-                    except Exception as e:
-                        logging.error(f"Erro ao processar item da Atlhetica: {str(e)}")
-                        continue
+    def _cached_fetch(self, store_name, query, max_results=5, price_range=None, wait=None):
+        """Busca na loja passando pelo cache compartilhado entre réplicas, se houver."""
+        if self.cache is None:
+            return self._scheduled_fetch(store_name, query, max_results, price_range)
+        return self.cache.fetch(
+            (store_name, canonicalize(query).for_store(STORE_SPECS[store_name]), max_results, price_range),
+            partial(self._scheduled_fetch, store_name, query, max_results, price_range), wait=wait
+        )
 
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão ao buscar na Atlhetica: {str(e)}")
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Atlhetica: {str(e)}", exc_info=True)
+    def _scheduled_fetch(self, store_name, query, max_results=5, price_range=None):
+        """Envia a busca para o agendador global, que atende as sessões em rodízio."""
+        if self.scheduler is None:
+            return self._fetch_store(store_name, query, max_results, price_range)
+        return self.scheduler.run(self.session_id, store_name, self._fetch_store, store_name, query, max_results, price_range)
 
-        sleep(random.uniform(3.0, 5.0))
-        logging.info(f"Total de produtos encontrados na Atlhetica: {len(results)}")
+    def _fetch_store(self, store_name, query, max_results=5, price_range=None):
+        """Busca na loja, preferindo a API de catálogo quando configurada."""
+        spec = STORE_SPECS[store_name]
+        results, dropped = [], 0
+        if spec.get('api'):
+            results, dropped = self._search_api(store_name, query, max_results, price_range)
+            if results or dropped:
+                self.extraction_paths[store_name] = 'api'
+                logging.info(f"Extração {store_name}: {len(results)} produtos via api")
+        if not results and not dropped:
+            results = self._search_pages(store_name, query, max_results, price_range)
+
+        if spec.get('delay'):
+            sleep(random.uniform(*spec['delay']))
+        logging.info(f"Total de produtos encontrados na {store_name}: {len(results)}")
         return results
 
-    def search_probiotica(self, query, max_results=5):
-        search_query = quote(query)
-        url = f"https://www.probiotica.com.br/busca?q={search_query}"
+    def _search_pages(self, store_name, query, max_results, price_range=None):
+        """Busca as páginas de resultado, paginando até reunir max_results produtos.
+
+        As páginas são pedidas em lotes concorrentes, com o tamanho do lote
+        estimado a partir do número de itens por página. Um novo lote só é
+        disparado se o anterior não bastou e a última página ainda tinha itens.
+        """
+        spec = STORE_SPECS[store_name]
+        search_query = quote(canonicalize(query).for_store(spec))
+
         results = []
-        try:
-            logging.info(f"Buscando na Probiótica: {url}")
-            
-            headers = self._get_headers()
-            headers.update({
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.8,en-US;q=0.5,en;q=0.3',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Referer': 'https://www.probiotica.com.br/'
-            })
-            
-            response = requests.get(url, headers=headers, timeout=15)
-            logging.info(f"Status code Probiótica: {response.status_code}")
+        seen = set()
+        failures = []
+        any_dropped = False
+        page_size = spec['page_size']
+        next_page = 1
 
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                items = soup.select('.product-item, .item.product, .product, .products-grid .item, .product-list .item, .product')
-                
-                logging.info(f"Encontrados {len(items)} itens na Probiótica")
-
-                count = 0
-                for item in items:
-                    if count >= max_results:
-                        break
-
-                    try:
-                        title_element = item.select_one('.product-name, .product-item-name, .name, .product-title')
-                        price_element = item.select_one('.price, .product-price, .price-box, .price-value')
-                        image_element = item.select_one('.product-image img, .product-image-photo, img.product-image, .product-image')
-                        link_element = item.select_one('a.product-item-link, a.product-item__link, a.product, a.product-link')
-
-                        if not all([title_element, price_element, link_element]):
-                            logging.debug(f"Item incompleto: {item}")
-                            continue
-
-                        title = title_element.text.strip()
-                        price_text = price_element.text.strip()
-                        price = self._parse_price(price_text)
-                        brand = "Probiótica" if "probiótica" in title.lower() else self._extract_brand(title)
-
-                        image_url = image_element.get('src') or image_element.get('data-src') if image_element else "https://via.placeholder.com/150"
-                        product_link = link_element.get('href')
-
-                        if product_link and not product_link.startswith('http'):
-                            product_link = "https://www.probiotica.com.br" + product_link
-
-                        if price > 0 and product_link:
-                            results.append({
-                                'title': title,
-                                'price': price,
-                                'image_url': image_url,
-                                'link': product_link,
-                                'store': 'Probiótica',
-                                'brand': brand,
-                                'query_date': self.current_date
-                            })
-                            count += 1
-                            logging.info(f"Adicionado produto Probiótica: {title[:30]}... (Marca: {brand})")
-                            
-                    except Exception as e:
-                        logging.error(f"Erro ao processar item da Probiótica: {str(e)}")
+        def fetch(page):
+            try:
+                return self._fetch_page(store_name, self._page_url(spec, search_query, page), max_results, price_range)
+            except StoreUnavailable as e:
+                failures.append(e)
+                return [], 0
+
+        while len(results) < max_results and next_page <= self.max_pages:
+            missing = max_results - len(results)
+            wave = min(-(-missing // page_size), self.max_pages - next_page + 1)
+            pages = range(next_page, next_page + wave)
+            next_page += wave
+
+            if wave == 1:
+                page_results = [fetch(pages[0])]
+            else:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=wave) as executor:
+                    page_results = list(executor.map(tracing.wrap(fetch), pages))
+
+            for products, dropped in page_results:
+                any_dropped = any_dropped or bool(dropped)
+                for product in products:
+                    key = product_key(store_name, product)
+                    if key in seen:
                         continue
+                    seen.add(key)
+                    results.append(product)
+            results = results[:max_results]
 
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão ao buscar na Probiótica: {str(e)}")
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Probiótica: {str(e)}", exc_info=True)
+            # Página sem nada, nem itens fora da faixa de preço: acabaram os resultados
+            if not any(page_results[-1]):
+                break
+            # Ajusta a estimativa com o que as páginas realmente trouxeram
+            page_size = max(1, min(page_size, max(len(products) + dropped for products, dropped in page_results)))
 
-        sleep(random.uniform(3.0, 5.0))
-        logging.info(f"Total de produtos encontrados na Probiótica: {len(results)}")
+        # Nenhum produto e alguma página falhou: a loja não respondeu, não é que não tenha o produto
+        if not results and not any_dropped and failures:
+            raise failures[0]
         return results
 
-    def search_belezanaweb(self, query, max_results=5):
-        try:
-            url = f"https://www.belezanaweb.com.br/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.belezanaweb.com.br/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Beleza na Web para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Beleza na Web'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Beleza na Web: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Beleza na Web")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Beleza na Web: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Beleza na Web: {str(e)}")
-            return []
+    def search_amazon(self, query, max_results=5, price_range=None):
+        return self._search_store('Amazon', query, max_results, price_range)
 
-    def search_epocacosmeticos(self, query, max_results=5):
-        try:
-            url = f"https://www.epocacosmeticos.com.br/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.epocacosmeticos.com.br/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Época Cosméticos para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Época Cosméticos'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Época Cosméticos: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Época Cosméticos")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Época Cosméticos: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Época Cosméticos: {str(e)}")
-            return []
+    def search_growth_suplementos(self, query, max_results=5, price_range=None):
+        return self._search_store('Growth Suplementos', query, max_results, price_range)
 
-    def search_onofre(self, query, max_results=5):
-        try:
-            url = f"https://www.onofre.com.br/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.onofre.com.br/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Onofre para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Onofre'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Onofre: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Onofre")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Onofre: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Onofre: {str(e)}")
-            return []
+    def search_integralmedica(self, query, max_results=5, price_range=None):
+        return self._search_store('Integral Medica', query, max_results, price_range)
 
-    def search_drogaraia(self, query, max_results=5):
-        try:
-            url = f"https://www.drogaraia.com.br/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.drogaraia.com.br/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Droga Raia para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Droga Raia'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Droga Raia: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Droga Raia")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Droga Raia: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Droga Raia: {str(e)}")
-            return []
+    def search_netshoes(self, query, max_results=5, price_range=None):
+        return self._search_store('Netshoes', query, max_results, price_range)
 
-    def search_panvel(self, query, max_results=5):
-        try:
-            url = f"https://www.panvel.com/busca?q={query}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://www.panvel.com/'
-            }
-            
-            response = self.session.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('div.product-item, div.item-product, div.product-card')
-            
-            if not items:
-                logging.warning(f"Nenhum item encontrado na Panvel para: {query}")
-                return []
-            
-            results = []
-            for item in items[:max_results]:
-                try:
-                    title = item.select_one('h2.product-name, h3.product-title, a.product-name')
-                    price = item.select_one('span.price, div.price-box, span.product-price')
-                    image = item.select_one('img.product-image, img.product-img, img.lazy')
-                    link = item.select_one('a.product-link, a.product-item-link')
-                    
-                    if not all([title, price, image, link]):
-                        continue
-                        
-                    results.append({
-                        'title': title.text.strip(),
-                        'price': price.text.strip(),
-                        'image_url': image.get('src', '') or image.get('data-src', ''),
-                        'link': link.get('href', ''),
-                        'store': 'Panvel'
-                    })
-                except Exception as e:
-                    logging.error(f"Erro ao processar item da Panvel: {str(e)}")
-                    continue
-            
-            logging.info(f"Encontrados {len(results)} produtos na Panvel")
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro de conexão com Panvel: {str(e)}")
-            return []
-        except Exception as e:
-            logging.error(f"Erro inesperado ao buscar na Panvel: {str(e)}")
-            return []
+    def search_maxtitanium(self, query, max_results=5, price_range=None):
+        return self._search_store('Max Titanium', query, max_results, price_range)
+
+    def search_atlhetica(self, query, max_results=5, price_range=None):
+        return self._search_store('Atlhetica Nutrition', query, max_results, price_range)
+
+    def search_probiotica(self, query, max_results=5, price_range=None):
+        return self._search_store('Probiótica', query, max_results, price_range)
+
+    def search_belezanaweb(self, query, max_results=5, price_range=None):
+        return self._search_store('Beleza na Web', query, max_results, price_range)
+
+    def search_epocacosmeticos(self, query, max_results=5, price_range=None):
+        return self._search_store('Época Cosméticos', query, max_results, price_range)
+
+    def search_onofre(self, query, max_results=5, price_range=None):
+        return self._search_store('Onofre', query, max_results, price_range)
+
+    def search_drogaraia(self, query, max_results=5, price_range=None):
+        return self._search_store('Droga Raia', query, max_results, price_range)
+
+    def search_panvel(self, query, max_results=5, price_range=None):
+        return self._search_store('Panvel', query, max_results, price_range)
 
-    def search_supplements(self, query, max_results=5):
-        """Busca produtos em todas as lojas disponíveis."""
-        logging.info(f"Iniciando busca de suplementos para: {query}")
+    def search_supplements(self, query, max_results=5, mode='live', refresh=False, stores=None, min_price=None, max_price=None,
+                           deadline=None, target=None):
+        """Busca produtos em todas as lojas disponíveis e devolve um ProductBatch.
+
+        mode='index' responde pelo índice local (query_date é a última vez em
+        que o produto foi visto) e só vai às lojas se o índice não tiver nada;
+        com refresh=True uma busca ao vivo roda em segundo plano para atualizá-lo.
+        mode='synthetic' busca num catálogo sintético em memória, sem rede.
+        A busca 'teste [ofertas] [semente]' devolve o próprio catálogo sintético.
+        stores limita as lojas consultadas e min_price/max_price descartam os
+        itens fora da faixa já na extração, sem contar para max_results.
+        Na busca ao vivo o planejador escolhe, entre as lojas pedidas, as que
+        valem a pena para um prazo (deadline, em segundos) e uma meta de
+        resultados (target); o plano usado fica em self.last_plan.
+        O trace da busca fica em self.tracer, com o ID em self.last_search_id.
+        """
+        # O scraper vive o processo inteiro (app e serviço): a data é a da busca, não a da criação
+        self.current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self.tracer.trace(query) as trace:
+            self.last_search_id = trace.search_id
+            results = self._search(query, max_results, mode, refresh, stores, make_price_range(min_price, max_price), deadline, target)
+        if self.memory is not None:
+            self.last_memory = self.memory.report(trace.search_id)
+        return results
+
+    def _search(self, query, max_results, mode, refresh, stores=None, price_range=None, deadline=None, target=None):
+        canonical = canonicalize(query)
+        logging.info(f"Iniciando busca de suplementos para: {query} (chave: {canonical.key})")
         logging.info(f"Máximo de resultados por loja: {max_results}")
-        
-        if query.lower() == 'teste':
+
+        mock = mock_request(query)
+        if mock:
             logging.info("Modo teste ativado - retornando dados mock")
-            return self._get_mock_data()
-        
-        stores = {
+            return self._filter_mock(self._get_mock_data(*mock), stores, price_range)
+
+        # Lojas pedidas explicitamente nunca ficam de fora do plano
+        explicit = bool(stores)
+        stores = [store_name for store_name in (stores or STORE_SPECS) if store_name in STORE_SPECS]
+        if len(stores) < len(STORE_SPECS) or price_range:
+            logging.info(f"Filtros: {len(stores)} lojas, faixa de preço {price_range}")
+
+        if mode == 'synthetic':
+            from synthetic import get_synthetic_store
+            return get_synthetic_store(self.synthetic_size, self.synthetic_seed).search(query, max_results, stores, price_range)
+
+        if mode == 'index' and self.index is not None:
+            results = self.index.search(query, max_results, stores, price_range)
+            if results:
+                if refresh:
+                    self._refresh_in_background(query, max_results, stores, price_range)
+                return results
+            logging.info("Índice local sem resultados - buscando nas lojas")
+
+        stores = self._plan(query, stores, max_results, deadline, target, required=explicit)
+        if self.scheduler is not None:
+            # Recusa logo de início, com mensagem clara, quando a fila está cheia
+            self.scheduler.admit(len(stores))
+        return self._search_live(query, max_results, stores, price_range, deadline)
+
+    def _plan(self, query, stores, max_results, deadline=None, target=None, required=False):
+        """Lojas a consultar, na ordem de envio, segundo o planejador (se ativo).
+
+        Com required=True as lojas foram escolhidas pelo usuário: o plano só as reordena.
+        """
+        self.last_plan = None
+        if self.planner is None:
+            return list(stores)
+        started = perf_counter()
+        plan = self.planner.plan(query, list(stores), max_results, deadline, target, required=stores if required else ())
+        tracing.record(
+            'plan', started, perf_counter(), category=plan.category,
+            skipped=list(plan.skipped), explored=plan.explored
+        )
+        self.last_plan = plan
+        return plan.stores
+
+    def _refresh_in_background(self, query, max_results, stores=None, price_range=None):
+        if self.scheduler is not None:
+            try:
+                self.scheduler.admit(len(stores or STORE_SPECS))
+            except SchedulerBusy:
+                # Com a fila cheia, fica só a resposta do índice
+                logging.info(f"Atualização em segundo plano de '{query}' ignorada: fila cheia")
+                return
+        threading.Thread(target=self._search_live, args=(query, max_results, stores, price_range), daemon=True).start()
+
+    def iter_search(self, query, max_results=5, stores=None, deadline=None, min_price=None, max_price=None, target=None):
+        """Busca ao vivo devolvendo (loja, produtos) à medida que cada loja termina.
+
+        stores limita as lojas consultadas (padrão: todas). Com deadline (em
+        segundos) a espera termina no prazo e as lojas atrasadas saem com
+        produtos None. O plano de lojas (self.last_plan) e a admissão no
+        agendador acontecem já na chamada, então SchedulerBusy sobe antes do
+        primeiro resultado. Não abre trace próprio.
+        """
+        price_range = make_price_range(min_price, max_price)
+        self.current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        mock = mock_request(query)
+        if mock:
+            self.last_plan = None
+            return self._iter_mock(stores, price_range, mock)
+        stores = self._plan(query, stores or STORE_SPECS, max_results, deadline, target, required=bool(stores))
+        if self.scheduler is not None:
+            self.scheduler.admit(len(stores))
+        return self._iter_live(query, max_results, stores, deadline, price_range)
+
+    def _iter_mock(self, stores, price_range=None, mock=(MOCK_SIZE, MOCK_SEED)):
+        by_store = {}
+        for product in self._filter_mock(self._get_mock_data(*mock), None, price_range):
+            by_store.setdefault(product.store, []).append(product)
+        for store_name in (stores or by_store):
+            yield store_name, by_store.get(store_name, [])
+
+    @staticmethod
+    def _filter_mock(results, stores, price_range):
+        if not stores and price_range is None:
+            return results
+        return ProductBatch(
+            product for product in results
+            if (not stores or product.store in stores)
+            and price_in_range(product.price, price_range)
+        )
+
+    def _iter_live(self, query, max_results, stores, deadline, price_range=None):
+        collected = ProductBatch()
+        for store_name, products in self._stream_stores(query, max_results, stores, deadline, price_range):
+            if products:
+                collected.extend(products)
+            yield store_name, products
+        if collected:
+            self._store_results(query, collected, price_range)
+
+    def _stream_stores(self, query, max_results, stores=None, deadline=None, price_range=None):
+        search_funcs = {
             'Amazon': self.search_amazon,
             'Growth Suplementos': self.search_growth_suplementos,
             'Integral Medica': self.search_integralmedica,
@@ -852,113 +1209,129 @@ class SupplementScraper:
             'Droga Raia': self.search_drogaraia,
             'Panvel': self.search_panvel
         }
-        
-        all_results = []
-        for store_name, search_func in stores.items():
+        stores = [store_name for store_name in (stores or search_funcs) if store_name in search_funcs]
+        if not stores:
+            return
+
+        # As requisições rodam em threads; o parsing fica na thread ou no pool de processos.
+        # Sem esperar o executor no fim: lojas que passaram do prazo terminam sozinhas.
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(stores))
+        started = perf_counter()
+        futures = {
+            executor.submit(tracing.wrap(partial(search_funcs[store_name], query, max_results, price_range))): store_name
+            for store_name in stores
+        }
+        pending = dict(futures)
+        observed = []   # (loja, produtos ou None, latência) para o planejador
+
+        def finished(store_name, future=None):
+            if future is None:
+                logging.warning(f"{store_name} não terminou dentro do prazo de {deadline}s")
+                products = None
+            else:
+                products = self._store_result(store_name, future)
+                if future.exception() is not None:
+                    # Loja com erro não diz nada sobre o rendimento nem sobre a latência
+                    return store_name, products
+            # Com faixa de preço o rendimento não representa a loja; só a latência conta
+            count = None if products is None or price_range else len(products)
+            observed.append((store_name, count, perf_counter() - started))
+            return store_name, products
+
+        try:
             try:
-                logging.info(f"Buscando na loja: {store_name}")
-                results = search_func(query, max_results)
-                if results:
-                    logging.info(f"Encontrados {len(results)} produtos na {store_name}")
-                    all_results.extend(results)
-                else:
-                    logging.warning(f"Nenhum produto encontrado na {store_name}")
-            except Exception as e:
-                logging.error(f"Erro ao buscar na {store_name}: {str(e)}")
-                continue
-        
+                for future in concurrent.futures.as_completed(futures, timeout=deadline):
+                    yield finished(pending.pop(future), future)
+            except concurrent.futures.TimeoutError:
+                for future, store_name in list(pending.items()):
+                    yield finished(store_name, future if future.done() else None)
+        finally:
+            executor.shutdown(wait=False)
+            if self.planner is not None:
+                self._record_plan(query, max_results, observed)
+
+    def _record_plan(self, query, max_results, observed):
+        """Alimenta o planejador com a busca; sem produto em loja nenhuma o rendimento fica de fora."""
+        category = query_category(query)
+        # Nada em loja nenhuma é quase sempre a busca (erro de digitação, produto raro), não as lojas
+        useful = any(count for _, count, _ in observed)
+        for store_name, count, latency in observed:
+            self.planner.record(category, store_name, count if useful else None, max_results, latency)
+
+    def _store_result(self, store_name, future):
+        try:
+            results = future.result()
+        except ReplayMismatch:
+            # Na reprodução, uma requisição sem gravação invalida a busca inteira
+            raise
+        except Exception as e:
+            logging.error(f"Erro ao buscar na {store_name}: {str(e)}")
+            return []
+        if results:
+            logging.info(f"Encontrados {len(results)} produtos na {store_name}")
+        else:
+            logging.warning(f"Nenhum produto encontrado na {store_name}")
+        return results
+
+    def _search_live(self, query, max_results, stores=None, price_range=None, deadline=None):
+        """Busca ao vivo nas lojas (padrão: todas), alimentando o índice local."""
+        by_store = dict(self._stream_stores(query, max_results, stores, deadline, price_range))
+
+        all_results = ProductBatch()
+        for store_name in STORE_SPECS:
+            if by_store.get(store_name):
+                all_results.extend(by_store[store_name])
+
         if not all_results:
             logging.warning("Nenhum produto encontrado em nenhuma loja")
-            return []
-        
+        else:
+            self._store_results(query, all_results, price_range)
+
         logging.info(f"Total de produtos encontrados: {len(all_results)}")
         return all_results
 
-    def _get_mock_data(self):
-        """Retorna dados simulados para testes."""
-        logging.info(f"Gerando 4 dados simulados para testes.") # 4 lojas
-        mock_data = [
-            {
-                'title': 'Whey Protein Concentrado (1kg) - Growth Suplements',
-                'price': random.uniform(80, 120),
-                'image_url': 'https://via.placeholder.com/150?text=Growth+Whey',
-                'link': 'https://www.gsuplementos.com.br/mock/whey-concentrado',
-                'store': 'Growth Suplements',
-                'brand': 'Growth Suplements',
-                'query_date': self.current_date
-            },
-            {
-                'title': 'Creatina Monohidratada (250g) - Growth Suplements',
-                'price': random.uniform(60, 90),
-                'image_url': 'https://via.placeholder.com/150?text=Growth+Creatina',
-                'link': 'https://www.gsuplementos.com.br/mock/creatina',
-                'store': 'Growth Suplements',
-                'brand': 'Growth Suplements',
-                'query_date': self.current_date
-            },
-            {
-                'title': 'Iso Triple Zero (900g) - Integral Medica',
-                'price': random.uniform(150, 220),
-                'image_url': 'https://via.placeholder.com/150?text=Integral+Iso',
-                'link': 'https://www.integralmedica.com.br/mock/iso-triple-zero',
-                'store': 'Integral Medica',
-                'brand': 'Integral Medica',
-                'query_date': self.current_date
-            },
-            {
-                'title': 'BCAA 2400 (100 Caps) - Integral Medica',
-                'price': random.uniform(40, 70),
-                'image_url': 'https://via.placeholder.com/150?text=Integral+BCAA',
-                'link': 'https://www.integralmedica.com.br/mock/bcaa-2400',
-                'store': 'Integral Medica',
-                'brand': 'Integral Medica',
-                'query_date': self.current_date
-            },
-            {
-                'title': 'Gold Standard 100% Whey (907g) - Optimum Nutrition',
-                'price': random.uniform(250, 350),
-                'image_url': 'https://via.placeholder.com/150?text=Optimum+Whey',
-                'link': 'https://www.amazon.com.br/mock/whey-gold-standard',
-                'store': 'Amazon',
-                'brand': 'Optimum Nutrition',
-                'query_date': self.current_date
-            },
-            {
-                'title': 'Creatine Powder (300g) - Optimum Nutrition',
-                'price': random.uniform(100, 150),
-                'image_url': 'https://via.placeholder.com/150?text=Optimum+Creatine',
-                'link': 'https://www.amazon.com.br/mock/creatine-powder',
-                'store': 'Amazon',
-                'brand': 'Optimum Nutrition',
-                'query_date': self.current_date
-            },
-             {
-                'title': 'Whey Protein Isolado Dux Nutrition 900g',
-                'price': random.uniform(180, 250),
-                'image_url': 'https://via.placeholder.com/150?text=Dux+Whey',
-                'link': 'https://www.netshoes.com.br/mock/dux-whey-isolado',
-                'store': 'Netshoes',
-                'brand': 'Dux Nutrition',
-                'query_date': self.current_date
-            },
-            {
-                'title': 'Creatina Max Titanium 300g',
-                'price': random.uniform(90, 130),
-                'image_url': 'https://via.placeholder.com/150?text=Max+Creatina',
-                'link': 'https://www.netshoes.com.br/mock/max-creatina',
-                'store': 'Netshoes',
-                'brand': 'Max Titanium',
-                'query_date': self.current_date
-            }
-        ]
-        # Replica e mistura os dados para simular mais resultados
-        full_mock_list = mock_data * 4 # Garante dados suficientes
-        random.shuffle(full_mock_list)
-        # Atualiza os preços para serem diferentes
-        for item in full_mock_list:
-            item['price'] = round(item['price'] * random.uniform(0.95, 1.05), 2)
+    def _store_results(self, query, results, price_range=None):
+        """Alimenta o índice local, os agregados de preço e a lista de observação com uma busca ao vivo."""
+        if self.index is not None:
+            self.index.add(results)
+            self.index.record_query(query)
+        self.suggestions.add_search(query, results)
+        # Uma busca com faixa de preço só vê parte dos preços e distorceria mínimo e mediana
+        if self.analytics is not None and price_range is None:
+            self.analytics.record(query, results)
+        if self.watchlist is not None:
+            self.watchlist.check(query, results)
+
+    def suggest(self, prefix, k=8):
+        """Sugestões para o texto digitado: buscas já feitas, marcas e títulos, das mais populares."""
+        return self.suggestions.suggest(prefix, k)
+
+    def sweep_watchlist(self, max_results=5):
+        """Refaz ao vivo as buscas com alvos na lista de observação; feito para rodar periodicamente.
+
+        Para quando a fila do agendador enche e devolve quantas buscas foram feitas.
+        """
+        if self.watchlist is None:
+            return 0
+        swept = 0
+        for query in self.watchlist.queries():
+            if self.scheduler is not None:
+                try:
+                    self.scheduler.admit(len(STORE_SPECS))
+                except SchedulerBusy:
+                    logging.info(f"Varredura da lista de observação interrompida: fila cheia")
+                    break
+            self.current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with self.tracer.trace(query):
+                self._search_live(query, max_results)
+            swept += 1
+        return swept
 
-        return full_mock_list
+    def _get_mock_data(self, size=MOCK_SIZE, seed=MOCK_SEED):
+        """Retorna dados simulados para testes: um catálogo sintético determinístico das 12 lojas."""
+        from synthetic import synthetic_catalog
+        logging.info(f"Gerando {size} dados simulados para testes (semente {seed}).")
+        return synthetic_catalog(size, seed, query_date=self.current_date)
 
 # Exemplo de uso (para teste local)
 if __name__ == '__main__':
@@ -967,10 +1340,10 @@ if __name__ == '__main__':
     # results = scraper.search_supplements('creatina', max_results=2)
     # print(f"\nResultados da busca por 'creatina':")
     # for res in results:
-    #     print(f" - {res['title']} ({res['brand']}) - R$ {res['price']:.2f} [{res['store']}]")
+    #     print(f" - {res.title} ({res.brand}) - R$ {res.price:.2f} [{res.store}]")
 
     # Teste com dados simulados
     mock_results = scraper.search_supplements('teste', max_results=3)
     print(f"\nResultados da busca por 'teste' (simulado):")
     for res in mock_results:
-        print(f" - {res['title']} ({res['brand']}) - R$ {res['price']:.2f} [{res['store']}] - Data: {res['query_date']}") 
\ No newline at end of file
+        print(f" - {res.title} ({res.brand}) - R$ {res.price:.2f} [{res.store}] - Data: {res.query_date}") 
\ No newline at end of file
@@ -0,0 +1,121 @@
+import json
+import logging
+
+import requests
+
+from products import Product, ProductBatch
+from scheduler import SchedulerBusy
+
+# Cliente do serviço de busca (service.py). Permite que várias réplicas da
+# interface usem a mesma camada de scraping, já aquecida.
+
+
+class SearchServiceError(Exception):
+    """O serviço de busca respondeu com erro ou não pôde ser alcançado."""
+
+
+class SearchClient:
+    def __init__(self, base_url, timeout=120, session_id=None):
+        """
+        base_url: endereço do serviço, ex.: http://localhost:8000
+        timeout: tempo máximo (s) de espera por uma busca.
+        session_id: identifica a sessão no rodízio do agendador do serviço.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        if session_id:
+            self.session.headers['X-Session-Id'] = session_id
+        self.last_search_id = None
+        self.last_plan = None
+        self.timed_out = []
+
+    def _request(self, method, path, **kwargs):
+        try:
+            kwargs.setdefault('timeout', self.timeout)
+            response = self.session.request(method, self.base_url + path, **kwargs)
+        except requests.RequestException as e:
+            raise SearchServiceError(f"Serviço de busca indisponível: {str(e)}") from e
+        if response.status_code == 503:
+            raise SchedulerBusy(response.json().get('error', 'Serviço de busca ocupado'))
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('error')
+            except ValueError:
+                message = response.text
+            raise SearchServiceError(f"Serviço de busca respondeu {response.status_code}: {message}")
+        return response
+
+    @staticmethod
+    def _params(query, max_results, stores, deadline, min_price=None, max_price=None, target=None, stream=None):
+        params = {'q': query, 'max_results': max_results}
+        if stores:
+            params['stores'] = ','.join(stores)
+        if deadline:
+            params['deadline'] = deadline
+        if min_price is not None:
+            params['min_price'] = min_price
+        if max_price is not None:
+            params['max_price'] = max_price
+        if target:
+            params['target'] = target
+        if stream:
+            params['stream'] = stream
+        return params
+
+    def search(self, query, max_results=5, stores=None, deadline=None, min_price=None, max_price=None, target=None):
+        """Busca no serviço e devolve um ProductBatch, como o scraper local."""
+        data = self._request(
+            'GET', '/search', params=self._params(query, max_results, stores, deadline, min_price, max_price, target)
+        ).json()
+        self.last_search_id = data['search_id']
+        self.last_plan = data.get('plan')
+        self.timed_out = data['timed_out']
+        if data['timed_out']:
+            logging.warning(f"Lojas sem resposta no prazo: {', '.join(data['timed_out'])}")
+        return ProductBatch(Product(**item) for item in data['results'])
+
+    def stream(self, query, max_results=5, stores=None, deadline=None, min_price=None, max_price=None, target=None):
+        """Devolve (loja, produtos) à medida que cada loja termina; produtos None se passou do prazo."""
+        response = self._request(
+            'GET', '/search',
+            params=self._params(query, max_results, stores, deadline, min_price, max_price, target, stream='ndjson'),
+            stream=True
+        )
+        self.timed_out = []
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event['event'] == 'start':
+                    self.last_search_id = event['search_id']
+                    self.last_plan = event.get('plan')
+                elif event['event'] == 'store':
+                    products = event['products']
+                    if products is None:
+                        self.timed_out.append(event['store'])
+                        yield event['store'], None
+                    else:
+                        yield event['store'], [Product(**item) for item in products]
+
+    def suggest(self, prefix, k=8):
+        """Sugestões do serviço para o texto digitado; lista vazia se o serviço não responder."""
+        if not prefix.strip():
+            return []
+        try:
+            return self._request('GET', '/suggest', params={'q': prefix, 'k': k}, timeout=2).json()['suggestions']
+        except SearchServiceError:
+            return []
+
+    def health(self):
+        return self._request('GET', '/health').json()
+
+    def get_trace(self, search_id):
+        """Trace da busca; None se foi atendida por outro worker ou já saiu da memória."""
+        if not search_id:
+            return None
+        try:
+            return self._request('GET', f'/traces/{search_id}').json()
+        except SearchServiceError:
+            return None
@@ -0,0 +1,417 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+
+from proxies import parse_proxies
+from scheduler import SchedulerBusy
+from scraper import STORE_SPECS, SupplementScraper
+
+# Serviço HTTP de busca (ASGI, sem framework) na frente do SupplementScraper,
+# para escalar o scraping separado da interface e atender outros clientes.
+#
+#   GET  /health                 estado do processo, fila e índice
+#   GET  /search?q=whey          busca (também aceita POST com corpo JSON)
+#   GET  /traces/<search_id>     trace de uma busca feita por este worker
+#   GET  /suggest?q=wh&k=8       sugestões enquanto o usuário digita
+#
+# Parâmetros da busca: q (ou query), stores (lista ou separadas por vírgula),
+# max_results, deadline (segundos), target, min_price, max_price e stream
+# ('ndjson' ou 'sse'; também pelo cabeçalho Accept). Com stream, cada loja é
+# enviada assim que termina.
+#
+# Para rodar com vários workers (cada um com seu agendador e seus caches locais):
+#   python service.py --workers 4 --port 8000
+#
+# Com SCRAPER_KEEPALIVE_INTERVAL (segundos), o serviço abre conexões com
+# todas as lojas na partida e as mantém vivas com uma requisição leve nesse
+# intervalo. Desativado por padrão: mesmo ocioso, o serviço mandaria
+# requisições às lojas.
+#
+# Com SCRAPER_WATCHLIST_PATH e SERVICE_SWEEP_INTERVAL (segundos), o worker
+# refaz periodicamente as buscas da lista de observação de preços; com vários
+# workers, ligue a varredura em apenas um deles.
+#
+# SCRAPER_PROXIES (URLs separadas por vírgula) faz as requisições às lojas
+# saírem pelos proxies, com a nota de cada um por loja em /health.
+#
+# SCRAPER_RECORD_PATH grava todas as respostas das lojas num arquivo;
+# SCRAPER_REPLAY_PATH serve as respostas de uma gravação em vez de acessar as
+# lojas (SCRAPER_REPLAY_LATENCY 'original' ou 'zero'). Ver recording.py.
+#
+# SCRAPER_BOUNDED_MEMORY=1 interrompe a leitura de páginas acima do limite de
+# cada loja; SCRAPER_MEMORY_REPORT=1 registra no log o pico de memória de cada
+# busca e de cada loja (ver memory.py).
+#
+# SCRAPER_CACHE_URL (sqlite:///caminho num volume compartilhado ou
+# redis://host:porta/db) guarda os resultados de cada loja num cache comum a
+# todos os workers e réplicas, válido por SCRAPER_CACHE_TTL segundos (padrão
+# 600); o aproveitamento aparece em /health.
+#
+# SCRAPER_PARSE_MEMO=0 desliga a memória de extrações (páginas idênticas não
+# são extraídas de novo; ver parse_memo.py).
+
+MAX_RESULTS_LIMIT = 100
+MAX_SUGGESTIONS = 20
+MAX_DEADLINE = float(os.environ.get('SERVICE_MAX_DEADLINE', 120))
+STREAM_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+_scraper = None
+_scraper_lock = threading.Lock()
+_started_at = time.time()
+SWEEP_INTERVAL = float(os.environ.get('SERVICE_SWEEP_INTERVAL', 0))
+
+
+def get_scraper():
+    """Scraper do worker, configurado pelas mesmas variáveis de ambiente do app."""
+    global _scraper
+    with _scraper_lock:
+        if _scraper is None:
+            _scraper = SupplementScraper(
+                parse_mode=os.environ.get('SCRAPER_PARSE_MODE', 'inline'),
+                index_path=os.environ.get('SCRAPER_INDEX_PATH'),
+                trace_path=os.environ.get('SCRAPER_TRACE_PATH'),
+                analytics_path=os.environ.get('SCRAPER_ANALYTICS_PATH'),
+                watchlist_path=os.environ.get('SCRAPER_WATCHLIST_PATH'),
+                keepalive_interval=float(os.environ.get('SCRAPER_KEEPALIVE_INTERVAL') or 0) or None,
+                proxies=parse_proxies(os.environ.get('SCRAPER_PROXIES')),
+                record_path=os.environ.get('SCRAPER_RECORD_PATH'),
+                replay_path=os.environ.get('SCRAPER_REPLAY_PATH'),
+                replay_latency=os.environ.get('SCRAPER_REPLAY_LATENCY', 'original'),
+                bounded_memory=os.environ.get('SCRAPER_BOUNDED_MEMORY') == '1',
+                memory_report=os.environ.get('SCRAPER_MEMORY_REPORT') == '1',
+                cache_url=os.environ.get('SCRAPER_CACHE_URL'),
+                cache_ttl=float(os.environ.get('SCRAPER_CACHE_TTL') or 0) or None,
+                parse_memo=os.environ.get('SCRAPER_PARSE_MEMO') != '0'
+            )
+            logging.info(f"Serviço de busca pronto (pid {os.getpid()})")
+        return _scraper
+
+
+def parse_search_params(params):
+    """Valida os parâmetros da busca; erros viram ValueError (resposta 400)."""
+    query = str(params.get('q') or params.get('query') or '').strip()
+    if not query:
+        raise ValueError("Parâmetro 'q' é obrigatório")
+
+    stores = params.get('stores') or None
+    if isinstance(stores, str):
+        stores = [store.strip() for store in stores.split(',') if store.strip()]
+    if stores is not None:
+        unknown = [store for store in stores if store not in STORE_SPECS]
+        if unknown:
+            raise ValueError(f"Lojas desconhecidas: {', '.join(unknown)}")
+
+    try:
+        max_results = int(params.get('max_results', 5))
+    except (TypeError, ValueError):
+        raise ValueError("'max_results' deve ser um inteiro")
+    if not 1 <= max_results <= MAX_RESULTS_LIMIT:
+        raise ValueError(f"'max_results' deve estar entre 1 e {MAX_RESULTS_LIMIT}")
+
+    deadline = params.get('deadline')
+    if deadline not in (None, ''):
+        try:
+            deadline = float(deadline)
+        except (TypeError, ValueError):
+            raise ValueError("'deadline' deve ser um número de segundos")
+        if deadline <= 0:
+            raise ValueError("'deadline' deve ser positivo")
+        deadline = min(deadline, MAX_DEADLINE)
+    else:
+        deadline = None
+
+    target = params.get('target')
+    if target not in (None, ''):
+        try:
+            target = int(target)
+        except (TypeError, ValueError):
+            raise ValueError("'target' deve ser um inteiro")
+        if target < 1:
+            raise ValueError("'target' deve ser positivo")
+    else:
+        target = None
+
+    prices = {}
+    for name in ('min_price', 'max_price'):
+        value = params.get(name)
+        if value in (None, ''):
+            prices[name] = None
+            continue
+        try:
+            prices[name] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}' deve ser um número")
+        if prices[name] < 0:
+            raise ValueError(f"'{name}' não pode ser negativo")
+    if prices['min_price'] is not None and prices['max_price'] is not None and prices['min_price'] > prices['max_price']:
+        raise ValueError("'min_price' maior que 'max_price'")
+
+    stream = params.get('stream') or None
+    if stream is not None and stream not in STREAM_TYPES:
+        raise ValueError(f"'stream' deve ser um de: {', '.join(STREAM_TYPES)}")
+
+    return {
+        'query': query, 'stores': stores, 'max_results': max_results, 'deadline': deadline, 'stream': stream,
+        'target': target, **prices,
+    }
+
+
+def _run_search(scraper, search, session_id, emit, cancelled):
+    """Roda a busca numa thread, enviando os eventos para o loop do servidor."""
+    try:
+        with scraper.tracer.trace(search['query']) as trace:
+            searcher = scraper.for_session(session_id)
+            results = searcher.iter_search(
+                search['query'], search['max_results'], search['stores'], search['deadline'],
+                search['min_price'], search['max_price'], search['target']
+            )
+            emit(('start', trace.search_id, searcher.last_plan.to_dict() if searcher.last_plan else None))
+            for store_name, products in results:
+                if cancelled.is_set():
+                    results.close()
+                    break
+                emit(('store', store_name, products))
+        if searcher.memory is not None:
+            searcher.memory.report(trace.search_id)
+    except Exception as e:
+        emit(('error', e))
+    emit(('end',))
+
+
+def _event(name, data, stream):
+    body = json.dumps(dict(data, event=name), ensure_ascii=False)
+    if stream == 'sse':
+        return f"event: {name}\ndata: {body}\n\n".encode('utf-8')
+    return (body + '\n').encode('utf-8')
+
+
+async def _send_json(send, status, data, headers=()):
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json; charset=utf-8'), (b'content-length', str(len(body)).encode())] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def handle_health(scope, receive, send):
+    scraper = get_scraper()
+    await _send_json(send, 200, {
+        'status': 'ok',
+        'pid': os.getpid(),
+        'uptime_s': round(time.time() - _started_at, 1),
+        'stores': list(STORE_SPECS),
+        'scheduler': scraper.scheduler.metrics() if scraper.scheduler else None,
+        'flight': scraper.flight.stats() if scraper.flight else None,
+        'resilience': scraper.resilience.stats() if scraper.resilience else None,
+        'index_size': len(scraper.index) if scraper.index is not None else None,
+        'pools': scraper.transport.pool_stats() if hasattr(scraper.transport, 'pool_stats') else None,
+        'keepalive': scraper.warmer.stats() if scraper.warmer else None,
+        'planner': scraper.planner.stats() if scraper.planner else None,
+        'suggestions': len(scraper.suggestions),
+        'proxies': scraper.proxies.stats() if scraper.proxies else None,
+        'cache': scraper.cache.stats() if scraper.cache else None,
+        'parse_memo': scraper.parse_memo.stats() if scraper.parse_memo else None,
+    })
+
+
+async def handle_suggest(scope, receive, send):
+    params = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+    try:
+        k = min(int(params.get('k', 8)), MAX_SUGGESTIONS)
+    except ValueError:
+        await _send_json(send, 400, {'error': "'k' deve ser um inteiro"})
+        return
+    # Rápido o bastante para responder direto no loop, sem thread
+    await _send_json(send, 200, {'q': params.get('q', ''), 'suggestions': get_scraper().suggest(params.get('q', ''), max(k, 1))})
+
+
+async def handle_trace(scope, receive, send, search_id):
+    trace = get_scraper().tracer.get(search_id)
+    if trace is None:
+        await _send_json(send, 404, {'error': f"Trace {search_id} não encontrado neste worker"})
+        return
+    await _send_json(send, 200, trace)
+
+
+async def handle_search(scope, receive, send, headers):
+    params = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+    if scope['method'] == 'POST':
+        try:
+            params.update(json.loads(await _read_body(receive) or b'{}'))
+        except (ValueError, TypeError):
+            await _send_json(send, 400, {'error': "Corpo JSON inválido"})
+            return
+    try:
+        search = parse_search_params(params)
+    except ValueError as e:
+        await _send_json(send, 400, {'error': str(e)})
+        return
+
+    stream = search['stream']
+    if stream is None:
+        accept = headers.get('accept', '')
+        stream = next((name for name, mime in STREAM_TYPES.items() if mime in accept), None)
+
+    # Rodízio justo por cliente: sessão informada ou o endereço de origem
+    session_id = headers.get('x-session-id') or (scope.get('client') or [uuid.uuid4().hex])[0]
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    threading.Thread(
+        target=_run_search, args=(get_scraper(), search, session_id, emit, cancelled), daemon=True
+    ).start()
+
+    first = await events.get()
+    if first[0] == 'error':
+        error = first[1]
+        if isinstance(error, SchedulerBusy):
+            await _send_json(send, 503, {'error': str(error)}, [(b'retry-after', b'5')])
+        else:
+            logging.error(f"Erro na busca por '{search['query']}': {str(error)}")
+            await _send_json(send, 500, {'error': str(error)})
+        return
+    _, search_id, plan = first
+
+    results, counts, timed_out, error = [], {}, [], None
+    try:
+        if stream:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', STREAM_TYPES[stream].encode() + b'; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-search-id', search_id.encode()),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': _event('start', {'search_id': search_id, 'query': search['query'], 'plan': plan}, stream), 'more_body': True})
+
+        while True:
+            event = await events.get()
+            if event[0] == 'end':
+                break
+            if event[0] == 'error':
+                error = event[1]
+                logging.error(f"Erro na busca por '{search['query']}': {str(error)}")
+                continue
+            _, store_name, products = event
+            if products is None:
+                timed_out.append(store_name)
+                counts[store_name] = None
+            else:
+                counts[store_name] = len(products)
+                results.extend(product.to_dict() for product in products)
+            if stream:
+                await send({'type': 'http.response.body', 'body': _event('store', {
+                    'store': store_name,
+                    'products': [product.to_dict() for product in products] if products is not None else None,
+                    'timed_out': products is None,
+                }, stream), 'more_body': True})
+
+        summary = {
+            'search_id': search_id,
+            'query': search['query'],
+            'stores': counts,
+            'timed_out': timed_out,
+            'partial': bool(timed_out) or error is not None,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'plan': plan,
+        }
+        if error is not None:
+            summary['error'] = str(error)
+        if stream:
+            summary['total'] = len(results)
+            await send({'type': 'http.response.body', 'body': _event('done', summary, stream)})
+        else:
+            summary['results'] = results
+            await _send_json(send, 200, summary, [(b'x-search-id', search_id.encode())])
+    finally:
+        # Cliente desconectou ou a resposta terminou: as lojas restantes são abandonadas
+        cancelled.set()
+
+
+def _sweep_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            swept = get_scraper().for_session('watchlist-sweep').sweep_watchlist()
+            logging.info(f"Varredura da lista de observação: {swept} buscas")
+        except Exception as e:
+            logging.error(f"Erro na varredura da lista de observação: {str(e)}")
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Cria o scraper (e o pool de parsing, se houver) antes do primeiro pedido
+            scraper = await asyncio.get_running_loop().run_in_executor(None, get_scraper)
+            if SWEEP_INTERVAL > 0 and scraper.watchlist is not None:
+                threading.Thread(target=_sweep_loop, args=(SWEEP_INTERVAL,), name='watchlist-sweep', daemon=True).start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path'].rstrip('/') or '/'
+    method = scope['method']
+    headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope.get('headers', [])}
+
+    if path == '/health' and method == 'GET':
+        await handle_health(scope, receive, send)
+    elif path == '/search' and method in ('GET', 'POST'):
+        await handle_search(scope, receive, send, headers)
+    elif path.startswith('/traces/') and method == 'GET':
+        await handle_trace(scope, receive, send, path[len('/traces/'):])
+    elif path == '/suggest' and method == 'GET':
+        await handle_suggest(scope, receive, send)
+    elif path in ('/health', '/search', '/suggest') or path.startswith('/traces/'):
+        await _send_json(send, 405, {'error': f"Método {method} não permitido"})
+    else:
+        await _send_json(send, 404, {'error': f"Rota {path} não encontrada"})
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Serviço HTTP de busca de suplementos')
+    parser.add_argument('--host', default=os.environ.get('SERVICE_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SERVICE_PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVICE_WORKERS', 1)))
+    args = parser.parse_args()
+    uvicorn.run('service:app', host=args.host, port=args.port, workers=args.workers)
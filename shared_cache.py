@@ -0,0 +1,470 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import socketserver
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import unquote, urlsplit
+
+from products import FIELDS, Product
+
+# Cache compartilhado entre as réplicas do app e do serviço. Guarda os
+# produtos de cada (busca canônica, loja, max_results, faixa de preço), que é
+# a unidade que o scraper busca e coalesce; uma busca inteira é a junção das
+# entradas das suas lojas, então lojas já buscadas por qualquer réplica são
+# reaproveitadas mesmo quando a seleção de lojas muda. Dois backends com a
+# mesma interface: SQLite (um arquivo num volume compartilhado) e Redis (o
+# protocolo, com um cliente mínimo embutido; LocalRedisServer é um servidor
+# compatível em processo, para desenvolvimento e testes).
+#
+# Cada entrada vale 'ttl' segundos (com uma variação de até 10% para que as
+# entradas criadas juntas não expirem juntas) e continua disponível por mais
+# 'grace' segundos já vencida. Vencida, uma única réplica ganha a concessão
+# (lease) e refaz a busca enquanto as outras recebem o valor antigo; sem
+# nenhum valor, quem não ganhou a concessão espera o resultado de quem ganhou.
+# Assim a expiração de uma busca popular não dispara uma busca por réplica.
+#
+#   SCRAPER_CACHE_URL=sqlite:////mnt/compartilhado/cache.db
+#   SCRAPER_CACHE_URL=redis://cache:6379/0
+
+CACHE_TTL = 600.0       # validade das entradas (s)
+CACHE_GRACE = 600.0     # por quanto tempo uma entrada vencida ainda é servida
+EMPTY_TTL = 60.0        # validade de um resultado vazio
+LEASE_TTL = 60.0        # duração máxima da concessão de recálculo
+POLL_INTERVAL = 0.05    # espera entre consultas de quem aguarda outra réplica
+TTL_JITTER = 0.1
+KEY_PREFIX = 'suplementos:'
+
+
+class CacheError(Exception):
+    """Falha no backend do cache compartilhado."""
+
+
+def cache_key(*parts):
+    """Chave curta e estável para as partes (a primeira fica legível)."""
+    digest = hashlib.sha1(repr(parts[1:]).encode('utf-8')).hexdigest()
+    return f"{parts[0]}:{digest}"
+
+
+def encode_products(products):
+    return zlib.compress(json.dumps([[getattr(p, field) for field in FIELDS] for p in products], ensure_ascii=False).encode('utf-8'))
+
+
+def decode_products(data):
+    return [Product(*row) for row in json.loads(zlib.decompress(data))]
+
+
+class SQLiteCacheBackend:
+    """Cache num arquivo SQLite, que pode ficar num volume compartilhado pelas réplicas."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires_at REAL NOT NULL,
+        stale_until REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS entries_stale ON entries(stale_until);
+    CREATE TABLE IF NOT EXISTS leases (
+        key TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        until REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path='data/cache.db'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # Sem WAL: o WAL depende de memória compartilhada entre processos do
+        # mesmo host e não funciona em volumes de rede
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.executescript(self.SCHEMA)
+        self._writes = 0
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM entries WHERE key = ? AND stale_until > ?', (key, time.time())
+            ).fetchone()
+        return row
+
+    def set(self, key, value, expires_at, stale_until):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)',
+                (key, value, expires_at, stale_until)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._conn.execute('DELETE FROM entries WHERE stale_until <= ?', (time.time(),))
+
+    def acquire(self, key, owner, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('DELETE FROM leases WHERE key = ? AND until <= ?', (key, now))
+                acquired = self._conn.execute(
+                    'INSERT OR IGNORE INTO leases (key, owner, until) VALUES (?, ?, ?)', (key, owner, now + ttl)
+                ).rowcount == 1
+                self._conn.execute('COMMIT')
+            except sqlite3.Error:
+                self._conn.execute('ROLLBACK')
+                raise
+        return acquired
+
+    def release(self, key, owner):
+        with self._lock:
+            self._conn.execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, owner))
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _RedisConnection:
+    """Conexão com o protocolo do Redis (RESP2), só com o que o cache usa."""
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.file = self.sock.makefile('rb')
+
+    def command(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self.sock.sendall(b''.join(parts))
+        return self._reply()
+
+    def _reply(self):
+        line = self.file.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Conexão com o Redis fechada")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise CacheError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            return None if size < 0 else self.file.read(size + 2)[:-2]
+        if kind == b'*':
+            size = int(rest)
+            return None if size < 0 else [self._reply() for _ in range(size)]
+        raise CacheError(f"Resposta inesperada do Redis: {line[:40]!r}")
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class RedisCacheBackend:
+    """Cache num servidor Redis (ou compatível), compartilhado pelas réplicas."""
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=2.0, prefix=KEY_PREFIX):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._idle = []
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        parts = urlsplit(url)
+        return cls(
+            host=parts.hostname or 'localhost',
+            port=parts.port or 6379,
+            db=int(parts.path.strip('/') or 0),
+            password=unquote(parts.password) if parts.password else None,
+            **kwargs
+        )
+
+    def _command(self, *args):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = _RedisConnection(self.host, self.port, self.timeout)
+                if self.password:
+                    connection.command('AUTH', self.password)
+                if self.db:
+                    connection.command('SELECT', self.db)
+            reply = connection.command(*args)
+        except CacheError:
+            # Erro do comando: a conexão continua boa
+            with self._lock:
+                self._idle.append(connection)
+            raise
+        except (OSError, ConnectionError) as e:
+            if connection is not None:
+                connection.close()
+            raise CacheError(f"Redis {self.host}:{self.port}: {str(e)}") from e
+        with self._lock:
+            self._idle.append(connection)
+        return reply
+
+    def get(self, key):
+        data = self._command('GET', self.prefix + key)
+        if data is None:
+            return None
+        # A validade vai junto do valor; o Redis apaga a entrada no fim da carência
+        expires_at, = struct.unpack_from('!d', data)
+        return data[8:], expires_at
+
+    def set(self, key, value, expires_at, stale_until):
+        ttl_ms = max(1, int((stale_until - time.time()) * 1000))
+        self._command('SET', self.prefix + key, struct.pack('!d', expires_at) + value, 'PX', ttl_ms)
+
+    def acquire(self, key, owner, ttl):
+        return self._command('SET', self.prefix + 'lease:' + key, owner, 'NX', 'PX', int(ttl * 1000)) == 'OK'
+
+    def release(self, key, owner):
+        # GET + DEL não é atômico; na pior das hipóteses outra réplica refaz a mesma busca
+        lease = self.prefix + 'lease:' + key
+        if self._command('GET', lease) == owner.encode('utf-8'):
+            self._command('DEL', lease)
+
+    def delete(self, key):
+        self._command('DEL', self.prefix + key)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class SharedCache:
+    def __init__(self, backend, ttl=CACHE_TTL, grace=CACHE_GRACE, lease_ttl=LEASE_TTL,
+                 encode=encode_products, decode=decode_products):
+        self.backend = backend
+        self.encode = encode
+        self.decode = decode
+        self.ttl = ttl
+        self.grace = grace
+        self.lease_ttl = lease_ttl
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale': 0, 'waited': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def fetch(self, parts, compute, wait=None):
+        """Valor das partes da chave no cache ou calculado por compute(), sem recálculos simultâneos entre réplicas.
+
+        Valores vazios ficam só EMPTY_TTL segundos e sem carência (podem ser
+        uma falha passageira da loja). Com o backend fora do ar, calcula direto.
+        """
+        key = cache_key(*parts)
+        try:
+            entry = self.backend.get(key)
+        except (CacheError, sqlite3.Error) as e:
+            return self._fallback(key, compute, e)
+
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._count('hits')
+                return self.decode(value)
+            if not self._acquire(key):
+                # Outra réplica já está refazendo a busca: serve o valor vencido
+                self._count('stale')
+                return self.decode(value)
+            self._count('refreshes')
+            return self._compute(key, compute)
+
+        deadline = time.monotonic() + (wait or self.lease_ttl)
+        while True:
+            if self._acquire(key):
+                self._count('misses')
+                return self._compute(key, compute)
+            time.sleep(POLL_INTERVAL)
+            try:
+                entry = self.backend.get(key)
+            except (CacheError, sqlite3.Error) as e:
+                return self._fallback(key, compute, e)
+            if entry is not None:
+                self._count('waited')
+                return self.decode(entry[0])
+            if time.monotonic() >= deadline:
+                # Quem tem a concessão não respondeu a tempo (ou não achou nada)
+                self._count('misses')
+                return compute()
+
+    def _acquire(self, key):
+        try:
+            return self.backend.acquire(key, self.owner, self.lease_ttl)
+        except (CacheError, sqlite3.Error) as e:
+            logging.warning(f"Cache compartilhado indisponível: {str(e)}")
+            return True
+
+    def _compute(self, key, compute):
+        try:
+            value = compute()
+            ttl = self.ttl if value else min(self.ttl, EMPTY_TTL)
+            expires_at = time.time() + ttl * (1 - random.uniform(0, TTL_JITTER))
+            try:
+                self.backend.set(key, self.encode(value), expires_at, expires_at + (self.grace if value else 0))
+            except (CacheError, sqlite3.Error) as e:
+                self._count('errors')
+                logging.warning(f"Erro ao gravar no cache compartilhado: {str(e)}")
+            return value
+        finally:
+            try:
+                self.backend.release(key, self.owner)
+            except (CacheError, sqlite3.Error):
+                pass
+
+    def _fallback(self, key, compute, error):
+        self._count('errors')
+        logging.warning(f"Cache compartilhado indisponível ({key}): {str(error)}")
+        return compute()
+
+    def invalidate(self, *parts):
+        self.backend.delete(cache_key(*parts))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        served = stats['hits'] + stats['stale'] + stats['waited']
+        total = served + stats['misses'] + stats['refreshes']
+        stats['hit_rate'] = round(served / total, 3) if total else None
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+
+def create_cache_backend(url):
+    """Backend pela URL: redis://host:porta/db ou sqlite:///caminho (ou só o caminho do arquivo)."""
+    if url.startswith('redis://'):
+        return RedisCacheBackend.from_url(url)
+    if url.startswith('sqlite://'):
+        url = url[len('sqlite://'):]
+        # sqlite:///relativo.db e sqlite:////absoluto.db, como no SQLAlchemy
+        return SQLiteCacheBackend(url[1:] if url.startswith('/') else url or 'data/cache.db')
+    if '://' in url:
+        raise ValueError(f"Cache compartilhado desconhecido: {url}")
+    return SQLiteCacheBackend(url)
+
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_shared_cache(url, ttl=CACHE_TTL):
+    """Devolve o cache compartilhado da URL (um por processo)."""
+    with _shared_caches_lock:
+        cache = _shared_caches.get(url)
+        if cache is None:
+            cache = _shared_caches[url] = SharedCache(create_cache_backend(url), ttl=ttl)
+            logging.info(f"Cache compartilhado: {type(cache.backend).__name__} ({url}), validade {ttl:.0f}s")
+        return cache
+
+
+class LocalRedisServer:
+    """Servidor em processo que fala o protocolo do Redis (GET, SET com NX/PX/EX, DEL, PING...).
+
+    Serve para rodar o backend Redis sem um Redis de verdade, em
+    desenvolvimento e testes: LocalRedisServer().start().url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._data = {}   # chave -> (valor, expira em time.monotonic() ou None)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        args = server._read_command(self.rfile)
+                    except (ConnectionError, ValueError):
+                        return
+                    if args is None:
+                        return
+                    self.wfile.write(server._execute(args))
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.url = f"redis://{host}:{self._server.server_address[1]}/0"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='local-redis', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def _read_command(rfile):
+        line = rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(rfile.readline()[1:])
+            args.append(rfile.read(size + 2)[:-2])
+        return args
+
+    def _alive(self, key, now):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def _execute(self, args):
+        name = args[0].upper()
+        now = time.monotonic()
+        with self._lock:
+            if name == b'PING':
+                return b'+PONG\r\n'
+            if name in (b'SELECT', b'AUTH'):
+                return b'+OK\r\n'
+            if name == b'GET':
+                entry = self._alive(args[1], now)
+                return b'$-1\r\n' if entry is None else b'$%d\r\n%s\r\n' % (len(entry[0]), entry[0])
+            if name == b'SET':
+                key, value, options = args[1], args[2], [arg.upper() for arg in args[3:]]
+                expires = None
+                if b'PX' in options:
+                    expires = now + int(options[options.index(b'PX') + 1]) / 1000
+                elif b'EX' in options:
+                    expires = now + int(options[options.index(b'EX') + 1])
+                if b'NX' in options and self._alive(key, now) is not None:
+                    return b'$-1\r\n'
+                self._data[key] = (value, expires)
+                return b'+OK\r\n'
+            if name == b'DEL':
+                removed = sum(1 for key in args[1:] if self._alive(key, now) is not None and self._data.pop(key))
+                return b':%d\r\n' % removed
+            if name == b'DBSIZE':
+                return b':%d\r\n' % sum(1 for key in list(self._data) if self._alive(key, now) is not None)
+            if name == b'FLUSHDB':
+                self._data.clear()
+                return b'+OK\r\n'
+        return b'-ERR comando nao suportado\r\n'
@@ -0,0 +1,83 @@
+import logging
+import threading
+
+# Coalescência de buscas idênticas e simultâneas ("single-flight"). A primeira
+# chamada para uma chave vira a líder e faz a busca; as que chegam enquanto
+# ela está em andamento esperam e recebem o mesmo resultado.
+
+
+class SingleFlightTimeout(Exception):
+    """A busca líder não terminou dentro do tempo de espera do seguidor."""
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, timeout=None, retries=1):
+        """Executa fn(*args) uma única vez por chave entre chamadas concorrentes.
+
+        Se a líder falhar, o erro não é repassado de imediato: os seguidores
+        disputam de novo a chave e um deles refaz a busca (até 'retries' vezes).
+        Um seguidor que esperar mais que 'timeout' recebe SingleFlightTimeout.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                else:
+                    call.followers += 1
+                    self.shared += 1
+
+            if leader:
+                return self._lead(key, call, fn, args)
+
+            if not call.event.wait(timeout):
+                raise SingleFlightTimeout(f"Tempo esgotado aguardando a busca em andamento para {key}")
+            if call.error is None:
+                return call.result
+            if retries <= 0:
+                raise call.error
+            retries -= 1
+            logging.warning(f"Busca líder para {key} falhou ({call.error}); tentando novamente")
+
+    def _lead(self, key, call, fn, args):
+        try:
+            call.result = fn(*args)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            if call.followers:
+                logging.info(f"Resultado de {key} compartilhado com {call.followers} buscas simultâneas")
+            call.event.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        return {'leaders': self.leaders, 'shared': self.shared, 'in_flight': self.in_flight()}
+
+
+# Instância única do processo, compartilhada por todas as sessões do Streamlit
+shared_flight = SingleFlight()
@@ -0,0 +1,193 @@
+import json
+import re
+
+# Extração de produtos a partir de dados estruturados (JSON-LD, blobs de
+# estado como __NEXT_DATA__ e a API de catálogo do VTEX). Os blocos JSON são
+# localizados por expressão regular nos bytes da página, sem montar o DOM.
+# As funções devolvem dicionários crus com title/price/image_url/link/brand;
+# quem normaliza para o formato de produto do scraper é o scraper.py.
+
+JSON_LD_RE = re.compile(
+    rb'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+NEXT_DATA_RE = re.compile(
+    rb'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+TITLE_KEYS = ('name', 'productName', 'title')
+PRICE_KEYS = ('price', 'Price', 'bestPrice', 'salePrice', 'sellingPrice', 'priceValue', 'lowPrice')
+LINK_KEYS = ('url', 'link', 'href')
+IMAGE_KEYS = ('image', 'imageUrl', 'image_url', 'thumbnail', 'images')
+
+MAX_DEPTH = 12
+
+
+def _load_json(raw):
+    try:
+        return json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _first(value):
+    """Devolve o primeiro elemento de listas e o próprio valor nos outros casos."""
+    while isinstance(value, list):
+        if not value:
+            return None
+        value = value[0]
+    return value
+
+
+def _as_text(value, *keys):
+    value = _first(value)
+    if isinstance(value, dict):
+        for key in keys:
+            if value.get(key):
+                return _as_text(value[key], *keys)
+        return None
+    if isinstance(value, (str, int, float)):
+        return str(value).strip() or None
+    return None
+
+
+def _ld_offer_price(offers):
+    offers = _first(offers)
+    if not isinstance(offers, dict):
+        return None
+    for key in ('price', 'lowPrice'):
+        if offers.get(key) not in (None, ''):
+            return offers[key]
+    return _ld_offer_price(offers.get('offers'))
+
+
+def _ld_product(node):
+    title = _as_text(node.get('name'))
+    price = _ld_offer_price(node.get('offers'))
+    link = _as_text(node.get('url')) or _as_text(node.get('offers'), 'url')
+    if not (title and price is not None and link):
+        return None
+    return {
+        'title': title,
+        'price': price,
+        'image_url': _as_text(node.get('image'), 'url', 'contentUrl'),
+        'link': link,
+        'brand': _as_text(node.get('brand'), 'name'),
+    }
+
+
+def _ld_nodes(data, depth=0):
+    """Percorre o JSON-LD (inclusive @graph e ItemList) devolvendo os nós."""
+    if depth > MAX_DEPTH:
+        return
+    if isinstance(data, list):
+        for entry in data:
+            yield from _ld_nodes(entry, depth + 1)
+    elif isinstance(data, dict):
+        yield data
+        for key in ('@graph', 'itemListElement', 'item', 'mainEntity'):
+            if key in data:
+                yield from _ld_nodes(data[key], depth + 1)
+
+
+def _is_type(node, name):
+    node_type = node.get('@type')
+    if isinstance(node_type, list):
+        return name in node_type
+    return node_type == name
+
+
+def products_from_json_ld(content):
+    products = []
+    for raw in JSON_LD_RE.findall(content):
+        data = _load_json(raw)
+        if data is None:
+            continue
+        for node in _ld_nodes(data):
+            if _is_type(node, 'Product'):
+                product = _ld_product(node)
+                if product:
+                    products.append(product)
+    return products
+
+
+def _state_product(node):
+    title = next((node[k] for k in TITLE_KEYS if isinstance(node.get(k), str)), None)
+    price = next((node[k] for k in PRICE_KEYS if isinstance(node.get(k), (int, float, str)) and node.get(k) != ''), None)
+    link = next((node[k] for k in LINK_KEYS if isinstance(node.get(k), str) and node.get(k)), None)
+    if link is None and isinstance(node.get('linkText'), str) and node['linkText'].strip('/'):
+        # linkText do VTEX é só o identificador: a página do produto é /<linkText>/p (como na API)
+        link = '/' + node['linkText'].strip('/') + '/p'
+    if not (title and price is not None and link):
+        return None
+    image = next((node[k] for k in IMAGE_KEYS if node.get(k)), None)
+    return {
+        'title': title.strip(),
+        'price': price,
+        'image_url': _as_text(image, 'url', 'imageUrl', 'src'),
+        'link': link,
+        'brand': _as_text(node.get('brand'), 'name'),
+    }
+
+
+def _walk_state(data, products, depth=0):
+    if depth > MAX_DEPTH:
+        return
+    if isinstance(data, list):
+        for entry in data:
+            _walk_state(entry, products, depth + 1)
+    elif isinstance(data, dict):
+        product = _state_product(data)
+        if product:
+            products.append(product)
+            return
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                _walk_state(value, products, depth + 1)
+
+
+def products_from_next_data(content):
+    match = NEXT_DATA_RE.search(content)
+    if not match:
+        return []
+    data = _load_json(match.group(1))
+    products = []
+    if data is not None:
+        _walk_state(data.get('props', data), products)
+    return products
+
+
+def products_from_vtex(content):
+    """Converte a resposta de /api/catalog_system/pub/products/search."""
+    data = _load_json(content)
+    if not isinstance(data, list):
+        return []
+    products = []
+    for entry in data:
+        try:
+            item = entry['items'][0]
+            offer = item['sellers'][0]['commertialOffer']
+            if not offer.get('AvailableQuantity', 1):
+                continue
+            products.append({
+                'title': entry['productName'],
+                'price': offer['Price'],
+                'image_url': (item.get('images') or [{}])[0].get('imageUrl'),
+                'link': entry.get('link') or '/' + entry['linkText'] + '/p',
+                'brand': entry.get('brand'),
+            })
+        except (KeyError, IndexError, TypeError):
+            continue
+    return products
+
+
+# Estratégias embutidas no HTML, na ordem em que são tentadas
+EMBEDDED_EXTRACTORS = {
+    'json_ld': products_from_json_ld,
+    'next_data': products_from_next_data,
+}
+
+API_EXTRACTORS = {
+    'vtex': products_from_vtex,
+}
@@ -0,0 +1,206 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from products import UNKNOWN_BRAND
+from queries import canonicalize, normalize_text
+
+# Sugestões a partir do começo do texto digitado. Um índice de prefixos em arrays
+# ordenados: cada sugestão (busca já feita, marca ou começo de título de
+# produto) entra com o texto completo e a partir de cada palavra, então
+# "prot" encontra "whey protein". O prefixo digitado vira um intervalo do
+# array (bisect) e as k sugestões mais populares do intervalo ficam em cache
+# até alguma entrada sob aquele prefixo mudar. Prefixos de uma ou duas letras
+# cobrem intervalos enormes: para eles as k melhores são mantidas sempre
+# prontas, atualizadas a cada entrada que muda. As buscas que já trouxeram
+# resultados vêm primeiro, para levar o usuário às buscas canônicas que o
+# índice local e o cache já respondem.
+
+WEIGHTS = {'query': 3.0, 'brand': 2.0, 'title': 1.0}
+TITLE_WORDS = 4     # palavras do começo do título usadas como sugestão
+MAX_WORDS = 6       # palavras de uma sugestão indexadas como ponto de partida
+MAX_K = 10
+SHORT_PREFIX = 2    # prefixos até esse tamanho têm as MAX_K melhores pré-calculadas
+CACHE_SIZE = 4096
+REBUILD_AT = 256    # acima de tantas chaves novas, reordenar sai mais barato que inserir uma a uma
+
+
+class _Entry:
+    __slots__ = ('text', 'counts', 'score')
+
+    def __init__(self, text):
+        self.text = text
+        self.counts = dict.fromkeys(WEIGHTS, 0)
+        self.score = 0.0
+
+    @property
+    def kind(self):
+        return max(WEIGHTS, key=lambda kind: (self.counts[kind] > 0, WEIGHTS[kind]))
+
+    def to_dict(self):
+        return {'text': self.text, 'kind': self.kind, 'score': round(self.score, 1)}
+
+
+def entry_keys(text):
+    """Chaves de uma sugestão: o texto inteiro e o restante a partir de cada palavra."""
+    words = text.split()
+    return [' '.join(words[i:]) for i in range(min(len(words), MAX_WORDS))]
+
+
+def title_phrase(title):
+    # Normaliza só o começo do título: a pontuação pode partir uma palavra em várias
+    words = normalize_text(' '.join(title.split()[:TITLE_WORDS * 2])).split()
+    return ' '.join(words[:TITLE_WORDS])
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []     # chaves ordenadas
+        self._ids = []      # entrada de cada chave, na mesma ordem
+        self._entries = []
+        self._by_text = {}
+        self._cache = {}    # prefixo -> ids das MAX_K melhores
+        self._short = {}    # prefixo curto -> ids das MAX_K melhores, sempre atualizado
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def add(self, text, kind, count=1):
+        self.add_many([(text, kind, count)])
+
+    def add_many(self, items):
+        """Soma ocorrências de (texto, tipo, quantidade); textos novos entram no índice."""
+        with self._lock:
+            new_keys = []
+            changed = set()
+            for text, kind, count in items:
+                text = normalize_text(text)
+                if not text or not count:
+                    continue
+                entry_id = self._by_text.get(text)
+                if entry_id is None:
+                    entry_id = self._by_text[text] = len(self._entries)
+                    self._entries.append(_Entry(text))
+                    new_keys.extend((key, entry_id) for key in entry_keys(text))
+                entry = self._entries[entry_id]
+                entry.counts[kind] += count
+                entry.score += WEIGHTS[kind] * count
+                changed.add(entry_id)
+                self._invalidate(text)
+
+            if len(new_keys) > REBUILD_AT:
+                pairs = sorted(list(zip(self._keys, self._ids)) + new_keys)
+                self._keys = [key for key, _ in pairs]
+                self._ids = [entry_id for _, entry_id in pairs]
+                self._cache.clear()
+                self._build_short()
+            else:
+                for key, entry_id in new_keys:
+                    position = bisect.bisect_right(self._keys, key)
+                    self._keys.insert(position, key)
+                    self._ids.insert(position, entry_id)
+                for entry_id in changed:
+                    self._update_short(entry_id)
+
+    def _top(self, prefix):
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + '\uffff', start)
+        return heapq.nlargest(MAX_K, set(self._ids[start:end]), key=lambda entry_id: self._rank(entry_id, prefix))
+
+    def _build_short(self):
+        prefixes = {key[:length] for key in self._keys for length in range(1, SHORT_PREFIX + 1)}
+        self._short = {prefix: self._top(prefix) for prefix in prefixes}
+
+    def _update_short(self, entry_id):
+        # As contagens só crescem: a entrada que mudou só pode subir nas listas
+        prefixes = {key[:length] for key in entry_keys(self._entries[entry_id].text) for length in range(1, SHORT_PREFIX + 1)}
+        for prefix in prefixes:
+            top = self._short.setdefault(prefix, [])
+            if entry_id not in top:
+                top.append(entry_id)
+            top.sort(key=lambda other: self._rank(other, prefix), reverse=True)
+            del top[MAX_K:]
+
+    def _invalidate(self, text):
+        if not self._cache:
+            return
+        for key in entry_keys(text):
+            for end in range(SHORT_PREFIX + 1, len(key) + 1):
+                self._cache.pop(key[:end], None)
+
+    def suggest(self, prefix, k=8):
+        """As k sugestões mais populares que começam (em alguma palavra) com o prefixo."""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            top = self._short.get(prefix, []) if len(prefix) <= SHORT_PREFIX else self._cache.get(prefix)
+            if top is None:
+                top = self._top(prefix)
+                if len(self._cache) >= CACHE_SIZE:
+                    self._cache.clear()
+                self._cache[prefix] = top
+            return [self._entries[entry_id].to_dict() for entry_id in top[:k]]
+
+    def _rank(self, entry_id, prefix):
+        # Buscas que já trouxeram resultados primeiro; depois popularidade, e o
+        # texto que começa com o prefixo antes de um que só o contém no meio
+        entry = self._entries[entry_id]
+        return entry.counts['query'] > 0, entry.score, entry.text.startswith(prefix)
+
+    def add_search(self, query, products):
+        """Alimenta o índice com uma busca que trouxe resultados: a busca canônica, marcas e títulos."""
+        brands, titles = {}, {}
+        for product in products:
+            if product.brand and product.brand != UNKNOWN_BRAND:
+                brands[product.brand] = brands.get(product.brand, 0) + 1
+            phrase = title_phrase(product.title)
+            if phrase:
+                titles[phrase] = titles.get(phrase, 0) + 1
+        self.add_many(
+            [(canonicalize(query).text, 'query', 1)]
+            + [(brand, 'brand', count) for brand, count in brands.items()]
+            + [(phrase, 'title', count) for phrase, count in titles.items()]
+        )
+
+    def load_index(self, index):
+        """Carrega as buscas, marcas e títulos já gravados no índice local de produtos."""
+        started = time.perf_counter()
+        queries, brands, titles = index.suggestion_sources()
+        heads = {}
+        for title, count in titles:
+            head = ' '.join(title.split()[:TITLE_WORDS * 2])
+            heads[head] = heads.get(head, 0) + count
+        phrases = {}
+        for head, count in heads.items():
+            phrase = title_phrase(head)
+            if phrase:
+                phrases[phrase] = phrases.get(phrase, 0) + count
+        self.add_many(
+            [(text, 'query', count) for text, count in queries]
+            + [(brand, 'brand', count) for brand, count in brands if brand != UNKNOWN_BRAND]
+            + [(phrase, 'title', count) for phrase, count in phrases.items()]
+        )
+        logging.info(
+            f"Sugestões: {len(self)} entradas carregadas do índice local em {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return self
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_suggestion_index(product_index=None):
+    """Devolve o índice de sugestões do processo, carregado do índice local na primeira chamada."""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = SuggestionIndex()
+            if product_index is not None:
+                _shared_index.load_index(product_index)
+        return _shared_index
@@ -0,0 +1,297 @@
+import argparse
+import bisect
+import logging
+import math
+import random
+import re
+import threading
+import time
+from itertools import accumulate
+
+from products import ProductBatch
+from queries import canonicalize, normalize_text
+from scraper import STORE_SPECS, price_in_range
+
+# Catálogo sintético e determinístico para medir filtros, ordenação,
+# renderização, exportação e indexação em volume de produção sem rede. As
+# ofertas saem de linhas de produto com faixa de preço própria, marcas com
+# popularidade em cauda longa (Zipf), tamanhos e sabores; cada loja vende
+# só as marcas e categorias que vende de verdade (as lojas de marca própria
+# só a própria marca, as farmácias e lojas de cosméticos pouco suplemento
+# esportivo) e aplica sua margem e promoções. O catálogo é gerado em blocos
+# de BLOCK ofertas, cada um com sua semente, então o mesmo (n, seed) dá
+# sempre as mesmas ofertas e o catálogo de n ofertas é prefixo do de n + k.
+#
+#   python synthetic.py --offers 1000000 --seed 7 --out catalogo.parquet
+
+BLOCK = 50_000
+
+# categoria -> (linhas, tamanhos (rótulo, multiplicador de preço), preço base do menor tamanho, usa sabor)
+CATEGORIES = {
+    'whey': (
+        ('Whey Protein Concentrado', 'Whey Protein Isolado', '100% Whey', 'Whey Protein Blend', 'Whey Zero Lactose'),
+        (('450g', 0.55), ('900g', 1.0), ('1,8kg', 1.85), ('2kg', 2.0)),
+        120.0, True,
+    ),
+    'creatina': (
+        ('Creatina Monohidratada', 'Creatina Creapure', 'Creatina Pura'),
+        (('100g', 0.4), ('150g', 0.55), ('300g', 1.0), ('1kg', 2.9)),
+        90.0, False,
+    ),
+    'bcaa': (
+        ('BCAA 2:1:1', 'BCAA 4:1:1', 'BCAA Powder'),
+        (('60 caps', 0.6), ('120 caps', 1.0), ('100g', 0.8), ('250g', 1.7)),
+        60.0, True,
+    ),
+    'pre treino': (
+        ('Pré-Treino', 'Pre Workout', 'Pré-Treino Hardcore'),
+        (('150g', 0.6), ('300g', 1.0), ('600g', 1.8)),
+        110.0, True,
+    ),
+    'glutamina': (
+        ('Glutamina', 'L-Glutamina Pura'),
+        (('150g', 0.55), ('300g', 1.0), ('1kg', 2.8)),
+        75.0, False,
+    ),
+    'hipercalorico': (
+        ('Hipercalórico Mass', 'Mass Gainer', 'Hipercalórico Ganho de Peso'),
+        (('1,5kg', 0.55), ('3kg', 1.0), ('6kg', 1.9)),
+        130.0, True,
+    ),
+    'multivitaminico': (
+        ('Multivitamínico A-Z', 'Polivitamínico', 'Vitamina D3 2000UI', 'Ômega 3 1000mg'),
+        (('30 caps', 0.5), ('60 caps', 1.0), ('120 caps', 1.8)),
+        45.0, False,
+    ),
+    'colageno': (
+        ('Colágeno Hidrolisado', 'Colágeno Verisol', 'Colágeno Tipo II'),
+        (('30 sachês', 0.8), ('120 caps', 1.0), ('300g', 1.3)),
+        85.0, True,
+    ),
+    'barra': (
+        ('Barra de Proteína', 'Protein Bar', 'Pasta de Amendoim'),
+        (('1 un', 0.12), ('12 un', 1.0), ('500g', 0.45), ('1kg', 0.8)),
+        95.0, True,
+    ),
+}
+
+FLAVORS = ('Baunilha', 'Chocolate', 'Morango', 'Cookies and Cream', 'Banana', 'Doce de Leite', 'Sem Sabor', 'Limão')
+
+# marca -> multiplicador de preço (linha premium, intermediária, econômica); a ordem é a da popularidade
+BRANDS = (
+    ('Growth Supplements', 0.85), ('Integralmedica', 1.0), ('Max Titanium', 0.95), ('Optimum Nutrition', 1.6),
+    ('Probiótica', 0.9), ('Dux Nutrition', 1.35), ('Black Skull', 1.0), ('Atlhetica Nutrition', 1.05),
+    ('Essential Nutrition', 1.45), ('Darkness', 1.1), ('Vitafor', 1.2), ('Nutrify', 0.8),
+    ('Sanavita', 1.15), ('Puravida', 1.5), ('New Millen', 0.85), ('Universal Nutrition', 1.4),
+)
+
+# loja -> (marcas que vende ou None para todas, peso de cada categoria, margem, chance de promoção, formato do título)
+STORE_PROFILES = {
+    'Amazon': (None, None, 1.0, 0.20, '{brand} {line} {flavor}{size}'),
+    'Growth Suplementos': (('Growth Supplements',), {'colageno': 0.3}, 0.9, 0.15, '{line} {flavor}({size}) - Growth Supplements'),
+    'Integral Medica': (('Integralmedica',), {'colageno': 0.3}, 1.0, 0.12, '{line} {flavor}{size} - Integralmedica'),
+    'Netshoes': (None, {'colageno': 0.3, 'multivitaminico': 0.5}, 1.05, 0.25, '{line} {flavor}{size} - {brand}'),
+    'Max Titanium': (('Max Titanium',), {'colageno': 0.3}, 0.95, 0.12, '{line} {flavor}{size} Max Titanium'),
+    'Atlhetica Nutrition': (('Atlhetica Nutrition',), None, 1.0, 0.1, '{line} {flavor}{size} - Atlhetica Nutrition'),
+    'Probiótica': (('Probiótica',), None, 0.95, 0.1, '{line} {flavor}{size} - Probiótica'),
+    'Beleza na Web': (None, {'colageno': 4.0, 'multivitaminico': 3.0, 'whey': 0.1, 'creatina': 0.15, 'bcaa': 0.05,
+                             'pre treino': 0.05, 'hipercalorico': 0.02, 'glutamina': 0.1}, 1.15, 0.15, '{brand} {line} {size}'),
+    'Época Cosméticos': (None, {'colageno': 4.0, 'multivitaminico': 3.0, 'whey': 0.1, 'creatina': 0.1, 'bcaa': 0.05,
+                                'pre treino': 0.05, 'hipercalorico': 0.02, 'glutamina': 0.1}, 1.15, 0.2, '{line} {brand} {size}'),
+    'Onofre': (None, {'multivitaminico': 4.0, 'colageno': 2.0, 'pre treino': 0.3, 'hipercalorico': 0.3}, 1.1, 0.1, '{line} {brand} {flavor}{size}'),
+    'Droga Raia': (None, {'multivitaminico': 4.0, 'colageno': 2.0, 'pre treino': 0.3, 'hipercalorico': 0.3}, 1.12, 0.15, '{line} {brand} {flavor}{size}'),
+    'Panvel': (None, {'multivitaminico': 4.0, 'colageno': 2.0, 'pre treino': 0.3, 'hipercalorico': 0.3}, 1.1, 0.12, '{line} {brand} {flavor}{size}'),
+}
+
+# Participação de cada loja no total de ofertas
+STORE_SHARE = {
+    'Amazon': 0.22, 'Netshoes': 0.12, 'Growth Suplementos': 0.05, 'Integral Medica': 0.05, 'Max Titanium': 0.05,
+    'Atlhetica Nutrition': 0.03, 'Probiótica': 0.04, 'Beleza na Web': 0.09, 'Época Cosméticos': 0.08,
+    'Onofre': 0.07, 'Droga Raia': 0.11, 'Panvel': 0.09,
+}
+
+IMAGE_URL = 'https://via.placeholder.com/150?text={text}'
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', normalize_text(text)).strip('-')
+
+
+class _StoreOffers:
+    """Tabelas pré-calculadas de uma loja para sortear ofertas rápido."""
+
+    def __init__(self, store_name):
+        brands, category_weights, margin, promo, title_format = STORE_PROFILES[store_name]
+        self.store_name = store_name
+        self.base_url = STORE_SPECS[store_name]['base_url']
+        self.margin = margin
+        self.promo = promo
+        self.title_format = title_format
+        allowed = [(brand, tier) for brand, tier in BRANDS if brands is None or brand in brands]
+        self.brands = allowed
+        # Zipf sobre a ordem de popularidade das marcas
+        self.brand_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(allowed))))
+        self.categories = list(CATEGORIES)
+        self.category_weights = list(accumulate((category_weights or {}).get(category, 1.0) for category in self.categories))
+
+
+def _pick(options, cum_weights, draw):
+    return options[bisect.bisect(cum_weights, draw * cum_weights[-1])]
+
+
+def _offer_batches(n, seed, query_date):
+    """Gera as ofertas bloco a bloco; cada bloco é um ProductBatch."""
+    offers = {store_name: _StoreOffers(store_name) for store_name in STORE_PROFILES}
+    store_names = list(STORE_SHARE)
+    store_weights = list(accumulate(STORE_SHARE[store_name] for store_name in store_names))
+    titles = {}    # o mesmo produto em várias lojas reaproveita a string do título
+    images = {}
+    slugs = {line: _slug(line) for lines, _, _, _ in CATEGORIES.values() for line in lines}
+
+    for block, start in enumerate(range(0, n, BLOCK)):
+        rng = random.Random(f'{seed}:{block}')
+        size = min(BLOCK, n - start)
+        batch = ProductBatch()
+        for i in range(size):
+            store_name = _pick(store_names, store_weights, rng.random())
+            store = offers[store_name]
+            category = _pick(store.categories, store.category_weights, rng.random())
+            lines, sizes, base_price, flavored = CATEGORIES[category]
+            line = lines[int(rng.random() ** 1.5 * len(lines))]
+            size_label, size_factor = sizes[rng.randrange(len(sizes))]
+            brand, tier = _pick(store.brands, store.brand_weights, rng.random())
+            flavor = FLAVORS[int(rng.random() ** 2 * len(FLAVORS))] if flavored else ''
+
+            key = (store.title_format, brand, line, flavor, size_label)
+            title = titles.get(key)
+            if title is None:
+                title = titles[key] = ' '.join(store.title_format.format(
+                    brand=brand, line=line, flavor=f'{flavor} ' if flavor else '', size=size_label
+                ).split())
+            image_url = images.get(line)
+            if image_url is None:
+                image_url = images[line] = IMAGE_URL.format(text=slugs[line].replace('-', '+'))
+
+            # Preço de referência do produto com ruído da loja; algumas ofertas em promoção
+            price = base_price * size_factor * tier * store.margin * rng.lognormvariate(0, 0.08)
+            if rng.random() < store.promo:
+                price *= 1 - rng.uniform(0.1, 0.35)
+            price = max(math.floor(price) + 0.9, 4.9)
+
+            batch.titles.append(title)
+            batch.prices.append(price)
+            batch.image_urls.append(image_url)
+            batch.links.append(f'{store.base_url}/{slugs[line]}/p?sku={seed}-{start + i}')
+            batch.stores.append(store_name)
+            batch.brands.append(brand)
+            batch.query_dates.append(query_date)
+        yield batch
+        if len(titles) > 1_000_000:
+            titles.clear()
+
+
+def iter_synthetic_catalog(n, seed=0, query_date=''):
+    """Gera o catálogo em blocos de até BLOCK ofertas (ProductBatch), para indexar ou exportar aos poucos."""
+    return _offer_batches(n, seed, query_date)
+
+
+def synthetic_catalog(n, seed=0, stores=None, query_date=''):
+    """Catálogo sintético de n ofertas num único ProductBatch; stores filtra as lojas depois de gerar."""
+    started = time.perf_counter()
+    catalog = ProductBatch()
+    for batch in _offer_batches(n, seed, query_date):
+        if stores is None:
+            _concat(catalog, batch)
+        else:
+            catalog.extend(product for product in batch if product.store in stores)
+    logging.info(f"Catálogo sintético: {len(catalog)} ofertas (seed {seed}) em {time.perf_counter() - started:.2f}s")
+    return catalog
+
+
+def _concat(target, batch):
+    target.titles.extend(batch.titles)
+    target.prices.extend(batch.prices)
+    target.image_urls.extend(batch.image_urls)
+    target.links.extend(batch.links)
+    for column in ('stores', 'brands', 'query_dates'):
+        source, destination = getattr(batch, column), getattr(target, column)
+        # Traduz os códigos do bloco para os do catálogo, sem passar pelas strings
+        remap = []
+        for value in source.values:
+            code = destination.index.get(value)
+            if code is None:
+                code = destination.index[value] = len(destination.values)
+                destination.values.append(value)
+            remap.append(code)
+        destination.codes.extend(remap[code] for code in source.codes)
+
+
+class SyntheticStore:
+    """Catálogo sintético pesquisável como se fossem as lojas (modo 'synthetic' do scraper)."""
+
+    def __init__(self, n, seed=0, query_date=''):
+        self.catalog = synthetic_catalog(n, seed, query_date=query_date)
+        self._words = {}  # título -> texto normalizado, um por título distinto
+
+    def search(self, query, max_results=5, stores=None, price_range=None):
+        """Até max_results ofertas por loja cujo título tem todos os termos da busca."""
+        terms = canonicalize(query).text.split()
+        catalog = self.catalog
+        wanted = {catalog.stores.index[store_name] for store_name in (stores or STORE_SPECS) if store_name in catalog.stores.index}
+        found = {code: 0 for code in wanted}
+        results = ProductBatch()
+        for i, store_code in enumerate(catalog.stores.codes):
+            if found.get(store_code, max_results) >= max_results:
+                if not wanted:
+                    break
+                continue
+            if not price_in_range(catalog.prices[i], price_range):
+                continue
+            title = catalog.titles[i]
+            text = self._words.get(title)
+            if text is None:
+                text = self._words[title] = normalize_text(title).replace('-', ' ')
+            if all(term in text for term in terms):
+                results.append(catalog[i])
+                found[store_code] += 1
+                if found[store_code] >= max_results:
+                    wanted.discard(store_code)
+        return results
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_synthetic_store(n, seed=0):
+    """Catálogo pesquisável compartilhado pelo processo para cada (n, seed)."""
+    with _stores_lock:
+        store = _stores.get((n, seed))
+        if store is None:
+            store = _stores[(n, seed)] = SyntheticStore(n, seed, query_date=time.strftime('%Y-%m-%d %H:%M:%S'))
+        return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um catálogo sintético de ofertas")
+    parser.add_argument('--offers', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="arquivo .parquet, .csv ou .jsonl (sem ele, só mostra um resumo)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    catalog = synthetic_catalog(args.offers, args.seed)
+    if not args.out:
+        df = catalog.to_pandas()
+        print(df.groupby('store', observed=True)['price'].describe().round(2).to_string())
+    elif args.out.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        pq.write_table(catalog.to_arrow(), args.out)
+    elif args.out.endswith('.csv'):
+        catalog.to_pandas().to_csv(args.out, index=False)
+    else:
+        catalog.to_pandas().to_json(args.out, orient='records', lines=True, force_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+from bs4 import BeautifulSoup
+
+from adaptive_selectors import SelectorLearner, split_selector
+
+ITEM = 'div.product-item, div.item-product, div.product-card'
+TITLE = 'h2.product-name, h3.titulo'
+
+
+def _soup(item_class, title_tag='h2', title_class='product-name', count=2):
+    return BeautifulSoup(''.join(
+        f'<div class="{item_class}"><{title_tag} class="{title_class}">Whey {i}</{title_tag}></div>'
+        for i in range(count)
+    ), 'html.parser')
+
+
+def _parse(learner, soup):
+    """Extração mínima: um produto por item com título."""
+    page = learner.page('Loja')
+    products = []
+    for item in page.select('item', soup, ITEM):
+        title = page.select_one('title', item, TITLE)
+        if title is not None:
+            products.append(title.text)
+            page.confirm(item)
+    return page.finish(products)
+
+
+def test_split_selector_keeps_nested_commas():
+    assert split_selector('div.a, div:is(.b, .c) > span, a[data-x="1,2"]') == (
+        'div.a', 'div:is(.b, .c) > span', 'a[data-x="1,2"]')
+    assert split_selector(('span.a', 'span.b')) == ('span.a', 'span.b')
+    assert split_selector(' , div.a ,') == ('div.a',)
+
+
+def test_learns_the_matching_variant_and_uses_it_alone():
+    learner = SelectorLearner()
+    assert _parse(learner, _soup('product-card')) == ['Whey 0', 'Whey 1']
+    assert learner.learned('Loja') == {'item': 'div.product-card', 'title': 'h2.product-name'}
+
+    _parse(learner, _soup('product-card'))
+    stats = learner.stats()['Loja']
+    assert (stats['item']['hits'], stats['item']['misses']) == (1, 0)
+    assert stats['title']['hits'] == 2
+    assert stats['item']['variants'] == {'div.product-card': 4}
+
+
+def test_falls_back_to_the_full_list_and_relearns():
+    learner = SelectorLearner()
+    _parse(learner, _soup('product-card'))
+    assert _parse(learner, _soup('item-product')) == ['Whey 0', 'Whey 1']
+    assert learner.stats()['Loja']['item']['misses'] == 1
+    for _ in range(2):
+        _parse(learner, _soup('item-product'))
+    assert learner.learned('Loja')['item'] == 'div.item-product'
+
+
+def test_items_without_products_reset_the_store():
+    learner = SelectorLearner()
+    _parse(learner, _soup('product-card'))
+    # Itens ainda casam, mas o título mudou de lugar: nada aprendido sobrevive
+    assert _parse(learner, _soup('product-card', 'span', 'nome')) == []
+    assert learner.learned('Loja') == {}
+    assert _parse(learner, _soup('product-card')) == ['Whey 0', 'Whey 1']
+    assert learner.stats()['Loja']['item']['empty'] == 0
+
+
+def test_sequential_alternatives():
+    learner = SelectorLearner()
+    soup = BeautifulSoup('<span class="b">R$ 10</span>', 'html.parser')
+    page = learner.page('Loja')
+    assert page.select_one('price', soup, ('span.a', 'span.b')).text == 'R$ 10'
+    page.confirm()
+    page.finish(['produto'])
+    assert learner.learned('Loja') == {'price': 'span.b'}
+    learner.forget('Loja')
+    assert learner.stats() == {}
@@ -0,0 +1,71 @@
+import math
+from datetime import datetime
+
+import pytest
+
+from analytics import PriceAnalytics, histogram_median, price_bucket
+from products import Product
+from queries import canonicalize
+
+DAY = datetime(2026, 10, 19, 12).timestamp()
+
+
+def _product(price, link, store='Panvel', brand='Growth'):
+    return Product('Whey 900g', price, '/w.png', link, store, brand, '')
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    analytics = PriceAnalytics(str(tmp_path / 'analytics.db'))
+    yield analytics
+    analytics.close()
+
+
+def test_histogram_median_is_within_half_a_percent():
+    prices = [10.0, 99.9, 100.0, 120.0, 500.0]
+    histogram = {}
+    for price in prices:
+        histogram[price_bucket(price)] = histogram.get(price_bucket(price), 0) + 1
+    assert math.isclose(histogram_median(histogram, len(prices)), 100.0, rel_tol=0.005)
+    assert histogram_median({}, 0) == 0.0
+
+
+def test_rollups_by_product_store_brand_and_day(analytics):
+    products = [_product(p, f'/p/{i}') for i, p in enumerate((100.0, 110.0, 130.0))]
+    products.append(_product(200.0, '/a/1', store='Amazon', brand='Max Titanium'))
+    assert analytics.record('whey', products, seen_at=DAY) == 4
+
+    daily = analytics.product_daily('Whey Protein').set_index('store')
+    panvel = daily.loc['Panvel']
+    assert (panvel['n'], panvel['min_price'], panvel['max_price']) == (3, 100.0, 130.0)
+    assert panvel['median'] == pytest.approx(110.0, rel=0.005)
+    assert panvel['mean'] == pytest.approx(340 / 3)
+    assert panvel['day'] == '2026-10-19'
+    assert analytics.brand_daily(['Max Titanium'])['median'].tolist() == [200.0]
+    assert analytics.store_daily()['n'].sum() == 4
+    assert analytics.known_products() == [canonicalize('whey').key]
+
+
+def test_repeated_search_is_counted_once(analytics):
+    products = [_product(100.0, '/p/1'), _product(120.0, '/p/2')]
+    analytics.record('whey', products, seen_at=DAY)
+    assert analytics.record('whey', products, seen_at=DAY + 60) == 0
+    # Preço novo do mesmo produto é uma observação nova
+    assert analytics.record('whey', [_product(90.0, '/p/1')], seen_at=DAY + 120) == 1
+    assert analytics.product_daily('whey')['n'].tolist() == [3]
+    assert analytics.product_daily('whey')['min_price'].tolist() == [90.0]
+
+
+def test_product_in_two_searches_counts_in_each_but_once_per_store(analytics):
+    product = _product(100.0, '/p/1')
+    analytics.record('whey', [product], seen_at=DAY)
+    assert analytics.record('whey isolado', [product], seen_at=DAY) == 1
+    assert analytics.product_daily('whey isolado')['n'].tolist() == [1]
+    assert analytics.store_daily(['Panvel'])['n'].tolist() == [1]
+
+
+def test_precomputed_key_is_not_canonicalized_again(analytics):
+    key = canonicalize('whey').key
+    analytics.record('qualquer texto', [_product(100.0, '/p/1')], seen_at=DAY, query_key=key)
+    assert analytics.product_daily(query_key=key)['n'].tolist() == [1]
+    assert analytics.known_products() == [key]
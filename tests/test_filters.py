@@ -0,0 +1,81 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import scraper
+from product_index import ProductIndex
+from products import Product
+from scraper import extract_products, make_price_range, price_in_range
+
+PAGE = ('<html><body>' + ''.join(
+    f'<div class="product-card"><h2 class="product-name">Whey {i}</h2><span class="price">R$ {price},00</span>'
+    f'<img class="product-image" src="/w{i}.png"><a class="product-link" href="/p/{i}">ver</a></div>'
+    for i, price in enumerate((50, 150, 90, 200, 120, 100))
+) + '</body></html>').encode('utf-8')
+
+
+def test_price_range():
+    assert make_price_range() is None
+    assert make_price_range(None, '100') == (None, 100.0)
+    with pytest.raises(ValueError):
+        make_price_range(200, 100)
+    assert price_in_range(100, (100, 100))
+    assert not price_in_range(99.9, (100, None))
+    assert price_in_range(5000, None)
+
+
+def test_filtered_items_do_not_count_towards_max_results():
+    products, _, _, dropped = extract_products('Panvel', PAGE, 2, '2026-10-19', (100, 150))
+    assert [p.price for p in products] == [150, 120]
+    assert dropped == 3
+    # Sem filtro, os dois primeiros itens
+    products, _, _, dropped = extract_products('Panvel', PAGE, 2, '2026-10-19')
+    assert [p.price for p in products] == [50, 150]
+    assert dropped == 0
+
+
+def test_index_filters_before_the_per_store_limit(tmp_path):
+    index = ProductIndex(str(tmp_path / 'products.db'))
+    index.add([
+        Product(f'Whey {i}', price, '/w.png', f'https://{store}/{i}', store, 'Growth', '')
+        for i, (store, price) in enumerate([('Panvel', 50), ('Panvel', 150), ('Panvel', 120), ('Amazon', 130)])
+    ])
+    results = index.search('whey', 1, stores=['Panvel'], price_range=(100, None))
+    assert len(results) == 1
+    assert results[0].store == 'Panvel' and results[0].price in (120, 150)
+    assert sorted(p.price for p in index.search('whey', 5, price_range=(None, 130))) == [50, 120, 130]
+    index.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_search_only_asks_the_chosen_stores(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.hits = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        spec = scraper.STORE_SPECS['Panvel']
+        monkeypatch.setitem(spec, 'base_url', base_url)
+        monkeypatch.setitem(spec, 'search_url', base_url + '/busca?q={query}')
+        monkeypatch.delitem(spec, 'delay', raising=False)
+        instance = scraper.SupplementScraper(max_pages=1)
+        results = instance.search_supplements('whey', 3, stores=['Panvel', 'Loja Inexistente'], min_price=100)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(server.hits) == 1
+    assert [p.price for p in results] == [150, 200, 120]
+    assert {p.store for p in results} == {'Panvel'}
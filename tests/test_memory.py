@@ -0,0 +1,96 @@
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from memory import MemoryProfiler
+from resilience import ResiliencePolicy, ResilientCaller
+from transport import ResponseTooLarge, _read_capped
+
+MB = 1024 * 1024
+
+
+def _chunks(total, size=64 * 1024):
+    for start in range(0, total, size):
+        yield bytes(min(size, total - start))
+
+
+@pytest.mark.parametrize('content_length', [None, str(4 * MB), str(MB)])
+def test_read_capped_returns_whole_body(content_length):
+    # Content-Length menor que o corpo: resposta comprimida, o buffer cresce
+    body = _read_capped(_chunks(4 * MB), 'https://loja/busca', 8 * MB, content_length)
+    assert type(body) is bytes
+    assert len(body) == 4 * MB
+
+
+def test_read_capped_stops_at_limit():
+    with pytest.raises(ResponseTooLarge):
+        _read_capped(_chunks(4 * MB), 'https://loja/busca', 2 * MB)
+    with pytest.raises(ResponseTooLarge):
+        _read_capped(iter(()), 'https://loja/busca', 2 * MB, str(3 * MB))
+    assert _read_capped(iter(()), 'https://loja/busca', 2 * MB, '0') == b''
+
+
+def test_oversized_response_is_not_retried():
+    caller = ResilientCaller(policies={'Loja': ResiliencePolicy(retries=3, backoff_base=0)})
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise ResponseTooLarge('corpo passou de 2 MB')
+
+    with pytest.raises(ResponseTooLarge):
+        caller.call('Loja', fetch)
+    assert calls == [1]
+
+
+@pytest.mark.parametrize('content_length', [None, str(8 * MB)])
+def test_read_capped_keeps_a_single_copy(content_length):
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        body = _read_capped(_chunks(8 * MB), 'https://loja/busca', 16 * MB, content_length)
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        if started:
+            tracemalloc.stop()
+    assert len(body) == 8 * MB
+    assert peak < 1.5 * 8 * MB
+
+
+def test_concurrent_measurements_do_not_serialize():
+    profiler = MemoryProfiler()
+
+    def parse(store_name):
+        with profiler.measure(store_name, 1024):
+            data = bytes(MB)
+            time.sleep(0.3)
+            del data
+
+    threads = [threading.Thread(target=parse, args=(store_name,)) for store_name in ('Amazon', 'Panvel', 'Onofre')]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - started < 0.6
+
+    report = profiler.report(None)
+    assert set(report['stores']) == {'Amazon', 'Panvel', 'Onofre'}
+    assert report['body_kb'] == 3.0
+    for store in report['stores'].values():
+        assert store['pages'] == 1
+        assert store['parse_peak_kb'] >= 1000
+    assert report['peak_kb'] >= 1000
+
+
+def test_report_keeps_recent_searches_only():
+    profiler = MemoryProfiler(keep=2)
+    with profiler.measure('Amazon', 10):
+        pass
+    assert profiler.report(None)['stores']['Amazon']['pages'] == 1
+    assert profiler.report('desconhecida') == {'peak_kb': 0.0, 'body_kb': 0.0, 'stores': {}}
@@ -0,0 +1,77 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import scraper
+
+# Loja local com 3 páginas de 10 itens (2 repetidos entre páginas vizinhas);
+# a partir da 4ª a página vem vazia.
+
+PAGES = 3
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        page = int(parse_qs(urlsplit(self.path).query).get('page', ['1'])[0])
+        self.server.hits.append(page)
+        time.sleep(0.2)
+        start = (page - 1) * 8
+        items = range(start, start + 10) if page <= PAGES else ()
+        body = '<html><body>' + ''.join(
+            f'<div class="product-card"><h2 class="product-name">Whey {i}</h2><span class="price">R$ {100 + i},00</span>'
+            f'<img class="product-image" src="/i{i}.png"><a class="product-link" href="/p/{i}">ver</a></div>'
+            for i in items
+        ) + '</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def store(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.hits = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    spec = scraper.STORE_SPECS['Panvel']
+    monkeypatch.setitem(spec, 'base_url', base_url)
+    monkeypatch.setitem(spec, 'search_url', base_url + '/busca?q={query}')
+    monkeypatch.setitem(spec, 'page_size', 8)
+    monkeypatch.delitem(spec, 'delay', raising=False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_pages_are_fetched_together_and_deduplicated(store):
+    instance = scraper.SupplementScraper()
+    started = time.perf_counter()
+    results = instance.search_panvel('whey', 20)
+    elapsed = time.perf_counter() - started
+    assert sorted(store.hits) == [1, 2, 3]
+    # As três páginas saem juntas, não uma depois da outra
+    assert elapsed < 0.5
+    assert len(results) == 20
+    assert len({product.link for product in results}) == 20
+    assert results[0].link.endswith('/p/0')
+
+
+def test_single_page_when_it_is_enough(store):
+    results = scraper.SupplementScraper().search_panvel('whey', 5)
+    assert store.hits == [1]
+    assert len(results) == 5
+
+
+def test_stops_at_the_last_page(store):
+    results = scraper.SupplementScraper(max_pages=5).search_panvel('whey', 100)
+    # 3 páginas com itens; a 4ª e a 5ª vêm vazias
+    assert len(results) == 26
+    assert sorted(store.hits) == [1, 2, 3, 4, 5]
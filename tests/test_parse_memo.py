@@ -0,0 +1,73 @@
+import pytest
+
+import scraper
+from parse_memo import ParseMemo, page_fingerprint, spec_fingerprint
+from products import Product
+
+
+def _page(token, price=129):
+    return (
+        f'<html><head><meta name="csrf-token" content="{token}"><script nonce="{token}">'
+        f'window.x = {{"requestId":"{token}", csrf_token: "{token}"}}</script></head><body>'
+        f'<div class="product-card"><h2 class="product-name">Whey</h2><span class="price">R$ {price},90</span>'
+        f'<img class="product-image" src="/w.png"><a class="product-link" href="/p/1">ver</a></div>'
+        f'</body></html>'
+    ).encode('utf-8')
+
+
+def test_volatile_fields_do_not_change_the_fingerprint():
+    first, second = page_fingerprint(_page('a1b2')), page_fingerprint(_page('z9y8x7'))
+    assert first == second
+    assert page_fingerprint(_page('a1b2', price=99)) != first
+    # Padrões 'volatile' da loja
+    assert page_fingerprint(b'<a href="/p?qid=1">', (rb'qid=\d+',)) == page_fingerprint(b'<a href="/p?qid=2">', (rb'qid=\d+',))
+    assert page_fingerprint(b'<a href="/p?qid=1">') != page_fingerprint(b'<a href="/p?qid=2">')
+
+
+def test_spec_changes_invalidate_entries():
+    spec = {'price_selector': 'span.price', 'title_selector': 'h2'}
+    assert spec_fingerprint(spec) == spec_fingerprint(dict(reversed(list(spec.items()))))
+    assert spec_fingerprint(spec) != spec_fingerprint(dict(spec, price_selector='span.preco'))
+
+
+def test_entries_come_back_with_the_current_date_and_are_evicted():
+    memo = ParseMemo(max_entries=2)
+    spec = {'layout': 'catalogo'}
+    keys = [memo.key('Panvel', spec, _page('t', price), 5, None) for price in (10, 20, 30)]
+    memo.put(keys[0], [Product('Whey', 10.9, '/w.png', '/p/1', 'Panvel', 'Growth', '2026-10-18')], 'html', 1)
+    products, path, dropped = memo.get(keys[0], '2026-10-19')
+    assert (products[0].title, products[0].query_date, path, dropped) == ('Whey', '2026-10-19', 'html', 1)
+
+    memo.put(keys[1], [], 'html', 0)
+    memo.get(keys[0], '2026-10-19')
+    memo.put(keys[2], [], 'html', 0)
+    # A entrada usada há mais tempo sai primeiro
+    assert memo.get(keys[1], '2026-10-19') is None
+    assert memo.get(keys[0], '2026-10-19') is not None
+    assert memo.stats() == {'entries': 2, 'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+    assert memo.key('Panvel', spec, _page('t', 10), 5, (100, None)) != keys[0]
+
+
+def test_identical_pages_are_not_extracted_again(monkeypatch):
+    calls = []
+    extract = scraper.extract_products
+
+    def counting(*args):
+        calls.append(args[0])
+        return extract(*args)
+
+    monkeypatch.setattr(scraper, 'extract_products', counting)
+    instance = scraper.SupplementScraper()
+    instance.parse_memo = ParseMemo()
+    first, _ = instance._parse('Panvel', _page('abc'), 5)
+    second, _ = instance._parse('Panvel', _page('def'), 5)
+    assert calls == ['Panvel']
+    assert [p.to_dict() for p in second] == [p.to_dict() for p in first]
+    assert first[0].price == 129.9
+
+    instance._parse('Panvel', _page('abc', price=99), 5)
+    assert calls == ['Panvel', 'Panvel']
+
+    instance.parse_memo = None
+    instance._parse('Panvel', _page('abc'), 5)
+    assert len(calls) == 3
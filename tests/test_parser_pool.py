@@ -0,0 +1,52 @@
+import pytest
+
+from adaptive_selectors import get_selector_learner
+from parser_pool import ParserPool
+from scraper import extract_products
+
+PAGE = b'<html><body>' + b''.join(
+    b'<div class="product-card"><h2 class="product-name">Creatina %d</h2><span class="price">R$ %d,90</span>'
+    b'<img class="product-image" src="/i%d.png"><a class="product-link" href="/p/%d">ver</a></div>' % (i, 50 + i, i, i)
+    for i in range(6)
+) + b'</body></html>'
+
+STORE = 'Integral Medica'
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = ParserPool(max_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_matches_inline_parsing(pool):
+    inline = extract_products(STORE, PAGE, 4, '2026-10-19', None)
+    pooled = pool.parse(STORE, PAGE, 4, '2026-10-19', None)
+    assert pooled[0] == inline[0]
+    assert pooled[1] == inline[1]
+    assert len(pooled[0]) == 4
+    assert pooled[0][0].title == 'Creatina 0'
+
+
+def test_selector_learning_comes_back_to_the_parent(pool):
+    learner = get_selector_learner()
+    learner.forget(STORE)
+    pool.parse(STORE, PAGE, 6, '2026-10-19', None)
+    stats = learner.stats()[STORE]
+    assert stats['item']['learned'] == 'div.product-card'
+    assert stats['title']['learned'] == 'h2.product-name'
+    assert stats['item']['hits'] == 0
+
+    # A segunda página já vai ao worker com a variante aprendida
+    pool.parse(STORE, PAGE, 6, '2026-10-19', None)
+    stats = learner.stats()[STORE]
+    assert stats['item']['hits'] == 1
+    assert stats['title']['hits'] == 6
+    assert stats['item']['variants'] == {'div.product-card': 12}
+
+
+def test_price_filter_in_worker(pool):
+    products, _, _, dropped = pool.parse(STORE, PAGE, 6, '2026-10-19', (52, 54))
+    assert [product.price for product in products] == [52.9, 53.9]
+    assert dropped == 4
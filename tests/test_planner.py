@@ -0,0 +1,93 @@
+import pytest
+
+import scraper
+from planner import StorePlanner, query_category
+from products import Product
+
+STORES = ['Rapida', 'Lenta', 'Vazia', 'Nova']
+
+
+def _trained(**kwargs):
+    planner = StorePlanner(seed=0, **kwargs)
+    for _ in range(3):
+        planner.record('whey', 'Rapida', 5, 5, 0.5)
+        planner.record('whey', 'Lenta', 5, 5, 8.0)
+        planner.record('whey', 'Vazia', 0, 5, 0.5)
+    return planner
+
+
+def test_query_category():
+    assert query_category('Whey Protein Isolado') == 'whey'
+    assert query_category('creatina monohidratada') == 'creatina'
+    assert query_category('colágeno hidrolisado') == 'geral'
+
+
+def test_general_queries_are_not_planned_or_recorded():
+    planner = StorePlanner(seed=0)
+    for _ in range(5):
+        planner.record('geral', 'Vazia', 0, 5, 1.0)
+    plan = planner.plan('colágeno', STORES, 5)
+    assert plan.stores == STORES
+    assert plan.skipped == {}
+    assert planner.stats() == {}
+
+
+def test_unproductive_and_slow_stores_are_skipped():
+    planner = _trained(exploration=0)
+    plan = planner.plan('whey', STORES, 5, deadline=5)
+    # Loja sem histórico sempre entra; as conhecidas vêm por rendimento por segundo
+    assert plan.stores == ['Nova', 'Rapida']
+    assert set(plan.skipped) == {'Lenta', 'Vazia'}
+    assert 'acima do prazo' in plan.skipped['Lenta']
+    assert plan.to_dict()['estimates']['Rapida']['fill'] == 1.0
+
+
+def test_target_and_required_stores():
+    planner = _trained(exploration=0)
+    plan = planner.plan('whey', ['Rapida', 'Lenta'], 5, target=5)
+    assert plan.stores == ['Rapida']
+    assert plan.skipped == {'Lenta': 'meta de resultados já coberta'}
+    # Lojas escolhidas pelo usuário só são reordenadas
+    plan = planner.plan('whey', STORES, 5, deadline=5, target=5, required=STORES)
+    assert sorted(plan.stores) == sorted(STORES)
+    assert plan.skipped == {}
+
+
+def test_exploration_keeps_one_store_when_all_are_skipped():
+    planner = _trained(exploration=0)
+    plan = planner.plan('whey', ['Vazia'], 5)
+    assert plan.stores == plan.explored == ['Vazia']
+
+
+def test_timeouts_only_update_latency():
+    planner = StorePlanner(seed=0)
+    planner.record('whey', 'Lenta', None, 5, 10.0)
+    stats = planner.stats()['whey']['Lenta']
+    assert (stats['observed'], stats['samples'], stats['latency_s']) == (1, 0, 10.0)
+
+
+def test_search_records_only_useful_outcomes(monkeypatch):
+    instance = scraper.SupplementScraper()
+    instance.planner = StorePlanner(seed=0)
+    products = [Product(f'Whey {i}', 100 + i, '/w.png', f'/p/{i}', 'Panvel', 'Growth', '') for i in range(5)]
+
+    def broken(*args):
+        raise RuntimeError('falha inesperada')
+
+    monkeypatch.setattr(instance, 'search_panvel', lambda *args: products)
+    monkeypatch.setattr(instance, 'search_amazon', broken)
+    monkeypatch.setattr(instance, 'search_onofre', lambda *args: [])
+    instance.search_supplements('whey', 5, stores=['Panvel', 'Amazon', 'Onofre'])
+    stats = instance.planner.stats()['whey']
+    # A loja com erro fica de fora do histórico
+    assert set(stats) == {'Panvel', 'Onofre'}
+    assert stats['Panvel']['fill'] == 1.0
+    assert stats['Onofre']['fill'] == 0.0
+
+    # Nada em loja nenhuma: só a latência conta
+    monkeypatch.setattr(instance, 'search_panvel', lambda *args: [])
+    instance.search_supplements('creatina', 5, stores=['Panvel'])
+    assert instance.planner.stats()['creatina']['Panvel']['samples'] == 0
+
+    instance.search_supplements('colágeno', 5, stores=['Panvel'])
+    assert 'geral' not in instance.planner.stats()
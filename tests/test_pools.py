@@ -0,0 +1,104 @@
+import concurrent.futures
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import transport
+from transport import PoolWarmer, RequestsTransport
+
+# Servidor local HTTP/1.1 com keep-alive que conta as conexões abertas; serve
+# também de proxy de mentira, já que responde a qualquer URL absoluta.
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, body):
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+            self.server.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return body
+
+    def do_GET(self):
+        time.sleep(0.05)
+        self.wfile.write(self._reply(self.path.encode('utf-8')))
+
+    def do_HEAD(self):
+        self._reply(b'')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _transports(**kwargs):
+    kinds = [RequestsTransport(**kwargs)]
+    if transport.httpx is not None:
+        kinds.append(transport.HttpxTransport(**kwargs))
+    return kinds
+
+
+def _concurrent_gets(client, url, n=8, **kwargs):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n) as executor:
+        return list(executor.map(lambda i: client.get(f'{url}/busca?p={i}', **kwargs), range(n)))
+
+
+def test_store_pool_caps_and_reuses_connections(server):
+    for client in _transports(pools={server.url + '/busca': 2}):
+        server.connections.clear()
+        try:
+            # Tantas requisições simultâneas quanto o pool (o agendador garante isso no scraper)
+            for _ in range(4):
+                responses = _concurrent_gets(client, server.url, n=2)
+                assert [response.status_code for response in responses] == [200] * 2
+            assert len(server.connections) <= 2
+            stats = client.pool_stats()[server.url]
+            assert stats['size'] == 2
+            assert stats['idle'] >= 1
+        finally:
+            client.close()
+
+
+@pytest.mark.skipif(transport.httpx is None, reason='httpx não instalado')
+def test_proxied_requests_keep_per_host_pool_limits(server):
+    client = transport.HttpxTransport(pools={'http://loja.invalid': 2})
+    try:
+        responses = _concurrent_gets(client, 'http://loja.invalid', proxy=server.url)
+        assert responses[0].text == 'http://loja.invalid/busca?p=0'
+        # Pelo proxy, a loja continua limitada às conexões do seu pool
+        assert len(server.connections) <= 2
+    finally:
+        client.close()
+
+
+def test_warmer_pings_hosts_and_reports_failures(server):
+    client = RequestsTransport()
+    dead = 'http://127.0.0.1:9'
+    warmer = PoolWarmer(client, [server.url + '/busca?q=whey', server.url + '/outra', dead], timeout=1)
+    warmer.warm()
+    stats = warmer.stats()
+    assert set(stats) == {server.url, dead}
+    assert stats[server.url]['pings'] == 1
+    assert stats[server.url]['healthy']
+    assert not stats[dead]['healthy']
+    assert stats[dead]['last_error']
+    client.close()
+
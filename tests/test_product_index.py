@@ -0,0 +1,62 @@
+import pytest
+
+import scraper
+from product_index import ProductIndex, fts_query
+from products import Product
+
+
+def _product(title, price, store, link, brand=None):
+    return Product(title, price, '/img.png', link, store, brand, '2026-10-19')
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ProductIndex(str(tmp_path / 'products.db'))
+    index.add([
+        _product('Whey Protein Concentrado 900g', 129.9, 'Growth Suplementos', 'https://g/1', 'Growth'),
+        _product('Whey Protein Isolado 900g', 199.9, 'Growth Suplementos', 'https://g/2', 'Growth'),
+        _product('Whey Protein Hidrolisado', 249.9, 'Growth Suplementos', 'https://g/3', 'Growth'),
+        _product('Creatina Monohidratada 300g', 89.9, 'Max Titanium', 'https://m/1', 'Max Titanium'),
+        _product('Whey 100% Pure', 149.9, 'Max Titanium', 'https://m/2', 'Max Titanium'),
+    ], seen_at=1_700_000_000)
+    yield index
+    index.close()
+
+
+def test_fts_query_uses_every_term_as_prefix():
+    assert fts_query('Whey  Protéina') == '"whey"* AND "proteina"*'
+    assert fts_query('   ') == ''
+
+
+def test_search_is_prefix_and_accent_insensitive(index):
+    results = index.search('creátina mono')
+    assert [p.title for p in results] == ['Creatina Monohidratada 300g']
+    assert results[0].query_date.startswith('2023-11-')
+
+
+def test_search_caps_results_per_store(index):
+    results = index.search('whey', max_results=2)
+    stores = [p.store for p in results]
+    assert stores.count('Growth Suplementos') == 2
+    assert stores.count('Max Titanium') == 1
+
+
+def test_add_upserts_by_link(index):
+    index.add([_product('Whey Protein Concentrado 900g', 99.9, 'Growth Suplementos', 'https://g/1', 'Growth')])
+    assert len(index) == 5
+    assert [p.price for p in index.search('concentrado')] == [99.9]
+
+
+def test_scraper_answers_from_index_first(tmp_path, monkeypatch):
+    instance = scraper.SupplementScraper(index_path=str(tmp_path / 'index.db'))
+    instance.index.add([_product('Glutamina 300g', 59.9, 'Panvel', 'https://p/1')])
+    live = []
+    monkeypatch.setattr(instance, '_search_live', lambda *args, **kwargs: live.append(args) or [])
+
+    results = instance.search_supplements('glutamina', mode='index')
+    assert [p.title for p in results] == ['Glutamina 300g']
+    assert live == []
+
+    # Sem nada no índice, a busca vai às lojas
+    instance.search_supplements('beta alanina', mode='index')
+    assert len(live) == 1
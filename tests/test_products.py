@@ -0,0 +1,101 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import scraper
+from products import UNKNOWN_BRAND, FrozenBatchError, Product, ProductBatch
+
+
+def _batch():
+    return ProductBatch([
+        Product('Whey 900g', '129.90', '/w.png', 'https://a/w', 'Growth Suplementos', 'Growth', '2026-10-19'),
+        Product('Creatina', 59.9, '/c.png', 'https://a/c', 'Growth Suplementos', '', '2026-10-19'),
+        Product('BCAA', 79, '/b.png', 'https://b/b', 'Panvel', 'Max Titanium', '2026-10-19'),
+    ])
+
+
+def test_product_normalizes_fields():
+    product = Product('Creatina', '59.9', '/c.png', 'https://a/c', 'Panvel', None)
+    assert product.price == 59.9
+    assert product.brand == UNKNOWN_BRAND
+    assert product.to_dict()['store'] == 'Panvel'
+
+
+def test_batch_round_trip_and_dictionary_columns():
+    batch = _batch()
+    assert len(batch) == 3
+    assert [p.title for p in batch] == ['Whey 900g', 'Creatina', 'BCAA']
+    assert batch[1].brand == UNKNOWN_BRAND
+    assert batch.to_records()[0]['price'] == 129.9
+    # Loja repetida vira o mesmo código
+    assert list(batch.stores.codes) == [0, 0, 1]
+    assert not ProductBatch()
+
+
+def test_to_pandas_shares_memory_and_freezes():
+    pytest.importorskip('pandas')
+    batch = _batch()
+    df = batch.to_pandas()
+    assert list(df.columns) == ['title', 'price', 'image_url', 'link', 'store', 'brand', 'query_date']
+    assert df['price'].tolist() == [129.9, 59.9, 79.0]
+    assert df['store'].tolist() == ['Growth Suplementos', 'Growth Suplementos', 'Panvel']
+    assert batch.frozen
+    with pytest.raises(FrozenBatchError):
+        batch.append(batch[0])
+
+
+def test_to_pandas_copy_keeps_batch_open():
+    pytest.importorskip('pandas')
+    batch = _batch()
+    df = batch.to_pandas(copy=True)
+    batch.append(batch[0])
+    assert len(batch) == 4
+    assert len(df) == 3
+
+
+def test_to_arrow_dictionary_columns():
+    pytest.importorskip('pyarrow')
+    batch = _batch()
+    table = batch.to_arrow()
+    assert table.column('price').to_pylist() == [129.9, 59.9, 79.0]
+    assert table.column('brand').to_pylist() == ['Growth', UNKNOWN_BRAND, 'Max Titanium']
+    assert str(table.schema.field('store').type) == 'dictionary<values=string, indices=int32, ordered=0>'
+    with pytest.raises(FrozenBatchError):
+        batch.extend([batch[0]])
+    assert _batch().to_arrow(copy=True).num_rows == 3
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # Os primeiros itens vêm sem preço e são descartados na extração
+        prices = ['0,00'] * 3 + [f'{10 + i},00' for i in range(5)]
+        body = '<html><body>' + ''.join(
+            f'<div class="product-card"><h2 class="product-name">Item {i}</h2><span class="price">R$ {price}</span>'
+            f'<img class="product-image" src="/i{i}.png"><a class="product-link" href="/p/{i}">ver</a></div>'
+            for i, price in enumerate(prices)
+        ) + '</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+def test_catalog_caps_after_dropping_zero_prices(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        spec = scraper.STORE_SPECS['Panvel']
+        monkeypatch.setitem(spec, 'base_url', base_url)
+        monkeypatch.setitem(spec, 'search_url', base_url + '/busca?q={query}')
+        monkeypatch.delitem(spec, 'delay', raising=False)
+        results = scraper.SupplementScraper().search_panvel('whey', 4)
+        assert [p.title for p in results] == ['Item 3', 'Item 4', 'Item 5', 'Item 6']
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,52 @@
+import pytest
+
+from queries import canonicalize, normalize_text, strip_accents
+
+LITERAL = {}
+EXPANDED = {'query_form': 'expanded'}
+
+
+@pytest.mark.parametrize('variant', ['Creatina', 'CREATINA ', 'creatína', '  creatina  ', 'creatine'])
+def test_variants_share_the_key(variant):
+    assert canonicalize(variant).key == canonicalize('creatina').key == 'creatina'
+
+
+def test_normalize_text():
+    assert normalize_text('  Pré-Treino   Açaí! ') == 'pre-treino acai'
+    assert strip_accents('Proteína') == 'Proteina'
+    assert normalize_text(None) == ''
+
+
+def test_aliases_stop_words_and_order():
+    query = canonicalize('Proteína Whey de Chocolate')
+    assert query.text == 'whey chocolate'
+    assert query.key == canonicalize('chocolate whey').key
+    assert canonicalize('pre workout').text == 'pre treino'
+    # Só stop words: fica o que foi digitado
+    assert canonicalize('de').text == 'de'
+
+
+def test_modifiers_stay_bound_to_the_next_term():
+    without = canonicalize('whey sem lactose')
+    with_lactose = canonicalize('whey com lactose')
+    assert without.key != with_lactose.key
+    assert without.key == canonicalize('sem lactose whey').key
+    assert 'sem_lactose' in without.key.split()
+
+
+def test_stores_get_the_typed_text_or_its_expansion():
+    query = canonicalize('Creatina Monohidratada')
+    assert query.key == 'creatina'
+    assert query.for_store(LITERAL) == 'creatina monohidratada'
+    assert canonicalize('whey').for_store(EXPANDED) == 'whey protein'
+    # A forma longa já digitada não é expandida de novo
+    assert canonicalize('Whey Protein').for_store(EXPANDED) == 'whey protein'
+    assert canonicalize('bcaa 2400').for_store(EXPANDED) == 'aminoacidos bcaa 2400'
+
+
+def test_store_text_separates_aliases_that_share_a_key():
+    # Mesma chave de histórico, mas a loja de busca literal recebe textos diferentes
+    short, long_form = canonicalize('creatina'), canonicalize('creatina monohidratada')
+    assert short.key == long_form.key
+    assert short.for_store(LITERAL) != long_form.for_store(LITERAL)
+    assert canonicalize('Creatina ').for_store(LITERAL) == short.for_store(LITERAL)
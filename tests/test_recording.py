@@ -0,0 +1,85 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import scraper
+from recording import RecordingTransport, ReplayMismatch, ReplayTransport, archive_summary
+from transport import RequestsTransport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits += 1
+        if self.path.startswith('/imagem'):
+            body, content_type = bytes(range(256)), 'image/png'
+        else:
+            # Cada pedido devolve um preço diferente: a reprodução tem de repetir a ordem gravada
+            body = (f'<html><body><div class="product-card"><h2 class="product-name">Whey</h2>'
+                    f'<span class="price">R$ {100 + self.server.hits},00</span><img class="product-image" src="/w.png">'
+                    f'<a class="product-link" href="/p/1">ver</a></div></body></html>').encode('utf-8')
+            content_type = 'text/html; charset=utf-8'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_replay_serves_recorded_responses_in_order(server, tmp_path):
+    path = str(tmp_path / 'gravacao.jsonl.gz')
+    recorder = RecordingTransport(RequestsTransport(), path)
+    recorded = [recorder.get(server.url + '/busca?q=whey').content for _ in range(2)]
+    image = recorder.get(server.url + '/imagem').content
+    recorder.close()
+
+    replay = ReplayTransport(path, latency='zero')
+    assert [replay.get(server.url + '/busca?q=whey').content for _ in range(2)] == recorded
+    assert replay.get(server.url + '/imagem').content == image
+    assert replay.pending() == 0
+    # Pedidos além dos gravados repetem a última resposta
+    assert replay.get(server.url + '/busca?q=whey').content == recorded[1]
+    assert server.hits == 3
+
+    with pytest.raises(ReplayMismatch):
+        replay.get(server.url + '/busca?q=creatina')
+    assert replay.unmatched == [server.url + '/busca?q=creatina']
+
+    _, by_store, bodies = archive_summary(path)
+    assert bodies == 3
+    assert sum(summary['requests'] for summary in by_store.values()) == 3
+
+
+def test_search_replays_identically_offline(server, tmp_path, monkeypatch):
+    spec = scraper.STORE_SPECS['Panvel']
+    monkeypatch.setitem(spec, 'base_url', server.url)
+    monkeypatch.setitem(spec, 'search_url', server.url + '/busca?q={query}')
+    monkeypatch.delitem(spec, 'delay', raising=False)
+    path = str(tmp_path / 'gravacao.jsonl.gz')
+
+    recorder = scraper.SupplementScraper(max_pages=1, record_path=path)
+    recorded = recorder.search_supplements('whey', 1, stores=['Panvel']).to_records()
+    recorder.transport.close()
+    server.shutdown()
+
+    replayer = scraper.SupplementScraper(max_pages=1, replay_path=path, replay_latency='zero')
+    replayed = replayer.search_supplements('whey', 1, stores=['Panvel']).to_records()
+    assert [(p['title'], p['price'], p['link']) for p in replayed] == [(p['title'], p['price'], p['link']) for p in recorded]
+
+    # Uma busca que não foi gravada é erro, não uma loja sem resultados
+    with pytest.raises(ReplayMismatch):
+        replayer.search_supplements('creatina', 1, stores=['Panvel'])
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+from resilience import HedgeBudget, LatencyTracker, ResiliencePolicy, ResilientCaller
+from transport import TransportError
+
+
+class _Response:
+    def __init__(self, status_code, body=b''):
+        self.status_code = status_code
+        self.content = body
+
+
+def _sequence(*outcomes):
+    """fn() que devolve (ou levanta) cada resultado em ordem."""
+    outcomes = list(outcomes)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    fn.calls = calls
+    return fn
+
+
+def _caller(**policy):
+    return ResilientCaller(policies={'Loja': ResiliencePolicy(backoff_base=0, **policy)})
+
+
+def test_retries_retryable_status_until_success():
+    caller = _caller(retries=2)
+    fn = _sequence(_Response(503), _Response(502), _Response(200))
+    assert caller.call('Loja', fn).status_code == 200
+    assert len(fn.calls) == 3
+    assert caller.stats()['retried'] == 2
+
+
+def test_returns_last_response_when_retries_run_out():
+    caller = _caller(retries=1)
+    fn = _sequence(_Response(503), _Response(503))
+    assert caller.call('Loja', fn).status_code == 503
+    assert len(fn.calls) == 2
+
+
+def test_other_statuses_are_not_retried():
+    caller = _caller(retries=2)
+    fn = _sequence(_Response(404))
+    assert caller.call('Loja', fn).status_code == 404
+    assert caller.retried == 0
+
+
+def test_transport_errors_are_retried_then_raised():
+    caller = _caller(retries=1)
+    fn = _sequence(TransportError('conexão recusada'), _Response(200))
+    assert caller.call('Loja', fn).status_code == 200
+
+    fn = _sequence(TransportError('conexão recusada'), TransportError('conexão recusada'))
+    with pytest.raises(TransportError):
+        caller.call('Loja', fn)
+    assert len(fn.calls) == 2
+
+
+def test_latency_percentile_needs_enough_samples():
+    tracker = LatencyTracker()
+    for seconds in range(1, 11):
+        tracker.record('Loja', seconds / 10)
+    assert tracker.percentile('Loja', 0.95) == 1.0
+    assert tracker.percentile('Loja', 0.5) == 0.6
+    assert tracker.percentile('Loja', 0.95, min_samples=20) is None
+
+
+def test_hedge_budget_refills_up_to_burst():
+    budget = HedgeBudget(burst=1.0)
+    assert budget.withdraw('Loja')
+    assert not budget.withdraw('Loja')
+    for _ in range(5):
+        budget.deposit('Loja', 0.5)
+    assert budget.withdraw('Loja')
+    assert not budget.available('Loja')
+
+
+def _slow_then_fast(slow=0.5):
+    calls = []
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        if first:
+            time.sleep(slow)
+            return _Response(200, b'primeira')
+        return _Response(200, b'copia')
+    fn.calls = calls
+    return fn
+
+
+def test_slow_request_is_hedged():
+    caller = _caller(retries=0, hedge=True, hedge_after=0.05)
+    fn = _slow_then_fast()
+    started = time.perf_counter()
+    response = caller.call('Loja', fn)
+    assert response.content == b'copia'
+    assert time.perf_counter() - started < 0.4
+    assert caller.stats() == {'retried': 0, 'hedged': 1, 'hedge_wins': 1}
+
+
+def test_hedges_stop_when_budget_runs_out():
+    caller = _caller(retries=0, hedge=True, hedge_after=0.02, hedge_budget=0.0)
+    caller.budget = HedgeBudget(burst=1.0)
+    assert caller.call('Loja', _slow_then_fast(0.1)).content == b'copia'
+    assert caller.call('Loja', _slow_then_fast(0.1)).content == b'primeira'
+    assert caller.hedged == 1
+
+
+class _FullSlots:
+    """Agendador com a loja no limite: só a vaga da requisição principal existe."""
+
+    def __init__(self):
+        self.held = 0
+
+    def acquire_store_slot(self, store_name, blocking=True):
+        if self.held and not blocking:
+            return False
+        self.held += 1
+        return True
+
+    def release_store_slot(self, store_name):
+        self.held -= 1
+
+
+def test_no_hedge_without_a_free_store_slot():
+    caller = _caller(retries=0, hedge=True, hedge_after=0.02)
+    slots = _FullSlots()
+    assert caller.call('Loja', _slow_then_fast(0.1), slots=slots).content == b'primeira'
+    assert caller.hedged == 0
+    assert slots.held == 0
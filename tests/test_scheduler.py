@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import SchedulerBusy, SearchScheduler
+
+
+class Gauge:
+    """Conta quantas chamadas estão em andamento ao mesmo tempo."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, seconds, result=None):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        time.sleep(seconds)
+        with self._lock:
+            self.current -= 1
+        return result
+
+
+def test_saturated_store_does_not_starve_idle_store():
+    scheduler = SearchScheduler(max_workers=4, per_store_limit=4, max_wait=1.0, store_limits={'Lenta': 1})
+    slow = Gauge()
+    backlog = [scheduler.submit(f'sessao-{i % 3}', 'Lenta', slow, 0.2) for i in range(12)]
+
+    started = time.perf_counter()
+    quick = [scheduler.submit('sessao-x', 'Rapida', lambda: 'ok') for _ in range(8)]
+    assert [future.result(timeout=2) for future in quick] == ['ok'] * 8
+    # Nenhum worker fica parado esperando a vaga da loja lenta
+    assert time.perf_counter() - started < 0.5
+    assert slow.peak == 1
+
+    results = []
+    for future in backlog:
+        try:
+            results.append(future.result(timeout=5))
+        except SchedulerBusy:
+            results.append('expirou')
+    # Só cabem ~5 buscas lentas no max_wait; as outras são descartadas, não ficam presas
+    assert 'expirou' in results
+    assert scheduler.metrics()['expired'] == results.count('expirou')
+    assert scheduler.metrics()['store_in_use'] == {'Lenta': 0, 'Rapida': 0}
+
+
+def test_task_uses_its_reserved_slot_for_the_first_request():
+    scheduler = SearchScheduler(max_workers=2, store_limits={'Amazon': 1})
+    inner = []
+
+    def fetch():
+        # A vaga reservada pelo worker vale para a primeira requisição; a segunda não cabe
+        inner.append(scheduler.acquire_store_slot('Amazon', blocking=False))
+        inner.append(scheduler.acquire_store_slot('Amazon', blocking=False))
+        scheduler.release_store_slot('Amazon')
+        return 'ok'
+
+    assert scheduler.run('sessao', 'Amazon', fetch) == 'ok'
+    assert inner == [True, False]
+    assert scheduler.metrics()['store_in_use'] == {'Amazon': 0}
+    # A vaga voltou: outra busca na loja roda normalmente
+    assert scheduler.run('sessao', 'Amazon', lambda: 'de novo') == 'de novo'
+
+
+def test_sessions_are_served_round_robin():
+    scheduler = SearchScheduler(max_workers=1)
+    gate = threading.Event()
+    order = []
+    blocker = scheduler.submit('bloqueio', 'Loja', gate.wait)
+    time.sleep(0.05)
+    futures = [scheduler.submit('a', 'Loja', order.append, f'a{i}') for i in range(3)]
+    futures += [scheduler.submit('b', 'Loja', order.append, f'b{i}') for i in range(3)]
+    gate.set()
+    for future in [blocker] + futures:
+        future.result(timeout=2)
+    assert order == ['a0', 'b0', 'a1', 'b1', 'a2', 'b2']
+
+
+def test_admit_rejects_when_queue_is_full():
+    scheduler = SearchScheduler(max_workers=1, max_queue=2)
+    gate = threading.Event()
+    scheduler.submit('s', 'Loja', gate.wait)
+    time.sleep(0.05)
+    scheduler.submit('s', 'Loja', lambda: None)
+    scheduler.submit('s', 'Loja', lambda: None)
+    with pytest.raises(SchedulerBusy):
+        scheduler.admit()
+    assert scheduler.rejected == 1
+    gate.set()
+
+
+def test_errors_reach_the_caller():
+    scheduler = SearchScheduler(max_workers=1)
+
+    def fail():
+        raise ValueError('falhou')
+
+    with pytest.raises(ValueError):
+        scheduler.run('s', 'Loja', fail)
+    assert scheduler.run('s', 'Loja', lambda: 1) == 1
@@ -0,0 +1,119 @@
+import asyncio
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+pytest.importorskip('hypercorn')
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+import scraper
+import service
+from search_client import SearchClient, SearchServiceError
+
+
+class _Store(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = '<html><body>' + ''.join(
+            f'<div class="product-card"><h2 class="product-name">Whey {i}</h2><span class="price">R$ {100 + i},00</span>'
+            f'<img class="product-image" src="/w{i}.png"><a class="product-link" href="/p/{i}">ver</a></div>'
+            for i in range(3)
+        ) + '</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def base_url():
+    store = ThreadingHTTPServer(('127.0.0.1', 0), _Store)
+    store.daemon_threads = True
+    threading.Thread(target=store.serve_forever, daemon=True).start()
+    store_url = f'http://127.0.0.1:{store.server_address[1]}'
+    patch = pytest.MonkeyPatch()
+    spec = scraper.STORE_SPECS['Panvel']
+    patch.setitem(spec, 'base_url', store_url)
+    patch.setitem(spec, 'search_url', store_url + '/busca?q={query}')
+    patch.delitem(spec, 'delay', raising=False)
+    patch.setattr(service, '_scraper', scraper.SupplementScraper(max_pages=1))
+
+    config = Config()
+    port = _free_port()
+    config.bind = [f'127.0.0.1:{port}']
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(service.app, config, shutdown_trigger=stop.wait),))
+    thread.start()
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            requests.get(url + '/health', timeout=1)
+            break
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    yield url
+    loop.call_soon_threadsafe(stop.set)
+    thread.join(5)
+    patch.undo()
+    store.shutdown()
+    store.server_close()
+
+
+def test_search_returns_products_and_trace(base_url):
+    client = SearchClient(base_url, session_id='teste')
+    results = client.search('whey', 2, stores=['Panvel'])
+    assert [p.title for p in results] == ['Whey 0', 'Whey 1']
+    assert results[0].store == 'Panvel'
+    assert client.timed_out == []
+    trace = client.get_trace(client.last_search_id)
+    assert trace['query'] == 'whey'
+    assert any(span['store'] == 'Panvel' for span in trace['spans'])
+
+
+def test_stream_yields_each_store(base_url):
+    client = SearchClient(base_url)
+    events = list(client.stream('whey', 3, stores=['Panvel']))
+    assert [(store, len(products)) for store, products in events] == [('Panvel', 3)]
+    assert client.last_search_id
+
+
+def test_invalid_parameters_are_rejected(base_url):
+    client = SearchClient(base_url)
+    with pytest.raises(SearchServiceError, match='400'):
+        client.search('whey', stores=['Loja Inexistente'])
+    with pytest.raises(SearchServiceError, match='400'):
+        client.search('whey', max_results=0)
+    response = requests.get(base_url + '/search')
+    assert response.status_code == 400
+    assert requests.delete(base_url + '/search').status_code == 405
+    assert requests.get(base_url + '/nada').status_code == 404
+    assert client.get_trace('inexistente') is None
+
+
+def test_health(base_url):
+    health = SearchClient(base_url).health()
+    assert health['status'] == 'ok'
+    assert 'Panvel' in health['stores']
+
+
+def test_parse_search_params():
+    assert service.parse_search_params({'query': ' whey ', 'stores': 'Panvel, Amazon', 'deadline': '1000'}) == dict(
+        service.parse_search_params({'q': 'whey', 'stores': ['Panvel', 'Amazon']}), deadline=service.MAX_DEADLINE)
+    with pytest.raises(ValueError):
+        service.parse_search_params({'q': 'whey', 'stream': 'xml'})
+    with pytest.raises(ValueError):
+        service.parse_search_params({'q': 'whey', 'deadline': '-1'})
@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+
+import pytest
+
+import shared_cache
+from products import Product
+from shared_cache import LocalRedisServer, RedisCacheBackend, SharedCache, SQLiteCacheBackend
+
+# Cada réplica tem seu próprio backend (conexão) e SharedCache, como
+# processos diferentes apontando para o mesmo arquivo ou servidor.
+
+PARTS = ('busca', 'whey', ('Amazon',), 20)
+
+
+def encode(value):
+    return json.dumps(value).encode('utf-8')
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_cache(request, tmp_path):
+    if request.param == 'sqlite':
+        path = str(tmp_path / 'cache.db')
+        new_backend = lambda: SQLiteCacheBackend(path)  # noqa: E731
+        server = None
+    else:
+        server = LocalRedisServer().start()
+        new_backend = lambda: RedisCacheBackend.from_url(server.url)  # noqa: E731
+
+    caches = []
+
+    def make(**kwargs):
+        kwargs.setdefault('encode', encode)
+        kwargs.setdefault('decode', json.loads)
+        cache = SharedCache(new_backend(), **kwargs)
+        caches.append(cache)
+        return cache
+
+    make.server = server
+    yield make
+    for cache in caches:
+        cache.backend.close()
+    if server is not None:
+        server.stop()
+
+
+class Compute:
+    """compute() contado e lento, que devolve o valor da vez."""
+
+    def __init__(self, value, delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+def _fetch_concurrently(caches, compute):
+    results = [None] * len(caches)
+    barrier = threading.Barrier(len(caches))
+
+    def run(i):
+        barrier.wait()
+        results[i] = caches[i].fetch(PARTS, compute)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(caches))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return results
+
+
+def test_hit_after_compute(make_cache):
+    cache = make_cache()
+    compute = Compute(['a', 'b'])
+    assert cache.fetch(PARTS, compute) == ['a', 'b']
+    assert make_cache().fetch(PARTS, compute) == ['a', 'b']
+    assert cache.fetch(PARTS, compute) == ['a', 'b']
+    assert compute.calls == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cold_key_computed_once_across_replicas(make_cache):
+    caches = [make_cache() for _ in range(6)]
+    compute = Compute(['a'], delay=0.3)
+    assert _fetch_concurrently(caches, compute) == [['a']] * 6
+    assert compute.calls == 1
+    assert sum(cache.stats()['waited'] for cache in caches) == 5
+
+
+def test_expired_entry_served_stale_while_one_replica_refreshes(make_cache):
+    caches = [make_cache(ttl=0.2, grace=30) for _ in range(6)]
+    caches[0].fetch(PARTS, Compute(['antigo']))
+    time.sleep(0.25)
+
+    compute = Compute(['novo'], delay=0.3)
+    results = _fetch_concurrently(caches, compute)
+    assert compute.calls == 1
+    assert results.count(['novo']) == 1
+    assert results.count(['antigo']) == 5
+    assert sum(cache.stats()['refreshes'] for cache in caches) == 1
+    assert sum(cache.stats()['stale'] for cache in caches) == 5
+    assert caches[1].fetch(PARTS, compute) == ['novo']
+
+
+def test_expired_lease_is_taken_over(make_cache):
+    holder = make_cache(lease_ttl=0.2)
+    key = shared_cache.cache_key(*PARTS)
+    # Réplica que pegou a concessão e morreu sem liberar
+    assert holder.backend.acquire(key, holder.owner, holder.lease_ttl)
+
+    cache = make_cache(lease_ttl=0.2)
+    compute = Compute(['a'])
+    started = time.monotonic()
+    assert cache.fetch(PARTS, compute, wait=5) == ['a']
+    assert compute.calls == 1
+    assert time.monotonic() - started < 2
+
+
+def test_empty_result_expires_quickly_without_grace(make_cache, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'EMPTY_TTL', 0.2)
+    cache = make_cache(ttl=60, grace=60)
+    compute = Compute([])
+    assert cache.fetch(PARTS, compute) == []
+    assert cache.fetch(PARTS, compute) == []
+    assert compute.calls == 1
+    time.sleep(0.3)
+    assert cache.fetch(PARTS, compute) == []
+    # Sem carência: sai do cache em vez de ser servido vencido
+    assert compute.calls == 2
+    assert cache.stats()['stale'] == 0
+
+
+def test_invalidate(make_cache):
+    cache = make_cache()
+    compute = Compute(['a'])
+    cache.fetch(PARTS, compute)
+    make_cache().invalidate(*PARTS)
+    cache.fetch(PARTS, compute)
+    assert compute.calls == 2
+
+
+def test_products_round_trip(make_cache):
+    cache = make_cache(encode=shared_cache.encode_products, decode=shared_cache.decode_products)
+    product = Product('Whey Protein 900g', 129.9, 'https://img/w.jpg', 'https://loja/w', 'Amazon', 'Growth', '2026-10-19')
+    cache.fetch(PARTS, lambda: [product])
+    assert cache.fetch(PARTS, Compute([])) == [product]
+
+
+def test_redis_down_falls_back_to_compute(make_cache):
+    if make_cache.server is None:
+        pytest.skip('só para o backend Redis')
+    cache = make_cache()
+    make_cache.server.stop()
+    compute = Compute(['a'])
+    assert cache.fetch(PARTS, compute) == ['a']
+    assert compute.calls == 1
+    assert cache.stats()['errors'] >= 1
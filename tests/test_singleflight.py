@@ -0,0 +1,179 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import scraper
+from singleflight import SingleFlight, SingleFlightTimeout
+
+
+def _start_leader(flight, key, fn):
+    """Dispara a líder numa thread e espera ela ocupar a chave."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = flight.do(key, fn)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    while not flight.in_flight():
+        time.sleep(0.001)
+    return thread, outcome
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return ['whey']
+
+    leader, outcome = _start_leader(flight, 'k', fetch)
+    results = []
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', fetch))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()['shared'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert calls == [1]
+    assert outcome['result'] == ['whey']
+    assert results == [['whey']] * 4
+    assert flight.stats() == {'leaders': 1, 'shared': 4, 'in_flight': 0}
+
+
+def test_leader_failure_is_retried_by_a_follower():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ConnectionError('loja fora do ar')
+
+    leader, outcome = _start_leader(flight, 'k', failing)
+    follower = threading.Thread(target=lambda: outcome.setdefault('follower', flight.do('k', lambda: ['creatina'])))
+    follower.start()
+    while not flight.stats()['shared']:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert isinstance(outcome['error'], ConnectionError)
+    # O seguidor refaz a busca em vez de herdar o erro
+    assert outcome['follower'] == ['creatina']
+    assert flight.leaders == 2
+
+
+def test_leader_failure_propagates_without_retries():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ConnectionError('loja fora do ar')
+
+    leader, _ = _start_leader(flight, 'k', failing)
+    errors = []
+
+    def follow():
+        try:
+            flight.do('k', lambda: pytest.fail('não deveria refazer'), retries=0)
+        except ConnectionError as e:
+            errors.append(e)
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    while not flight.stats()['shared']:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert [str(e) for e in errors] == ['loja fora do ar']
+
+
+def test_follower_timeout():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader, outcome = _start_leader(flight, 'k', lambda: release.wait(5) and ['bcaa'])
+
+    with pytest.raises(SingleFlightTimeout):
+        flight.do('k', lambda: ['outra'], timeout=0.05)
+    # A líder segue e termina normalmente
+    release.set()
+    leader.join()
+    assert outcome['result'] == ['bcaa']
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.stats() == {'leaders': 2, 'shared': 0, 'in_flight': 0}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.queries.append(parse_qs(urlsplit(self.path).query)['q'][0])
+        time.sleep(0.2)
+        body = ('<html><body><div class="product-card"><h2 class="product-name">Creatina 300g</h2>'
+                '<span class="price">R$ 89,90</span><img class="product-image" src="/c.png">'
+                '<a class="product-link" href="/p/1">ver</a></div></body></html>')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def store(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.queries = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    spec = scraper.STORE_SPECS['Panvel']
+    monkeypatch.setitem(spec, 'base_url', base_url)
+    monkeypatch.setitem(spec, 'search_url', base_url + '/busca?q={query}')
+    monkeypatch.delitem(spec, 'delay', raising=False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _search_together(queries):
+    instance = scraper.SupplementScraper(max_pages=1)
+    results = {}
+    threads = [threading.Thread(target=lambda q=q: results.setdefault(q, instance.search_panvel(q, 1))) for q in queries]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_store_searches_coalesce_on_identical_text(store):
+    results = _search_together(['creatina', 'Creatina ', 'creatina'])
+    assert store.queries == ['creatina']
+    assert all(len(products) == 1 for products in results.values())
+
+
+def test_aliases_sent_as_different_text_are_not_coalesced(store):
+    # Mesma chave canônica, mas a loja recebe textos diferentes
+    _search_together(['creatina', 'creatina monohidratada'])
+    assert sorted(store.queries) == ['creatina', 'creatina monohidratada']
@@ -0,0 +1,68 @@
+import json
+
+from structured import products_from_json_ld, products_from_next_data, products_from_vtex
+
+
+def _page(script):
+    return ('<html><head>' + script + '</head><body><div class="product-card"></div></body></html>').encode('utf-8')
+
+
+def test_json_ld_item_list_and_graph():
+    item_list = {
+        '@context': 'https://schema.org',
+        '@type': 'ItemList',
+        'itemListElement': [
+            {'@type': 'ListItem', 'position': 1, 'item': {
+                '@type': 'Product', 'name': 'Whey Protein 900g', 'url': 'https://loja/whey',
+                'image': ['https://img/whey.jpg'], 'brand': {'@type': 'Brand', 'name': 'Growth'},
+                'offers': {'@type': 'Offer', 'price': '129.90'},
+            }},
+            # Sem preço: fica de fora
+            {'@type': 'ListItem', 'position': 2, 'item': {'@type': 'Product', 'name': 'Sem preço', 'url': '/x'}},
+        ],
+    }
+    graph = {'@graph': [{'@type': ['Product', 'Thing'], 'name': 'Creatina', 'offers': {
+        '@type': 'AggregateOffer', 'lowPrice': 59.9, 'url': 'https://loja/creatina'}}]}
+    content = _page(
+        f'<script type="application/ld+json">{json.dumps(item_list)}</script>'
+        f"<script type='application/ld+json'>{json.dumps(graph)}</script>"
+        '<script type="application/ld+json">{quebrado</script>'
+    )
+    assert products_from_json_ld(content) == [
+        {'title': 'Whey Protein 900g', 'price': '129.90', 'image_url': 'https://img/whey.jpg',
+         'link': 'https://loja/whey', 'brand': 'Growth'},
+        {'title': 'Creatina', 'price': 59.9, 'image_url': None, 'link': 'https://loja/creatina', 'brand': None},
+    ]
+
+
+def test_next_data_state_walk():
+    state = {'props': {'pageProps': {'search': {'products': [
+        {'productName': ' BCAA 2400 ', 'bestPrice': 79.9, 'href': '/bcaa', 'images': [{'imageUrl': '/bcaa.jpg'}],
+         'brand': 'Max'},
+        {'name': 'Glutamina', 'price': 49.9, 'linkText': 'glutamina-300g'},
+        {'name': 'Sem link', 'price': 10},
+    ]}}}}
+    content = _page(f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state)}</script>')
+    assert products_from_next_data(content) == [
+        {'title': 'BCAA 2400', 'price': 79.9, 'image_url': '/bcaa.jpg', 'link': '/bcaa', 'brand': 'Max'},
+        # linkText do VTEX é só o identificador da página do produto
+        {'title': 'Glutamina', 'price': 49.9, 'image_url': None, 'link': '/glutamina-300g/p', 'brand': None},
+    ]
+    assert products_from_next_data(_page('')) == []
+
+
+def test_vtex_api():
+    response = [
+        {'productName': 'Whey Isolado', 'brand': 'Integralmedica', 'linkText': 'whey-isolado',
+         'items': [{'images': [{'imageUrl': 'https://img/w.jpg'}],
+                    'sellers': [{'commertialOffer': {'Price': 199.9, 'AvailableQuantity': 10}}]}]},
+        {'productName': 'Esgotado', 'linkText': 'esgotado',
+         'items': [{'sellers': [{'commertialOffer': {'Price': 10, 'AvailableQuantity': 0}}]}]},
+        {'productName': 'Sem itens', 'items': []},
+    ]
+    assert products_from_vtex(json.dumps(response).encode()) == [
+        {'title': 'Whey Isolado', 'price': 199.9, 'image_url': 'https://img/w.jpg', 'link': '/whey-isolado/p',
+         'brand': 'Integralmedica'},
+    ]
+    assert products_from_vtex(b'{"erro": true}') == []
+    assert products_from_vtex(b'nao e json') == []
@@ -0,0 +1,63 @@
+import random
+
+from products import Product
+from suggestions import SHORT_PREFIX, SuggestionIndex
+
+
+def texts(suggestions):
+    return [suggestion['text'] for suggestion in suggestions]
+
+
+def test_prefix_matches_any_word():
+    index = SuggestionIndex()
+    index.add('Whey Protein Isolado', 'title')
+    index.add('Creatina', 'title')
+    assert texts(index.suggest('prot')) == ['whey protein isolado']
+    assert texts(index.suggest('PRÓT')) == ['whey protein isolado']
+    assert index.suggest('x') == []
+    assert index.suggest('  ') == []
+
+
+def test_searches_with_results_rank_first():
+    index = SuggestionIndex()
+    index.add('whey growth', 'title', count=50)
+    index.add('whey', 'query')
+    index.add('whey isolado', 'brand', count=5)
+    assert texts(index.suggest('whe')) == ['whey', 'whey growth', 'whey isolado']
+    assert index.suggest('whe')[0]['kind'] == 'query'
+
+
+def test_cached_prefix_sees_new_counts():
+    index = SuggestionIndex()
+    index.add('creatina pura', 'title', count=2)
+    index.add('creatina caps', 'title', count=1)
+    assert texts(index.suggest('creat')) == ['creatina pura', 'creatina caps']
+    index.add('creatina caps', 'title', count=5)
+    assert texts(index.suggest('creat')) == ['creatina caps', 'creatina pura']
+
+
+def test_short_prefixes_match_a_full_scan():
+    rng = random.Random(7)
+    words = ['whey', 'wafer', 'creatina', 'cafeina', 'bcaa', 'beta alanina', 'glutamina', 'gel']
+    index = SuggestionIndex()
+    for _ in range(300):
+        index.add(f'{rng.choice(words)} {rng.choice(words)}', rng.choice(['query', 'brand', 'title']), rng.randint(1, 3))
+        if rng.random() < 0.02:
+            # Lote grande: reordena o array e recalcula os prefixos curtos
+            index.add_many([(f'produto {i} {rng.choice(words)}', 'title', 1) for i in range(300)])
+
+    for prefix in ['w', 'wh', 'c', 'ca', 'b', 'be', 'p', 'g']:
+        assert len(prefix) <= SHORT_PREFIX
+        expected = [index._rank(entry_id, prefix) for entry_id in index._top(prefix)]
+        assert [index._rank(entry_id, prefix) for entry_id in index._short[prefix]] == expected
+
+
+def test_add_search_indexes_query_brands_and_titles():
+    index = SuggestionIndex()
+    products = [
+        Product('Whey Protein Concentrado 900g', 129.9, '', 'https://loja/1', 'Amazon', 'Growth'),
+        Product('Whey Protein Isolado 900g', 199.9, '', 'https://loja/2', 'Amazon', 'Growth'),
+    ]
+    index.add_search('Whey Protein', products)
+    assert index.suggest('gro')[0] == {'text': 'growth', 'kind': 'brand', 'score': 4.0}
+    assert texts(index.suggest('whey')) == ['whey', 'whey protein concentrado 900g', 'whey protein isolado 900g']
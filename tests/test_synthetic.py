@@ -0,0 +1,45 @@
+import pytest
+
+from scraper import MAX_MOCK_SIZE, MOCK_SEED, MOCK_SIZE, STORE_SPECS, mock_request
+from synthetic import SyntheticStore, synthetic_catalog
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('teste', (MOCK_SIZE, MOCK_SEED)),
+    ('Teste 100 7', (100, 7)),
+    ('teste 0', (1, MOCK_SEED)),
+    ('teste 99999999', (MAX_MOCK_SIZE, MOCK_SEED)),
+    ('teste whey', None),
+    ('teste 1 2 3', None),
+    ('whey', None),
+])
+def test_mock_request(query, expected):
+    assert mock_request(query) == expected
+
+
+def test_catalog_is_deterministic_and_prefix_stable():
+    catalog = list(synthetic_catalog(600, seed=3))
+    assert len(catalog) == 600
+    assert catalog == list(synthetic_catalog(600, seed=3))
+    assert catalog[:250] == list(synthetic_catalog(250, seed=3))
+    assert catalog != list(synthetic_catalog(600, seed=4))
+    assert {product.store for product in catalog} <= set(STORE_SPECS)
+
+
+def test_catalog_store_filter():
+    catalog = list(synthetic_catalog(600, seed=3, stores={'Amazon', 'Panvel'}))
+    assert catalog
+    assert {product.store for product in catalog} <= {'Amazon', 'Panvel'}
+
+
+def test_synthetic_store_search():
+    store = SyntheticStore(5000, seed=1)
+    results = list(store.search('whey', max_results=3, price_range=(50, 200)))
+    assert results
+    by_store = {}
+    for product in results:
+        assert 'whey' in product.title.lower()
+        assert 50 <= product.price <= 200
+        by_store[product.store] = by_store.get(product.store, 0) + 1
+    assert max(by_store.values()) <= 3
+    assert {product.store for product in store.search('whey', stores=['Amazon'])} == {'Amazon'}
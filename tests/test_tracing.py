@@ -0,0 +1,103 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import scraper
+import tracing
+from tracing import Tracer
+
+
+def test_spans_nest_under_the_search():
+    tracer = Tracer()
+    with tracer.trace('whey') as trace:
+        with tracing.span('store', store='Panvel') as store_id:
+            with tracing.span('parse'):
+                pass
+            tracing.record('download', 0.0, 0.0, bytes=10)
+    assert not tracing.active()
+
+    spans = {span['name']: span for span in tracer.get(trace.search_id)['spans']}
+    assert set(spans) == {'search', 'store', 'parse', 'download'}
+    assert spans['search']['parent_id'] is None
+    assert spans['store']['parent_id'] == spans['search']['span_id'] == 1
+    assert spans['parse']['parent_id'] == store_id
+    # A loja é herdada pelos spans filhos
+    assert spans['parse']['store'] == spans['download']['store'] == 'Panvel'
+    assert spans['download']['tags'] == {'bytes': 10}
+    assert {span['search_id'] for span in spans.values()} == {trace.search_id}
+
+
+def test_span_without_trace_is_a_no_op():
+    with tracing.span('parse') as span_id:
+        assert span_id is None
+    tracing.record('download', 0.0, 1.0)
+    assert not tracing.active()
+
+
+def test_wrap_carries_the_trace_to_other_threads():
+    tracer = Tracer()
+    with tracer.trace('creatina') as trace:
+        with tracing.span('store', store='Amazon'):
+            def work():
+                with tracing.span('parse'):
+                    pass
+            thread = threading.Thread(target=tracing.wrap(work))
+            thread.start()
+            thread.join()
+            # Sem wrap a thread nova não vê o trace
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+    parse = [span for span in trace.to_dict()['spans'] if span['name'] == 'parse']
+    assert len(parse) == 1
+    assert parse[0]['store'] == 'Amazon'
+
+
+def test_finished_traces_are_written_and_kept(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    tracer = Tracer(str(path), keep=2)
+    ids = []
+    for query in ('whey', 'creatina', 'bcaa'):
+        with tracer.trace(query) as trace:
+            ids.append(trace.search_id)
+    assert [json.loads(line)['query'] for line in path.read_text(encoding='utf-8').splitlines()] == ['whey', 'creatina', 'bcaa']
+    assert tracer.get(ids[0]) is None
+    assert tracer.get(ids[2])['query'] == 'bcaa'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = ('<html><body><div class="product-card"><h2 class="product-name">Whey 900g</h2>'
+                '<span class="price">R$ 129,90</span><img class="product-image" src="/w.png">'
+                '<a class="product-link" href="/p/1">ver</a></div></body></html>')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+def test_store_search_records_its_phases(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        spec = scraper.STORE_SPECS['Panvel']
+        monkeypatch.setitem(spec, 'base_url', base_url)
+        monkeypatch.setitem(spec, 'search_url', base_url + '/busca?q={query}')
+        monkeypatch.delitem(spec, 'delay', raising=False)
+        instance = scraper.SupplementScraper(max_pages=1)
+        with instance.tracer.trace('whey') as trace:
+            assert len(instance.search_panvel('whey', 1)) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    names = {span['name'] for span in trace.to_dict()['spans'] if span['store'] == 'Panvel'}
+    assert {'store', 'ttfb', 'download', 'parse', 'extraction'} <= names
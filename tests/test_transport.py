@@ -0,0 +1,169 @@
+import asyncio
+import gzip
+import socket
+import ssl
+import threading
+import time
+
+import pytest
+
+import transport
+from transport import ACCEPT_ENCODING, HttpxTransport, RequestsTransport, ResponseTooLarge
+
+# Servidor TLS local (hypercorn) que negocia h2 ou http/1.1 por ALPN e
+# comprime a resposta com o melhor Content-Encoding que o cliente anunciou.
+
+hypercorn = pytest.importorskip('hypercorn')
+trustme = pytest.importorskip('trustme')
+
+from hypercorn.asyncio import serve  # noqa: E402
+from hypercorn.config import Config  # noqa: E402
+
+BODY = ('<div class="product-card"><h3>Whey Protein 900g</h3><span>R$ 129,90</span></div>\n' * 200).encode('utf-8')
+BIG = 256 * 1024
+
+
+def _encode(body, accept_encoding):
+    offered = {encoding.strip() for encoding in accept_encoding.split(',')}
+    if 'br' in offered:
+        brotli = pytest.importorskip('brotli')
+        return 'br', brotli.compress(body)
+    if 'gzip' in offered:
+        return 'gzip', gzip.compress(body)
+    return None, body
+
+
+async def app(scope, receive, send):
+    if scope['type'] != 'http':
+        return
+    request_headers = dict(scope['headers'])
+    accept_encoding = request_headers.get(b'accept-encoding', b'').decode()
+    headers = [(b'x-proto', scope['http_version'].encode()), (b'x-accept-encoding', accept_encoding.encode())]
+
+    if scope['path'] in ('/big', '/big-declared'):
+        if scope['path'] == '/big-declared':
+            headers.append((b'content-length', str(BIG).encode()))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        # Sem Content-Length, o corpo vai em partes até passar do limite
+        for _ in range(BIG // (16 * 1024)):
+            await send({'type': 'http.response.body', 'body': b'x' * 16 * 1024, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    encoding, body = _encode(BODY, accept_encoding)
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode()))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def tls_server(tmp_path_factory):
+    ca = trustme.CA()
+    directory = tmp_path_factory.mktemp('tls')
+    ca.issue_cert('127.0.0.1').private_key_and_cert_chain_pem.write_to_path(str(directory / 'server.pem'))
+    ca.cert_pem.write_to_path(str(directory / 'ca.pem'))
+
+    port = _free_port()
+    config = Config()
+    config.bind = [f'127.0.0.1:{port}']
+    config.certfile = config.keyfile = str(directory / 'server.pem')
+    config.alpn_protocols = ['h2', 'http/1.1']
+    config.accesslog = config.errorlog = None
+
+    loop = asyncio.new_event_loop()
+    stopped = asyncio.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve(app, config, shutdown_trigger=stopped.wait))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+    yield f'https://127.0.0.1:{port}', str(directory / 'ca.pem')
+
+    loop.call_soon_threadsafe(stopped.set)
+    thread.join(timeout=10)
+
+
+def _transports(ca):
+    kinds = [RequestsTransport(headers={'Accept-Encoding': ACCEPT_ENCODING}, verify=ca)]
+    if transport.HTTP2_AVAILABLE:
+        kinds.append(HttpxTransport(headers={'Accept-Encoding': ACCEPT_ENCODING}, verify=ssl.create_default_context(cafile=ca)))
+    return kinds
+
+
+def test_accept_encoding_only_advertises_installed_decoders():
+    offered = [encoding.strip() for encoding in ACCEPT_ENCODING.split(',')]
+    assert offered[:2] == ['gzip', 'deflate']
+    assert ('br' in offered) == transport._has_module('brotli', 'brotlicffi')
+    assert ('zstd' in offered) == transport._has_module('zstandard')
+
+
+@pytest.mark.skipif(not transport.HTTP2_AVAILABLE, reason='httpx com h2 não instalado')
+def test_httpx_negotiates_http2_and_decodes_body(tls_server):
+    url, ca = tls_server
+    client = HttpxTransport(headers={'Accept-Encoding': ACCEPT_ENCODING}, verify=ssl.create_default_context(cafile=ca))
+    try:
+        response = client.get(url + '/busca?q=whey')
+        assert response.status_code == 200
+        assert response.http_version == 'HTTP/2'
+        assert response.headers['x-proto'] == '2'
+        assert response.headers['x-accept-encoding'] == ACCEPT_ENCODING
+        assert response.content == BODY
+    finally:
+        client.close()
+
+
+def test_http11_client_falls_back_and_decodes_body(tls_server):
+    url, ca = tls_server
+    client = RequestsTransport(headers={'Accept-Encoding': ACCEPT_ENCODING}, verify=ca)
+    try:
+        response = client.get(url + '/busca?q=whey')
+        assert response.status_code == 200
+        assert response.headers['x-proto'] == '1.1'
+        assert response.headers.get('content-encoding') == ('br' if 'br' in ACCEPT_ENCODING else 'gzip')
+        assert response.content == BODY
+    finally:
+        client.close()
+
+
+def test_gzip_only_client_gets_gzip(tls_server):
+    url, ca = tls_server
+    client = RequestsTransport(headers={'Accept-Encoding': 'gzip, deflate'}, verify=ca)
+    try:
+        response = client.get(url + '/busca?q=whey')
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.content == BODY
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('path', ['/big', '/big-declared'])
+def test_max_bytes_interrupts_large_body(tls_server, path):
+    url, ca = tls_server
+    for client in _transports(ca):
+        try:
+            with pytest.raises(ResponseTooLarge) as raised:
+                client.get(url + path, max_bytes=64 * 1024)
+            assert raised.value.retryable is False
+            # Abaixo do limite o corpo vem inteiro
+            assert len(client.get(url + path, max_bytes=BIG).content) == BIG
+        finally:
+            client.close()
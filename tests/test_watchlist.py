@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from products import Product
+from watchlist import REBUILD_AT, Watchlist
+
+
+def _product(price, store='Panvel', link=None):
+    return Product('Whey 900g', price, '/w.png', link or f'/{store}/{price}', store, 'Growth', '')
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'watchlist.db')
+
+
+def test_alerts_once_per_price_drop(path):
+    watchlist = Watchlist(path)
+    watch_id = watchlist.add('Whey Protein', 120)
+    assert watchlist.check('whey', [_product(130)]) == []
+
+    alerts = watchlist.check('whey', [_product(119), _product(110, 'Amazon')])
+    assert [(a['watch_id'], a['price'], a['store']) for a in alerts] == [(watch_id, 110, 'Amazon')]
+    # Mesmo preço de novo não repete o alerta; só um preço menor
+    assert watchlist.check('whey', [_product(110, 'Amazon')]) == []
+    assert [a['price'] for a in watchlist.check('whey', [_product(105)])] == [105]
+    assert [a['price'] for a in watchlist.alerts()] == [105, 110]
+    assert watchlist.watches()[0]['last_alert_price'] == 105
+
+
+def test_store_filter_and_removal(path):
+    watchlist = Watchlist(path)
+    only_amazon = watchlist.add('creatina', 100, stores=['Amazon'])
+    assert watchlist.check('creatina', [_product(50)]) == []
+    assert [a['watch_id'] for a in watchlist.check('creatina', [_product(60, 'Amazon')])] == [only_amazon]
+    watchlist.remove(only_amazon)
+    assert len(watchlist) == 0
+    assert watchlist.check('creatina', [_product(10, 'Amazon')]) == []
+    assert watchlist.queries() == []
+
+
+def test_other_processes_see_changes(path):
+    first, second = Watchlist(path), Watchlist(path)
+    watch_id = first.add('bcaa', 80)
+    assert second.queries() == ['bcaa']
+    assert len(second.check('bcaa', [_product(70)])) == 1
+    # O limite novo chega ao outro processo pela versão
+    assert first.check('bcaa', [_product(70)]) == []
+    first.remove(watch_id)
+    assert second.watches() == []
+
+
+def test_concurrent_processes_alert_once(path):
+    watchlists = [Watchlist(path) for _ in range(4)]
+    watchlists[0].add('whey', 120)
+    for watchlist in watchlists:
+        watchlist.queries()
+    barrier = threading.Barrier(len(watchlists))
+    alerts = []
+
+    def check(watchlist):
+        barrier.wait()
+        alerts.extend(watchlist.check('whey', [_product(100)]))
+
+    threads = [threading.Thread(target=check, args=(watchlist,)) for watchlist in watchlists]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(alerts) == 1
+    assert len(watchlists[0].alerts()) == 1
+
+
+def test_bulk_sync_rebuilds_the_index(path):
+    writer = Watchlist(path)
+    for i in range(REBUILD_AT + 6):
+        writer.add('glutamina', 50 + i)
+    reader = Watchlist(path)
+    alerts = reader.check('glutamina', [_product(100)])
+    assert sorted(a['target_price'] for a in alerts) == [float(price) for price in range(100, 50 + REBUILD_AT + 6)]
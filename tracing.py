@@ -0,0 +1,173 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# Rastreamento leve das buscas: um trace por busca, com spans por loja e por
+# fase (fila, limite da loja, conexão, TTFB, download, parsing, extração),
+# todos marcados com o ID da busca. Os traces terminados ficam em memória
+# para a visão de depuração do app e podem ser gravados em JSON lines.
+
+_scope = contextvars.ContextVar('trace_scope', default=None)
+
+
+class _Scope:
+    __slots__ = ('trace', 'span_id', 'store')
+
+    def __init__(self, trace, span_id, store):
+        self.trace = trace
+        self.span_id = span_id
+        self.store = store
+
+
+class Trace:
+    def __init__(self, query):
+        self.search_id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.spans = []
+
+    def _new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def add(self, name, start, end, parent=None, store=None, span_id=None, **tags):
+        span = {
+            'search_id': self.search_id,
+            'span_id': span_id or self._new_id(),
+            'parent_id': parent,
+            'name': name,
+            'store': store,
+            'start_ms': round((start - self._t0) * 1000, 3),
+            'duration_ms': round((end - start) * 1000, 3),
+        }
+        if tags:
+            span['tags'] = tags
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span['start_ms'])
+        return {
+            'search_id': self.search_id,
+            'query': self.query,
+            'started_at': self.started_at,
+            'spans': spans,
+        }
+
+
+@contextmanager
+def span(name, store=None, **tags):
+    """Abre um span filho do atual; sem trace ativo não faz nada."""
+    scope = _scope.get()
+    if scope is None:
+        yield None
+        return
+    span_id = scope.trace._new_id()
+    store = store or scope.store
+    token = _scope.set(_Scope(scope.trace, span_id, store))
+    start = time.perf_counter()
+    try:
+        yield span_id
+    finally:
+        _scope.reset(token)
+        scope.trace.add(name, start, time.perf_counter(), parent=scope.span_id, store=store, span_id=span_id, **tags)
+
+
+def record(name, start, end, **tags):
+    """Registra uma fase já medida (tempos de time.perf_counter)."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.trace.add(name, start, end, parent=scope.span_id, store=scope.store, **tags)
+
+
+def active():
+    return _scope.get() is not None
+
+
+def search_id():
+    """ID da busca do trace atual; None sem trace ativo."""
+    scope = _scope.get()
+    return scope.trace.search_id if scope is not None else None
+
+
+def current():
+    """Busca e loja do trace atual; (None, None) sem trace ativo."""
+    scope = _scope.get()
+    if scope is None:
+        return None, None
+    return scope.trace.query, scope.store
+
+
+def wrap(fn):
+    """Leva o trace atual para funções executadas em outras threads."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+class Tracer:
+    def __init__(self, path=None, keep=50):
+        """
+        path: arquivo JSON lines onde os traces terminados são gravados (opcional).
+        keep: quantos traces recentes ficam em memória.
+        """
+        self.path = path
+        self.recent = deque(maxlen=keep)
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, query):
+        trace = Trace(query)
+        root_id = trace._new_id()
+        token = _scope.set(_Scope(trace, root_id, None))
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            _scope.reset(token)
+            trace.add('search', start, time.perf_counter(), span_id=root_id, query=query)
+            self._finish(trace)
+
+    def _finish(self, trace):
+        data = trace.to_dict()
+        self.recent.append(data)
+        logging.info(f"Busca {trace.search_id} ('{trace.query}') concluída com {len(data['spans'])} spans")
+        if self.path:
+            with self._write_lock:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(data, ensure_ascii=False) + '\n')
+                except OSError as e:
+                    logging.error(f"Erro ao gravar trace em {self.path}: {str(e)}")
+
+    def get(self, search_id):
+        for data in reversed(self.recent):
+            if data['search_id'] == search_id:
+                return data
+        return None
+
+
+_shared_tracer = None
+_shared_tracer_lock = threading.Lock()
+
+
+def get_tracer(path=None):
+    """Devolve o tracer compartilhado pelo processo."""
+    global _shared_tracer
+    with _shared_tracer_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer(path)
+        return _shared_tracer
@@ -0,0 +1,386 @@
+import concurrent.futures
+import io
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+# Camada de transporte HTTP do scraper. Todas as lojas usam o mesmo cliente,
+# com um pool de conexões dimensionado para cada host de loja; quando o httpx
+# com suporte a HTTP/2 está instalado, ele é usado e as conexões são
+# multiplexadas nos hosts que aceitam h2. O PoolWarmer abre as conexões na
+# partida e as mantém vivas com requisições leves. Com proxy, a requisição
+# sai pelo proxy indicado (ver proxies.py), com pool próprio por proxy. Com
+# max_bytes, o corpo é lido em partes e a leitura para no limite.
+
+try:
+    import httpx
+except ImportError:  # httpx é opcional
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = httpx is not None
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _has_module(*names):
+    for name in names:
+        try:
+            __import__(name)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def supported_encodings():
+    """Lista os Content-Encodings que conseguimos de fato decodificar."""
+    encodings = ['gzip', 'deflate']
+    if _has_module('brotli', 'brotlicffi'):
+        encodings.append('br')
+    if _has_module('zstandard'):
+        encodings.append('zstd')
+    return encodings
+
+
+# Só anunciamos o que há decodificador instalado; sem brotli fica gzip/deflate
+ACCEPT_ENCODING = ', '.join(supported_encodings())
+
+
+# Conexões por host quando a loja não tem tamanho próprio, e por quanto tempo
+# uma conexão ociosa fica no pool
+DEFAULT_POOL_SIZE = 4
+KEEPALIVE_EXPIRY = 90.0
+CHUNK_SIZE = 64 * 1024  # leitura em partes quando há limite de tamanho do corpo
+
+
+def host_of(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+# Cabeçalhos de conexão são proibidos no HTTP/2; o próprio cliente cuida do keep-alive
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'}
+
+
+def _strip_hop_by_hop(headers):
+    if not headers:
+        return headers
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+
+class TransportError(Exception):
+    """Falha de rede ou de protocolo, independente da biblioteca HTTP usada."""
+
+    retryable = True
+
+
+class ResponseTooLarge(TransportError):
+    """O corpo da resposta passou do limite da loja e a leitura foi interrompida."""
+
+    retryable = False
+
+
+def _read_capped(chunks, url, max_bytes, content_length=None):
+    """Lê o corpo (já descomprimido) em partes, interrompendo ao passar de max_bytes.
+
+    As partes vão direto para um só buffer, reservado pelo Content-Length
+    quando ele vem; getvalue() entrega os bytes desse buffer sem copiá-lo.
+    """
+    expected = int(content_length) if content_length and content_length.isdigit() else None
+    if expected is not None and expected > max_bytes:
+        raise ResponseTooLarge(f"{url}: Content-Length {content_length} acima do limite de {max_bytes} bytes")
+    body = io.BytesIO()
+    if expected:
+        # Com compressão o corpo passa do Content-Length e o buffer cresce
+        body.seek(expected - 1)
+        body.write(b'\0')
+        body.seek(0)
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise ResponseTooLarge(f"{url}: corpo passou de {max_bytes} bytes, leitura interrompida")
+        body.write(chunk)
+    body.truncate(size)
+    return body.getvalue()
+
+
+class _PhaseTrace:
+    """Converte os eventos de trace do httpcore em fases do tracing."""
+
+    # evento do httpcore -> fase
+    PHASES = {
+        'connection.connect_tcp': 'connect',
+        'connection.start_tls': 'tls',
+        'http11.receive_response_headers': 'ttfb',
+        'http2.receive_response_headers': 'ttfb',
+        'http11.receive_response_body': 'download',
+        'http2.receive_response_body': 'download',
+    }
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = {}
+
+    def __call__(self, event_name, info):
+        name, _, stage = event_name.rpartition('.')
+        self.events[(name, stage)] = time.perf_counter()
+
+    def flush(self, response):
+        for event, phase in self.PHASES.items():
+            start = self.events.get((event, 'started'))
+            end = self.events.get((event, 'complete'))
+            if start is None or end is None:
+                continue
+            if phase == 'ttfb':
+                # Do envio da requisição até os cabeçalhos da resposta
+                start = self.events.get((event.replace('receive_response_headers', 'send_request_headers'), 'started'), start)
+            tags = {'http_version': response.http_version} if phase == 'ttfb' else {}
+            tracing.record(phase, start, end, **tags)
+
+
+class RequestsTransport:
+    """Transporte HTTP/1.1 baseado em requests.Session."""
+
+    name = 'requests'
+
+    def __init__(self, headers=None, max_redirects=5, verify=True, pools=None):
+        """pools: {url base da loja: conexões mantidas para o host}."""
+        self.session = requests.Session()
+        self.session.max_redirects = max_redirects
+        self.session.verify = verify
+        # Passado em cada requisição: no Session, REQUESTS_CA_BUNDLE teria precedência
+        self.verify = verify
+        if headers:
+            self.session.headers.update(headers)
+        self.pools = {host_of(url): size for url, size in (pools or {}).items()}
+        for host, size in self.pools.items():
+            self.session.mount(host + '/', HTTPAdapter(pool_connections=1, pool_maxsize=size))
+        self.last_used = {}
+
+    def get(self, url, headers=None, timeout=15, proxy=None, max_bytes=None):
+        self.last_used[host_of(url)] = time.monotonic()
+        started = time.perf_counter()
+        proxies = {'http': proxy, 'https': proxy} if proxy else None
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout, proxies=proxies,
+                                        verify=self.verify, stream=max_bytes is not None)
+            if max_bytes is not None:
+                # Interromper a leitura descarta a conexão em vez de devolvê-la ao pool
+                with response:
+                    response._content = _read_capped(
+                        response.iter_content(CHUNK_SIZE), url, max_bytes, response.headers.get('Content-Length')
+                    )
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        # O requests só expõe o tempo até os cabeçalhos (inclui DNS e conexão)
+        headers_at = started + response.elapsed.total_seconds()
+        tracing.record('ttfb', started, headers_at, status=response.status_code)
+        tracing.record('download', headers_at, time.perf_counter(), bytes=len(response.content))
+        return response
+
+    def ping(self, url, timeout=5):
+        """HEAD leve só para abrir ou manter viva a conexão com o host."""
+        try:
+            self.session.head(url, timeout=timeout, allow_redirects=False, verify=self.verify).close()
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+
+    def pool_stats(self):
+        stats = {}
+        for host, size in self.pools.items():
+            pools = self.session.get_adapter(host + '/').poolmanager.pools
+            # Fila do urllib3: conexões ociosas prontas para reuso (None são vagas)
+            idle = sum(
+                1 for key in pools.keys() for connection in list(pools[key].pool.queue) if connection is not None
+            )
+            stats[host] = {'size': size, 'idle': idle}
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+class HttpxTransport:
+    """Transporte httpx com HTTP/2 quando o pacote h2 está disponível."""
+
+    name = 'httpx'
+
+    def __init__(self, headers=None, max_redirects=5, verify=True, http2=None, pools=None):
+        """pools: {url base da loja: conexões mantidas para o host}."""
+        if httpx is None:
+            raise RuntimeError("httpx não está instalado")
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+        self.pools = {host_of(url): size for url, size in (pools or {}).items()}
+        self.verify = verify
+        self._mounts = self._host_mounts()
+        self.client = self._new_client(headers, max_redirects, self._mounts)
+        self._client_options = {'headers': headers, 'max_redirects': max_redirects}
+        self._proxy_clients = {}
+        self._proxy_lock = threading.Lock()
+        self.last_used = {}
+
+    def _host_mounts(self, proxy=None):
+        # Um pool por host: uma loja lenta não ocupa as conexões das outras
+        return {
+            f"all://{urlsplit(host).netloc}": httpx.HTTPTransport(
+                http2=self.http2,
+                verify=self.verify,
+                proxy=proxy,
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=KEEPALIVE_EXPIRY),
+            )
+            for host, size in self.pools.items()
+        }
+
+    def _new_client(self, headers, max_redirects, mounts, proxy=None):
+        return httpx.Client(
+            http2=self.http2,
+            headers=_strip_hop_by_hop(headers),
+            follow_redirects=True,
+            max_redirects=max_redirects,
+            verify=self.verify,
+            proxy=proxy,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=24, keepalive_expiry=KEEPALIVE_EXPIRY),
+            mounts=mounts,
+        )
+
+    def _proxy_client(self, proxy):
+        # O httpx fixa o proxy no cliente: um cliente (e um pool por host) por proxy
+        with self._proxy_lock:
+            client = self._proxy_clients.get(proxy)
+            if client is None:
+                client = self._proxy_clients[proxy] = self._new_client(mounts=self._host_mounts(proxy), proxy=proxy, **self._client_options)
+            return client
+
+    def get(self, url, headers=None, timeout=15, proxy=None, max_bytes=None):
+        self.last_used[host_of(url)] = time.monotonic()
+        extensions = {'trace': _PhaseTrace()} if tracing.active() else None
+        client = self._proxy_client(proxy) if proxy else self.client
+        try:
+            if max_bytes is None:
+                response = client.get(url, headers=_strip_hop_by_hop(headers), timeout=timeout, extensions=extensions)
+            else:
+                with client.stream('GET', url, headers=_strip_hop_by_hop(headers), timeout=timeout, extensions=extensions) as response:
+                    response._content = _read_capped(
+                        response.iter_bytes(CHUNK_SIZE), url, max_bytes, response.headers.get('Content-Length')
+                    )
+        except httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        if extensions:
+            extensions['trace'].flush(response)
+        return response
+
+    def ping(self, url, timeout=5):
+        """HEAD leve só para abrir ou manter viva a conexão com o host."""
+        try:
+            self.client.head(url, timeout=timeout, follow_redirects=False)
+        except httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+
+    def pool_stats(self):
+        stats = {}
+        for host, size in self.pools.items():
+            connections = self._mounts[f"all://{urlsplit(host).netloc}"]._pool.connections
+            stats[host] = {
+                'size': size,
+                'open': len(connections),
+                'idle': sum(1 for connection in connections if connection.is_idle()),
+            }
+        return stats
+
+    def close(self):
+        self.client.close()
+        with self._proxy_lock:
+            for client in self._proxy_clients.values():
+                client.close()
+            self._proxy_clients.clear()
+
+
+class PoolWarmer:
+    """Abre as conexões com os hosts das lojas e as mantém vivas com requisições leves.
+
+    Na partida faz um HEAD em cada host (DNS, TCP e TLS prontos antes da
+    primeira busca); depois, a cada 'interval' segundos, repete o HEAD nos
+    hosts que ficaram ociosos nesse intervalo, antes que o servidor feche a
+    conexão. Falhas seguidas marcam o host como fora do ar em stats().
+    """
+
+    def __init__(self, transport, urls, interval=30.0, timeout=5.0):
+        self.transport = transport
+        self.hosts = sorted({host_of(url) for url in urls})
+        self.interval = interval
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._health = {host: {'pings': 0, 'failures': 0, 'last_ms': None, 'last_error': None} for host in self.hosts}
+
+    def start(self):
+        threading.Thread(target=self._run, name='pool-warmer', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def warm(self, hosts=None):
+        hosts = self.hosts if hosts is None else hosts
+        if not hosts:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(hosts), thread_name_prefix='warm') as executor:
+            list(executor.map(self._ping, hosts))
+
+    def _run(self):
+        started = time.perf_counter()
+        self.warm()
+        logging.info(f"Conexões abertas com {len(self.hosts)} hosts em {(time.perf_counter() - started) * 1000:.0f} ms")
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            idle = [host for host in self.hosts if now - self.transport.last_used.get(host, 0) >= self.interval]
+            self.warm(idle)
+
+    def _ping(self, host):
+        started = time.perf_counter()
+        try:
+            self.transport.ping(host + '/', timeout=self.timeout)
+        except TransportError as e:
+            with self._lock:
+                health = self._health[host]
+                health['pings'] += 1
+                health['failures'] += 1
+                health['last_error'] = str(e)
+            logging.warning(f"Conexão com {host} falhou no keep-alive: {str(e)}")
+            return
+        with self._lock:
+            health = self._health[host]
+            health['pings'] += 1
+            health['failures'] = 0
+            health['last_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            health['last_error'] = None
+
+    def stats(self):
+        with self._lock:
+            return {host: dict(health, healthy=health['failures'] == 0) for host, health in self._health.items()}
+
+
+TRANSPORTS = {
+    'requests': RequestsTransport,
+    'httpx': HttpxTransport,
+}
+
+
+def create_transport(kind='auto', **kwargs):
+    """Cria o transporte pedido; 'auto' prefere httpx com HTTP/2 se disponível."""
+    if kind == 'auto':
+        kind = 'httpx' if HTTP2_AVAILABLE else 'requests'
+    if kind not in TRANSPORTS:
+        raise ValueError(f"Transporte desconhecido: {kind}")
+    transport = TRANSPORTS[kind](**kwargs)
+    logging.info(f"Transporte HTTP: {transport.name} (Accept-Encoding: {ACCEPT_ENCODING})")
+    return transport
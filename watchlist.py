@@ -0,0 +1,281 @@
+import bisect
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from queries import canonicalize
+
+# Lista de observação de preços. Cada alvo (busca, lojas, preço-alvo) entra
+# num índice em memória: por produto canônico, os limites de disparo ficam
+# ordenados, e um novo lote de resultados só encontra os alvos com limite >=
+# menor preço de cada loja (bisect), sem percorrer todos os alvos. Depois de
+# um alerta o limite do alvo passa a ser o preço alertado, então buscas
+# repetidas com o mesmo preço não tocam nesse alvo. Os alertas disparados
+# ficam gravados no SQLite. Vários processos podem usar o mesmo arquivo:
+# cada um sincroniza as mudanças pela coluna 'version'. Toda escrita pega a
+# trava de escrita do arquivo (BEGIN IMMEDIATE) antes de calcular a próxima
+# versão, e o alerta só é gravado se nenhum outro processo alertou o mesmo
+# preço antes, então dois processos não disparam o mesmo alerta.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    stores TEXT,
+    target_price REAL NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    last_alert_price REAL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS watches_version ON watches(version);
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    watch_id INTEGER NOT NULL REFERENCES watches(id),
+    query TEXT NOT NULL,
+    target_price REAL NOT NULL,
+    title TEXT NOT NULL,
+    price REAL NOT NULL,
+    store TEXT NOT NULL,
+    link TEXT NOT NULL,
+    triggered_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_triggered ON alerts(triggered_at);
+"""
+
+# Acima de tantas mudanças num produto canônico, reordenar sai mais barato que inserir uma a uma
+REBUILD_AT = 64
+
+
+@dataclass(slots=True)
+class Watch:
+    id: int
+    query: str
+    key: str
+    stores: frozenset
+    target_price: float
+    last_alert_price: float = None
+
+    @property
+    def threshold(self):
+        """Maior preço que ainda dispara: o alvo ou, após um alerta, qualquer preço menor que o alertado."""
+        if self.last_alert_price is None:
+            return self.target_price
+        return min(self.target_price, math.nextafter(self.last_alert_price, 0))
+
+
+class Watchlist:
+    def __init__(self, path='data/watchlist.db'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._watches = {}
+        self._by_key = {}      # chave canônica -> ids dos alvos ativos
+        self._thresholds = {}  # chave canônica -> ([limites ordenados], [ids na mesma ordem])
+        self._version = 0
+        with self._lock:
+            self._sync()
+        logging.info(f"Lista de observação carregada com {len(self._watches)} alvos")
+
+    @contextmanager
+    def _write(self):
+        """Transação com a trava de escrita do arquivo desde o início (para _next_version ser única)."""
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            yield
+
+    def _next_version(self):
+        # Só dentro de _write(): fora da trava, dois processos pegariam a mesma versão
+        return self._conn.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM watches').fetchone()[0]
+
+    def _sync(self):
+        """Aplica no índice em memória as mudanças gravadas desde a última sincronização."""
+        rows = self._conn.execute(
+            'SELECT id, query, query_key, stores, target_price, active, last_alert_price, version '
+            'FROM watches WHERE version > ? ORDER BY version',
+            (self._version,)
+        ).fetchall()
+        bulk = len(rows) > REBUILD_AT
+        changed = set()
+        for watch_id, query, key, stores, target_price, active, last_alert_price, version in rows:
+            old = self._watches.get(watch_id)
+            if old is not None:
+                changed.add(old.key)
+                self._unindex(old, bulk)
+            if active:
+                changed.add(key)
+                self._index(Watch(
+                    watch_id, query, key,
+                    frozenset(stores.split(',')) if stores else None,
+                    target_price, last_alert_price
+                ), bulk)
+            self._version = max(self._version, version)
+        if bulk:
+            for key in changed:
+                self._rebuild(key)
+
+    def _index(self, watch, bulk=False):
+        self._watches[watch.id] = watch
+        self._by_key.setdefault(watch.key, set()).add(watch.id)
+        if bulk:
+            return
+        targets, ids = self._thresholds.setdefault(watch.key, ([], []))
+        position = bisect.bisect_right(targets, watch.threshold)
+        targets.insert(position, watch.threshold)
+        ids.insert(position, watch.id)
+
+    def _unindex(self, watch, bulk=False):
+        del self._watches[watch.id]
+        self._by_key[watch.key].discard(watch.id)
+        if not self._by_key[watch.key]:
+            del self._by_key[watch.key]
+        if bulk:
+            return
+        targets, ids = self._thresholds[watch.key]
+        start = bisect.bisect_left(targets, watch.threshold)
+        end = bisect.bisect_right(targets, watch.threshold)
+        position = ids.index(watch.id, start, end)
+        del targets[position]
+        del ids[position]
+        if not targets:
+            del self._thresholds[watch.key]
+
+    def _rebuild(self, key):
+        watches = sorted((self._watches[watch_id] for watch_id in self._by_key.get(key, ())), key=lambda watch: watch.threshold)
+        if watches:
+            self._thresholds[key] = ([watch.threshold for watch in watches], [watch.id for watch in watches])
+        else:
+            self._thresholds.pop(key, None)
+
+    def add(self, query, target_price, stores=None):
+        """Registra um alvo; stores None observa todas as lojas. Devolve o id."""
+        key = canonicalize(query).key
+        with self._lock, self._write():
+            watch_id = self._conn.execute(
+                'INSERT INTO watches (query, query_key, stores, target_price, created_at, version) VALUES (?, ?, ?, ?, ?, ?)',
+                (query, key, ','.join(sorted(stores)) if stores else None, float(target_price), time.time(), self._next_version())
+            ).lastrowid
+            self._sync()
+        logging.info(f"Alvo {watch_id}: '{query}' abaixo de R$ {float(target_price):.2f}")
+        return watch_id
+
+    def remove(self, watch_id):
+        with self._lock, self._write():
+            self._conn.execute(
+                'UPDATE watches SET active = 0, version = ? WHERE id = ?', (self._next_version(), watch_id)
+            )
+            self._sync()
+
+    def check(self, query, products, seen_at=None):
+        """Confere um lote de resultados da busca contra os alvos; devolve os alertas novos.
+
+        Um alvo só dispara de novo quando o preço cai abaixo do último alerta.
+        """
+        key = canonicalize(query).key
+        seen_at = seen_at or time.time()
+        with self._lock:
+            self._sync()
+            entry = self._thresholds.get(key)
+            if entry is None:
+                return []
+            targets, ids = entry
+
+            # Menor preço de cada loja no lote
+            cheapest = {}
+            for product in products:
+                if product.price > 0 and (product.store not in cheapest or product.price < cheapest[product.store].price):
+                    cheapest[product.store] = product
+
+            best = {}
+            for store_name, product in cheapest.items():
+                for watch_id in ids[bisect.bisect_left(targets, product.price):]:
+                    watch = self._watches[watch_id]
+                    if watch.stores and store_name not in watch.stores:
+                        continue
+                    if watch_id not in best or product.price < best[watch_id].price:
+                        best[watch_id] = product
+            if not best:
+                return []
+
+            alerts = []
+            with self._write():
+                for watch_id, product in best.items():
+                    watch = self._watches[watch_id]
+                    # O limite do alvo cai para o preço alertado; se outro processo já alertou
+                    # esse preço (ou menor), a linha não muda e o alerta não se repete
+                    updated = self._conn.execute(
+                        'UPDATE watches SET last_alert_price = ?, version = ? '
+                        'WHERE id = ? AND active = 1 AND (last_alert_price IS NULL OR last_alert_price > ?)',
+                        (product.price, self._next_version(), watch_id, product.price)
+                    ).rowcount
+                    if not updated:
+                        continue
+                    alert = {
+                        'watch_id': watch_id,
+                        'query': watch.query,
+                        'target_price': watch.target_price,
+                        'title': product.title,
+                        'price': product.price,
+                        'store': product.store,
+                        'link': product.link,
+                        'triggered_at': seen_at,
+                    }
+                    self._conn.execute(
+                        'INSERT INTO alerts (watch_id, query, target_price, title, price, store, link, triggered_at) '
+                        'VALUES (:watch_id, :query, :target_price, :title, :price, :store, :link, :triggered_at)',
+                        alert
+                    )
+                    alerts.append(alert)
+            # O índice em memória recebe os novos limites pela mesma sincronização dos outros processos
+            self._sync()
+
+        logging.info(f"Lista de observação: {len(alerts)} alertas para '{query}'")
+        return alerts
+
+    def queries(self):
+        """Buscas com alvos ativos (uma por produto canônico), para as varreduras em segundo plano."""
+        with self._lock:
+            self._sync()
+            return sorted({self._watches[next(iter(ids))].query for ids in self._by_key.values()})
+
+    def watches(self):
+        with self._lock:
+            self._sync()
+            return [
+                {
+                    'id': watch.id,
+                    'query': watch.query,
+                    'stores': sorted(watch.stores) if watch.stores else None,
+                    'target_price': watch.target_price,
+                    'last_alert_price': watch.last_alert_price,
+                }
+                for watch in sorted(self._watches.values(), key=lambda watch: watch.id)
+            ]
+
+    def alerts(self, limit=50):
+        with self._lock:
+            cursor = self._conn.execute(
+                'SELECT watch_id, query, target_price, title, price, store, link, triggered_at '
+                'FROM alerts ORDER BY triggered_at DESC, id DESC LIMIT ?',
+                (limit,)
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._watches)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()